@@ -0,0 +1,240 @@
+import hashlib
+import os
+import tempfile
+from typing import Optional
+
+import nodes
+from nodes import *
+
+# Компактный двоичный формат AST:
+#   MAGIC, FORMAT_VERSION, таблица строк (varint длина + utf-8), поток значений в прямом порядке обхода.
+# Значение - байт-тег и данные; узел - код типа (индекс в NODE_TYPES), затем row, line и поля из _fields.
+# Таблица _props не сохраняется: узлы с дополнительными свойствами не кэшируются
+MAGIC = b'PAST'
+FORMAT_VERSION = 1
+
+_NONE, _TRUE, _FALSE, _INT, _STR, _NODE, _TUPLE, _LIST, _BINOP = range(9)
+
+# Коды типов узлов: все конкретные классы nodes.py в алфавитном порядке
+NODE_TYPES = tuple(sorted((cls for cls in vars(nodes).values()
+                           if isinstance(cls, type) and issubclass(cls, AstNode) and not getattr(cls, '__abstractmethods__', None)),
+                          key=lambda cls: cls.__name__))
+_NODE_CODES = {cls: code for code, cls in enumerate(NODE_TYPES)}
+_BINOPS = tuple(BinOp)
+_BINOP_CODES = {op: code for code, op in enumerate(_BINOPS)}
+_SLOT_NAMES = tuple(('row', 'line') + cls._fields for cls in NODE_TYPES)
+_HAS_VARINT = frozenset((_INT, _STR, _NODE, _TUPLE, _LIST))
+
+# Модули, от которых зависит форма AST: изменение любого из них делает кэш недействительным
+_SCHEMA_MODULES = ('nodes', 'lexer', 'rdparser', 'grammar', 'myParser')
+_fingerprint = None
+
+
+def schema_fingerprint() -> str:
+    """Отпечаток грамматики и схемы узлов; входит в ключ кэша"""
+    global _fingerprint
+    if _fingerprint is None:
+        digest = hashlib.sha256(b'%s%d' % (MAGIC, FORMAT_VERSION))
+        for cls in NODE_TYPES:
+            digest.update(('%s%r' % (cls.__name__, cls._fields)).encode())
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in _SCHEMA_MODULES:
+            with open(os.path.join(here, name + '.py'), 'rb') as f:
+                digest.update(f.read())
+        _fingerprint = digest.hexdigest()
+    return _fingerprint
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def encode(root: AstNode) -> bytes:
+    """Сериализует дерево; TypeError - если в дереве есть значения, не описываемые схемой"""
+    strings = {}
+    body = bytearray()
+    stack = [root]
+    while stack:
+        value = stack.pop()
+        if value is None:
+            body.append(_NONE)
+        elif value is True:
+            body.append(_TRUE)
+        elif value is False:
+            body.append(_FALSE)
+        elif isinstance(value, AstNode):
+            code = _NODE_CODES.get(type(value))
+            if code is None:
+                raise TypeError('Unknown node type %s' % type(value).__name__)
+            if value._props:
+                # Дополнительные свойства узла не входят в схему
+                raise TypeError('Node %s has extra props' % type(value).__name__)
+            body.append(_NODE)
+            _write_varint(body, code)
+            stack.extend(getattr(value, name) for name in reversed(value._fields))
+            stack.append(value.line)
+            stack.append(value.row)
+        elif isinstance(value, str):
+            body.append(_STR)
+            index = strings.setdefault(value, len(strings))
+            _write_varint(body, index)
+        elif isinstance(value, int):
+            body.append(_INT)
+            _write_varint(body, value << 1 if value >= 0 else ((-value) << 1) - 1)
+        elif isinstance(value, BinOp):
+            body.append(_BINOP)
+            body.append(_BINOP_CODES[value])
+        elif type(value) in (tuple, list):
+            body.append(_TUPLE if type(value) is tuple else _LIST)
+            _write_varint(body, len(value))
+            stack.extend(reversed(value))
+        else:
+            raise TypeError('Cannot encode value of type %s' % type(value).__name__)
+
+    out = bytearray(MAGIC)
+    out.append(FORMAT_VERSION)
+    _write_varint(out, len(strings))
+    for string in strings:
+        data = string.encode('utf-8')
+        _write_varint(out, len(data))
+        out += data
+    out += body
+    return bytes(out)
+
+
+def decode(data: bytes) -> AstNode:
+    """Восстанавливает дерево без вызова конструкторов узлов; ValueError - если данные повреждены"""
+    if len(data) < 5 or data[:4] != MAGIC or data[4] != FORMAT_VERSION:
+        raise ValueError('Not an AST cache file')
+    pos = 5
+
+    def read_varint():
+        nonlocal pos
+        result = shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            result |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    # Кадр стека: [контейнер, имена полей (None для последовательности), сколько заполнено, тип последовательности]
+    stack = []
+    push = stack.append
+    node_types = NODE_TYPES
+    try:
+        strings = []
+        for _ in range(read_varint()):
+            length = read_varint()
+            if pos + length > len(data):
+                raise IndexError(pos + length)
+            strings.append(data[pos:pos + length].decode('utf-8'))
+            pos += length
+
+        while True:
+            tag = data[pos]
+            # Коды типов и индексы строк почти всегда укладываются в один байт
+            arg = data[pos + 1] if tag in _HAS_VARINT else 0
+            if arg < 0x80:
+                pos += 2 if tag in _HAS_VARINT else 1
+            else:
+                pos += 1
+                arg = read_varint()
+            if tag == _NODE:
+                cls = node_types[arg]
+                node = cls.__new__(cls)
+                node._props = None
+                node.expr_type = None
+                node.binding = None
+                push([node, _SLOT_NAMES[arg], 0, None])
+                continue
+            if tag == _STR:
+                value = strings[arg]
+            elif tag == _NONE:
+                value = None
+            elif tag == _TUPLE or tag == _LIST:
+                if arg:
+                    push([[None] * arg, None, 0, tag])
+                    continue
+                value = () if tag == _TUPLE else []
+            elif tag == _TRUE:
+                value = True
+            elif tag == _FALSE:
+                value = False
+            elif tag == _INT:
+                value = -((arg + 1) >> 1) if arg & 1 else arg >> 1
+            elif tag == _BINOP:
+                value = _BINOPS[data[pos]]
+                pos += 1
+            else:
+                raise ValueError('Bad tag %d' % tag)
+
+            # Передаем готовое значение вверх по стеку, закрывая заполненные контейнеры
+            while stack:
+                frame = stack[-1]
+                container, names, filled, seq_tag = frame
+                filled += 1
+                if names is None:
+                    container[filled - 1] = value
+                    if filled < len(container):
+                        frame[2] = filled
+                        break
+                    value = tuple(container) if seq_tag == _TUPLE else container
+                else:
+                    setattr(container, names[filled - 1], value)
+                    if filled < len(names):
+                        frame[2] = filled
+                        break
+                    value = container
+                stack.pop()
+            if not stack:
+                return value
+    except (IndexError, UnicodeDecodeError) as e:
+        raise ValueError('Truncated AST cache data') from e
+
+
+# Кэш разобранных программ на диске: ключ - sha256 от отпечатка схемы, backend'а и текста программы
+class ParseCache:
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0}
+
+    def path(self, source: str, backend: str) -> str:
+        digest = hashlib.sha256(schema_fingerprint().encode())
+        digest.update(backend.encode())
+        digest.update(source.encode('utf-8'))
+        return os.path.join(self.directory, digest.hexdigest() + '.ast')
+
+    def load(self, source: str, backend: str) -> Optional[AstNode]:
+        try:
+            with open(self.path(source, backend), 'rb') as f:
+                ast = decode(f.read())
+        except (OSError, ValueError):
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        return ast
+
+    def store(self, source: str, backend: str, ast: AstNode) -> bool:
+        try:
+            data = encode(ast)
+        except TypeError:
+            # Дерево содержит сырые лексемы pyparsing - такие программы не кэшируются
+            return False
+        path = self.path(source, backend)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        self.stats['stores'] += 1
+        return True
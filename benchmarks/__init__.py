@@ -0,0 +1,3 @@
+"""Замеры компилятора на синтетических программах: python -m benchmarks --help"""
+from benchmarks.generator import ProgramGenerator, generate_program
+from benchmarks.suite import run_suite, measure, program_shape
@@ -0,0 +1,57 @@
+"""python -m benchmarks [--backend rd] [--scales 1,2,4] [--repeat N] [--no-memory] [-o results.json]
+
+Запускается из корня репозитория. JSON с результатами пишется в файл или в stdout,
+таблица прогресса - в stderr.
+"""
+import argparse
+import json
+import sys
+
+from benchmarks.suite import BASE_SHAPE, DEFAULT_SCALES, run_suite
+
+
+def _print_point(backend: str, point: dict) -> None:
+    if 'error' in point:
+        print('%-9s x%-3d FAILED %s' % (backend, point['scale'], point['error']), file=sys.stderr)
+        return
+    phases = point['phases']
+    print('%-9s x%-3d %7d nodes  %s' % (
+        backend, point['scale'], point['nodes'],
+        '  '.join('%s %9.3f ms' % (phase, phases[phase]['median_ms']) for phase in phases)), file=sys.stderr)
+
+
+def main(argv=None) -> int:
+    arg_parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Compiler phase benchmarks')
+    arg_parser.add_argument('--backend', action='append', choices=('rd', 'pyparsing'),
+                            help='backend to measure (repeatable; default: both)')
+    arg_parser.add_argument('--scales', default=','.join(map(str, DEFAULT_SCALES)),
+                            help='comma-separated size multipliers')
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc run')
+    for name, value in BASE_SHAPE.items():
+        if type(value) is bool:
+            arg_parser.add_argument('--' + name.replace('_', '-'), action=argparse.BooleanOptionalAction,
+                                    default=value, help='generate this construct (default: %s)' % value)
+        else:
+            arg_parser.add_argument('--' + name.replace('_', '-'), type=int, default=value,
+                                    help='program shape at scale 1 (default: %d)' % value)
+    arg_parser.add_argument('-o', '--output', help='write JSON results to this file')
+    args = arg_parser.parse_args(argv)
+
+    base = {name: getattr(args, name) for name in BASE_SHAPE}
+    results = run_suite(backends=tuple(args.backend or ('rd', 'pyparsing')),
+                        scales=[int(s) for s in args.scales.split(',') if s],
+                        repeat=args.repeat, seed=args.seed, memory=not args.no_memory,
+                        base=base, progress=_print_point)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
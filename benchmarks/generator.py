@@ -0,0 +1,143 @@
+"""Генератор синтетических программ на Pascal для замеров.
+
+Программы используют только конструкции, которые принимают обе грамматики (pyparsing и 'rd'):
+переменные integer, функции с одним параметром, процедуры без параметров, присваивания,
+вызовы, writeln, if/else, while и (по запросу) repeat. Деление - только div на ненулевую константу.
+"""
+import random
+from typing import List
+
+_ARITH_OPS = ('+', '-', '*')
+# '<>' не используется: грамматика pyparsing разбирает его как '<' и падает
+_REL_OPS = ('<', '>', '<=', '>=', '=')
+
+
+class ProgramGenerator:
+    def __init__(self, procedures: int = 4, depth: int = 2, expr_length: int = 4, statements: int = 8,
+                 variables: int = 8, seed: int = 0, repeat_loops: bool = False,
+                 compound_conditions: bool = False):
+        """
+        procedures  - число подпрограмм (поровну функций и процедур)
+        depth       - глубина вложенности операторов if/while/repeat
+        expr_length - число операндов в арифметическом выражении
+        statements  - число операторов в каждом составном операторе верхнего уровня
+        variables   - размер раздела var
+        repeat_loops, compound_conditions - repeat..until и условия с and
+        (набор замеров включает их, чтобы покрыть генерацию repeat и ленивых условий)
+        """
+        self.procedures = procedures
+        self.depth = depth
+        self.expr_length = max(1, expr_length)
+        self.statements = max(1, statements)
+        self.variables = max(1, variables)
+        self.repeat_loops = repeat_loops
+        self.compound_conditions = compound_conditions
+        self.rnd = random.Random(seed)
+        self._functions: List[str] = []
+        self._routines: List[str] = []
+
+    def generate(self) -> str:
+        rnd = self.rnd
+        lines = ['Program bench;', 'var']
+        names = ['v%d' % i for i in range(self.variables)]
+        for i in range(0, len(names), 8):
+            lines.append('  %s : integer;' % ', '.join(names[i:i + 8]))
+        lines.append('')
+
+        self._functions = []
+        self._routines = []
+        for i in range(self.procedures):
+            if i % 2 == 0:
+                name = 'f%d' % i
+                lines.append('function %s(n: integer): integer;' % name)
+                lines.append('begin')
+                self._statements(lines, 1, self.depth)
+                lines.append('  %s := %s;' % (name, self._expr(['n'])))
+                lines.append('end;')
+                self._functions.append(name)
+            else:
+                name = 'p%d' % i
+                lines.append('procedure %s;' % name)
+                lines.append('begin')
+                self._statements(lines, 1, self.depth)
+                lines.append('end;')
+                self._routines.append(name)
+            lines.append('')
+
+        lines.append('begin')
+        self._statements(lines, 1, self.depth)
+        lines.append('  writeln(%s);' % rnd.choice(names))
+        lines.append('end.')
+        return '\n'.join(lines) + '\n'
+
+    def _var(self) -> str:
+        return 'v%d' % self.rnd.randrange(self.variables)
+
+    def _operand(self, extra: List[str]) -> str:
+        rnd = self.rnd
+        roll = rnd.random()
+        if roll < 0.15 and self._functions:
+            return '%s(%s)' % (rnd.choice(self._functions), self._var())
+        if roll < 0.45:
+            return str(rnd.randrange(1, 100))
+        if extra and roll < 0.6:
+            return rnd.choice(extra)
+        return self._var()
+
+    def _expr(self, extra: List[str] = ()) -> str:
+        rnd = self.rnd
+        parts = [self._operand(extra)]
+        for _ in range(self.expr_length - 1):
+            if rnd.random() < 0.15:
+                parts.append('div %d' % rnd.randrange(1, 10))
+            else:
+                parts.append('%s %s' % (rnd.choice(_ARITH_OPS), self._operand(extra)))
+        return ' '.join(parts)
+
+    def _cond(self) -> str:
+        rnd = self.rnd
+        cond = '%s %s %s' % (self._var(), rnd.choice(_REL_OPS), self._operand([]))
+        if self.compound_conditions and rnd.random() < 0.3:
+            cond = '(%s) and (%s %s %d)' % (cond, self._var(), rnd.choice(_REL_OPS), rnd.randrange(100))
+        return cond
+
+    def _statements(self, lines: List[str], indent: int, depth: int, count: int = None) -> None:
+        rnd = self.rnd
+        pad = '  ' * indent
+        for _ in range(self.statements if count is None else count):
+            roll = rnd.random()
+            if depth > 0 and roll < 0.25:
+                lines.append('%sif %s then' % (pad, self._cond()))
+                self._block(lines, indent, depth - 1)
+                if rnd.random() < 0.5:
+                    lines.append('%selse' % pad)
+                    self._block(lines, indent, depth - 1)
+            elif depth > 0 and roll < 0.35:
+                var = self._var()
+                lines.append('%swhile %s < %d do' % (pad, var, rnd.randrange(10, 100)))
+                lines.append('%sbegin' % pad)
+                self._statements(lines, indent + 1, depth - 1, max(1, self.statements // 4))
+                lines.append('%s  %s := %s + 1;' % (pad, var, var))
+                lines.append('%send' % pad)
+            elif depth > 0 and roll < 0.4 and self.repeat_loops:
+                lines.append('%srepeat' % pad)
+                self._statements(lines, indent + 1, depth - 1, max(1, self.statements // 4))
+                lines.append('%suntil %s' % (pad, self._cond()))
+            elif roll < 0.45 and self._routines:
+                lines.append('%s%s();' % (pad, rnd.choice(self._routines)))
+            elif roll < 0.5:
+                lines.append('%swriteln(%s);' % (pad, self._expr()))
+            else:
+                lines.append('%s%s := %s;' % (pad, self._var(), self._expr()))
+
+    def _block(self, lines: List[str], indent: int, depth: int) -> None:
+        pad = '  ' * indent
+        lines.append('%sbegin' % pad)
+        self._statements(lines, indent + 1, depth, max(1, self.statements // 4))
+        lines.append('%send' % pad)
+
+
+def generate_program(procedures: int = 4, depth: int = 2, expr_length: int = 4, statements: int = 8,
+                     variables: int = 8, seed: int = 0, **options) -> str:
+    """Детерминированная (при фиксированном seed) синтетическая программа"""
+    return ProgramGenerator(procedures, depth, expr_length, statements, variables, seed, **options).generate()
@@ -0,0 +1,150 @@
+"""Замеры фаз компилятора на синтетических программах растущего размера.
+
+Для каждого размера программа генерируется заново (с тем же seed), затем фазы
+parse, semantic, optimize и codegen прогоняются repeat раз; в результат попадает медиана времени.
+Пиковая память фазы измеряется отдельным прогоном под tracemalloc, чтобы трассировка
+выделений не искажала время. ilasm не нужен: compile_to_exe не вызывается.
+"""
+import math
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from benchmarks.generator import generate_program
+
+PHASES = ('parse', 'semantic', 'optimize', 'codegen')
+
+# Параметры программы при scale=1; при масштабе s число подпрограмм и размер раздела var умножаются на s,
+# так что размер программы растет линейно. Глубина, длина выражений и число операторов задаются отдельно
+BASE_SHAPE = {'procedures': 4, 'depth': 2, 'expr_length': 4, 'statements': 8, 'variables': 8,
+              'repeat_loops': True, 'compound_conditions': True}
+DEFAULT_SCALES = (1, 2, 4, 8)
+
+
+def program_shape(scale: int, base: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    shape = dict(base or BASE_SHAPE)
+    shape['procedures'] *= scale
+    shape['variables'] *= scale
+    return shape
+
+
+def _run_phases(source: str, grammar) -> Iterator[Tuple[str, object]]:
+    from semantic import SemanticAnalyzer
+    from codegen import MSILCodeGenerator
+    from optimize import optimize
+
+    ast = grammar.parse(source)
+    yield 'parse', ast
+    SemanticAnalyzer().visit(ast)
+    yield 'semantic', ast
+    ast, _ = optimize(ast)
+    yield 'optimize', ast
+    generator = MSILCodeGenerator()
+    generator.generate_program(ast)
+    yield 'codegen', generator
+
+
+def _timed_run(source: str, grammar) -> Dict[str, float]:
+    times = {}
+    start = time.perf_counter()
+    for phase, _ in _run_phases(source, grammar):
+        now = time.perf_counter()
+        times[phase] = now - start
+        start = now
+    return times
+
+
+def _memory_run(source: str, grammar) -> Dict[str, int]:
+    peaks = {}
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        for phase, _ in _run_phases(source, grammar):
+            peaks[phase] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def measure(source: str, grammar, repeat: int = 3, memory: bool = True) -> dict:
+    """Медиана времени фаз (мс), пик памяти фаз (КиБ) и размеры результата"""
+    from report import count_nodes
+
+    runs = [_timed_run(source, grammar) for _ in range(max(1, repeat))]
+    result = {
+        'source_bytes': len(source.encode('utf-8')),
+        'source_lines': source.count('\n'),
+        'phases': {},
+    }
+    for phase in PHASES:
+        samples = [run[phase] * 1000 for run in runs]
+        result['phases'][phase] = {
+            'median_ms': round(statistics.median(samples), 3),
+            'min_ms': round(min(samples), 3),
+        }
+    if memory:
+        for phase, peak in _memory_run(source, grammar).items():
+            result['phases'][phase]['peak_kib'] = round(peak / 1024, 1)
+
+    # Узлы считаются сразу после разбора: оптимизация переписывает то же дерево
+    for phase, output in _run_phases(source, grammar):
+        if phase == 'parse':
+            result['nodes'] = count_nodes(output)
+        elif phase == 'codegen':
+            result['instructions'] = output.instruction_count
+    return result
+
+
+def _scaling(points: List[dict]) -> Dict[str, Optional[float]]:
+    # Показатель степени k в time ~ nodes^k по крайним точкам: 1 - линейный рост, 2 - квадратичный
+    exponents = {}
+    first, last = points[0], points[-1]
+    for phase in PHASES:
+        t0, t1 = first['phases'][phase]['median_ms'], last['phases'][phase]['median_ms']
+        if len(points) < 2 or t0 <= 0 or t1 <= 0 or last['nodes'] == first['nodes']:
+            exponents[phase] = None
+        else:
+            exponents[phase] = round(math.log(t1 / t0) / math.log(last['nodes'] / first['nodes']), 3)
+    return exponents
+
+
+def run_suite(backends=('rd', 'pyparsing'), scales=DEFAULT_SCALES, repeat: int = 3, seed: int = 0,
+              memory: bool = True, base: Optional[Dict[str, int]] = None, progress=None) -> dict:
+    """Прогоняет все размеры для каждого backend'а; результат сериализуется в JSON как есть"""
+    from grammar import PascalGrammar
+
+    results = {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'seed': seed,
+        'base_shape': dict(base or BASE_SHAPE),
+        'backends': {},
+    }
+    for backend in backends:
+        grammar = PascalGrammar(backend=backend)
+        # Построение грамматики pyparsing не относится к размеру программы
+        if backend == 'pyparsing':
+            grammar.parser
+        points = []
+        for scale in scales:
+            shape = program_shape(scale, base)
+            source = generate_program(seed=seed, **shape)
+            point = {'scale': scale, 'shape': shape}
+            try:
+                point.update(measure(source, grammar, repeat, memory))
+            except Exception as e:
+                point['error'] = '%s: %s' % (type(e).__name__, e)
+            points.append(point)
+            if progress:
+                progress(backend, point)
+        ok = [p for p in points if 'error' not in p]
+        results['backends'][backend] = {
+            'points': points,
+            'scaling_exponent': _scaling(ok) if ok else None,
+        }
+    return results
@@ -1,27 +1,158 @@
 from nodes import *
-from typing import Dict, List, Set
+from symbols import *
+from diagnostics import tracer, DEBUG, INFO, WARNING, ERROR
+from peephole import PeepholeOptimizer
+from stackdepth import max_stack_depth
+from msil import Instruction, format_line, write_il
+from purity import is_pure
+from typing import Callable, Dict, List, Optional, Sequence, TextIO, Tuple
 import os
-import subprocess
 
+# Операция -> коды MSIL, которые ее вычисляют над двумя операндами на стеке
+BINOP_OPCODES: Dict[BinOp, Tuple[str, ...]] = {
+    BinOp.ADD: ("add",),
+    BinOp.SUB: ("sub",),
+    BinOp.MUL: ("mul",),
+    BinOp.DIVISION: ("div",),
+    BinOp.DIV: ("div",),
+    BinOp.MOD: ("rem",),
+    BinOp.GT: ("cgt",),
+    BinOp.LT: ("clt",),
+    BinOp.GE: ("clt", "ldc.i4.0", "ceq"),  # a >= b -> !(a < b)
+    BinOp.LE: ("cgt", "ldc.i4.0", "ceq"),  # a <= b -> !(a > b)
+    BinOp.EQUALS: ("ceq",),
+    BinOp.NEQUALS: ("ceq", "ldc.i4.0", "ceq"),  # a != b -> !(a == b)
+    BinOp.LOGICAL_AND: ("and",),
+    BinOp.LOGICAL_OR: ("or",),
+}
+
+# Сравнение в условии -> (переход, если оно истинно; переход, если ложно)
+COMPARE_BRANCHES: Dict[BinOp, Tuple[str, str]] = {
+    BinOp.GT: ("bgt", "ble"),
+    BinOp.LT: ("blt", "bge"),
+    BinOp.GE: ("bge", "blt"),
+    BinOp.LE: ("ble", "bgt"),
+    BinOp.EQUALS: ("beq", "bne.un"),
+    BinOp.NEQUALS: ("bne.un", "beq"),
+}
+
+# Тип элемента массива -> (загрузка элемента, сохранение элемента)
+ELEMENT_OPCODES: Dict[str, Tuple[str, str]] = {
+    "int32": ("ldelem.i4", "stelem.i4"),
+    "bool": ("ldelem.u1", "stelem.i1"),
+    "char": ("ldelem.u2", "stelem.i2"),
+}
+
+MSIL_TYPES: Dict[str, str] = {
+    "integer": "int32",
+    "boolean": "bool",
+    "char": "char",
+}
+
+# Генератор работает по дереву после SemanticAnalyzer: имена, вызовы и объявления подпрограмм
+# уже привязаны к символам (node.binding), поэтому объявления заново не собираются.
+# Глобальные переменные - статические поля класса Program, локальные - .locals метода,
+# параметры - аргументы метода, результат функции - локальная переменная result.
+# Тело каждого метода после генерации проходит peephole-оптимизацию (peephole=False - отключить),
+# затем в заголовок метода записывается точная глубина стека (.maxstack).
+# Операторы и выражения генерируются по таблицам "класс узла -> метод"
 class MSILCodeGenerator:
-    def __init__(self):
+    STATEMENTS: Dict[type, str] = {
+        AssignNode: "generate_assignment",
+        CallNode: "generate_call",
+        IfNode: "generate_if",
+        WhileNode: "generate_while",
+        RepeatNode: "generate_repeat",
+        ForNode: "generate_for",
+        StmtListNode: "generate_statement_list",
+    }
+    EXPRESSIONS: Dict[type, str] = {
+        LiteralNode: "generate_literal",
+        IdentNode: "generate_ident",
+        BinOpNode: "generate_binary_operation",
+        CallNode: "generate_call_expression",
+        ArrayIdentNode: "generate_array_load",
+    }
+    # Разрешенные обработчики (функции класса) по классу узла: заполняются при первой встрече класса,
+    # подклассы узлов (например, представления flatast) получают обработчик базового класса
+    _statement_handlers: Dict[type, Callable] = {}
+    _expression_handlers: Dict[type, Callable] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Подкласс генератора может переопределить методы - кэш у него свой
+        cls._statement_handlers = {}
+        cls._expression_handlers = {}
+
+    @classmethod
+    def _resolve_handler(cls, node_cls: type, names: Dict[type, str], handlers: Dict[type, Callable],
+                         fallback: str) -> Callable:
+        for base in node_cls.__mro__:
+            name = names.get(base)
+            if name is not None:
+                break
+        else:
+            name = fallback
+        handler = handlers[node_cls] = getattr(cls, name)
+        return handler
+
+    def __init__(self, peephole: bool = True):
         self.code = []
-        self.variables = {}  # var_name -> type
-        self.procedures = {}  # proc_name -> params
-        self.functions = {}  # func_name -> (params, return_type)
         self.label_counter = 0
-        self.local_vars = set()
-        self.current_function = None  # Текущая функция/процедура
-        self.current_params = {}  # Параметры текущей функции: name -> index
+        self.peephole = PeepholeOptimizer() if peephole else None
         
     def new_label(self) -> str:
         self.label_counter += 1
         return f"L{self.label_counter}"
     
-    def emit(self, instruction: str):
-        self.code.append(instruction)
+    def emit(self, line: str):
+        """Готовая строка IL: заголовок, директива, скобка"""
+        self.code.append(line)
+
+    def op(self, opcode: str, operand=None) -> None:
+        self.code.append(Instruction(opcode, operand))
+
+    def mark(self, label: str) -> None:
+        self.code.append(Instruction(label=label))
+
+    def emit_maxstack(self) -> int:
+        """Заглушка .maxstack, которую заполнит finish_body; возвращает ее позицию в self.code"""
+        self.emit("    .maxstack 0")
+        return len(self.code) - 1
+
+    def finish_body(self, maxstack: int, start: int, local_names: Sequence[str] = ()) -> None:
+        """Оптимизирует инструкции тела метода, начиная с self.code[start], и заполняет .maxstack"""
+        if self.peephole is not None:
+            self.code[start:] = self.peephole.optimize(self.code[start:], local_names)
+        self.code[maxstack] = f"    .maxstack {max_stack_depth(self.code[start:])}"
+
+    @property
+    def instruction_count(self) -> int:
+        """Число инструкций MSIL в сгенерированном коде (без директив, меток и скобок)"""
+        count = 0
+        for line in self.code:
+            if type(line) is Instruction and line.opcode is not None:
+                count += 1
+        return count
+
+    def text(self) -> str:
+        return "\n".join(map(format_line, self.code))
+
+    def write(self, f: TextIO) -> int:
+        """Пишет сгенерированный IL в файл по частям; возвращает число символов"""
+        return write_il(self.code, f)
     
     def generate_program(self, program: ProgramNode) -> str:
+        """IL программы одной строкой; для записи в файл без промежуточной строки - generate() и write()"""
+        self.generate(program)
+        return self.text()
+
+    def generate(self, program: ProgramNode) -> None:
+        """Заполняет self.code записями IL программы"""
+        program_symbol = program.binding
+        if program_symbol is None:
+            raise Exception('Program is not analyzed: run SemanticAnalyzer before code generation')
+
         self.emit(".assembly extern mscorlib {}")
         self.emit(".assembly program")
         self.emit("{")
@@ -33,498 +164,356 @@ class MSILCodeGenerator:
         self.emit(".class private auto ansi beforefieldinit Program")
         self.emit("       extends [mscorlib]System.Object")
         self.emit("{")
-          # Анализируем структуру AST программы
-        if hasattr(program, 'childs') and len(program.childs) >= 2:
-            print(f"DEBUG: Program has {len(program.childs)} children")
-            
-            # Ожидаем структуру: [IdentNode (имя), DeclSectionNode (объявления), StmtListNode (основная программа)]
-            decl_section = None
-            main_stmts = None
-            
-            for i, child in enumerate(program.childs):
-                print(f"DEBUG: Child {i}: {type(child).__name__}")
-                if isinstance(child, IdentNode):
-                    # Имя программы, пропускаем
+
+        # Глобальные переменные
+        for symbol in program_symbol.locals:
+            self.emit(f"  .field private static {self.symbol_msil_type(symbol)} {symbol.name}")
+
+        # Функции и процедуры
+        decl_section = program.decl_section
+        if isinstance(decl_section, DeclSectionNode):
+            for decl in decl_section.decls:
+                if not isinstance(decl, (ProcedureDeclNode, FunctionDeclNode)):
                     continue
-                elif hasattr(child, '__class__') and 'DeclSection' in child.__class__.__name__:
-                    # Секция объявлений
-                    decl_section = child
-                elif isinstance(child, StmtListNode):
-                    # Основная программа
-                    main_stmts = child
-                elif isinstance(child, BlockNode):
-                    # Если все-таки BlockNode
-                    decl_section = child
-                    main_stmts = child.stmt_list
-            
-            # Собираем информацию об объявлениях
-            if decl_section:
-                self.collect_declarations(decl_section)
-                
-                # Генерируем функции и процедуры
-                if hasattr(decl_section, 'childs'):
-                    for decl in decl_section.childs:
-                        if isinstance(decl, FunctionDeclNode):
-                            self.generate_function(decl)
-                        elif isinstance(decl, ProcedureDeclNode):
-                            self.generate_procedure(decl)
-          # Предварительный сбор локальных переменных из основной программы
-        main_statements = None
-        if hasattr(program, 'childs') and len(program.childs) > 0:
-            for child in program.childs:
-                if isinstance(child, StmtListNode):
-                    main_statements = child
-                    break
-        
-        if main_statements:
-            self.collect_local_variables_from_statements(main_statements)
-        
+                if decl.binding is None:
+                    # Объявление с ошибкой пропущено анализатором
+                    if tracer.warning:
+                        tracer.event(WARNING, 'codegen', 'routine skipped', name=decl.name.name)
+                elif isinstance(decl, FunctionDeclNode):
+                    self.generate_function(decl)
+                else:
+                    self.generate_procedure(decl)
+
         # Генерация главной функции
         self.emit("  .method private hidebysig static void Main(string[] args) cil managed")
         self.emit("  {")
         self.emit("    .entrypoint")
-        self.emit("    .maxstack 8")
-        
-        # Генерация локальных переменных
-        if self.local_vars:
-            locals_decl = "    .locals init ("
-            local_list = []
-            for var_name in self.local_vars:
-                var_type = self.variables.get(var_name, "integer")
-                local_list.append(f"{self.get_msil_type(var_type)} {var_name}")
-            locals_decl += ", ".join(local_list) + ")"
-            self.emit(locals_decl)
-          # Генерация тела программы
-        if main_stmts:
-            self.generate_statement_list(main_stmts)
-        elif hasattr(program, 'childs') and len(program.childs) > 0:
-            # Fallback: ищем последний StmtListNode
-            for child in reversed(program.childs):
-                if isinstance(child, StmtListNode):
-                    self.generate_statement_list(child)
-                    break
-        elif hasattr(program, 'stmt_list') and program.stmt_list:
+        maxstack = self.emit_maxstack()
+        start = len(self.code)
+        self.emit_array_allocations(program_symbol.locals)
+        if program.stmt_list:
             self.generate_statement_list(program.stmt_list)
-        
-        self.emit("    ret")
+        self.op("ret")
+        self.finish_body(maxstack, start)
         self.emit("  }")
-        
+
         self.emit("}")
-        
-        return "\n".join(self.code)
-    
-    def collect_declarations(self, decl_section):
-        """Собираем информацию о объявлениях переменных, функций и процедур"""
-        if hasattr(decl_section, 'childs'):
-            for child in decl_section.childs:
-                print(f"DEBUG: Collecting decl child: {type(child).__name__}")
-                if hasattr(child, '__class__') and child.__class__.__name__ == 'VarSectionNode':
-                    if hasattr(child, 'childs'):
-                        for var_child in child.childs:
-                            if isinstance(var_child, VarDeclNode):
-                                self.collect_var_declaration(var_child)
-                elif isinstance(child, VarDeclNode):
-                    self.collect_var_declaration(child)
-                elif isinstance(child, ArrayDeclNode):
-                    self.collect_array_declaration(child)
-                elif isinstance(child, ProcedureDeclNode):
-                    self.collect_procedure(child)
-                elif isinstance(child, FunctionDeclNode):
-                    self.collect_function(child)
-        elif hasattr(decl_section, 'decls'):
-            for decl in decl_section.decls:
-                if isinstance(decl, VarsDeclNode):
-                    for var_decl in decl.var_decs:
-                        self.collect_var_declaration(var_decl)
-                elif isinstance(decl, ProcedureDeclNode):
-                    self.collect_procedure(decl)
-                elif isinstance(decl, FunctionDeclNode):
-                    self.collect_function(decl)
+
+    def symbol_msil_type(self, symbol: VarSymbol) -> str:
+        msil_type = self.element_msil_type(symbol)
+        return msil_type + '[]' if isinstance(symbol, ArraySymbol) else msil_type
+
+    def element_msil_type(self, symbol: VarSymbol) -> str:
+        """Тип значения переменной (для массива - тип элемента)"""
+        return self.get_msil_type(symbol.type.name if symbol.type is not None else 'integer')
+
+    def param_signature(self, routine: Symbol) -> str:
+        return ", ".join(self.symbol_msil_type(param) for param in routine.params)
+
+    def emit_locals(self, locals_init: List[str]) -> None:
+        if locals_init:
+            self.emit(f"    .locals init ({', '.join(locals_init)})")
+
+    def emit_load(self, symbol: VarSymbol) -> None:
+        kind = symbol.kind
+        if kind == ARGUMENT:
+            self.op("ldarg", symbol.index)
+        elif kind == GLOBAL:
+            self.op("ldsfld", f"{self.symbol_msil_type(symbol)} Program::{symbol.name}")
+        elif kind == RESULT:
+            self.op("ldloc", "result")
         else:
-            self.collect_var_declarations(decl_section)
-    
-    def collect_var_declarations(self, vars_decl):
-        if hasattr(vars_decl, 'var_decs'):
-            for var_decl in vars_decl.var_decs:
-                self.collect_var_declaration(var_decl)
-        elif hasattr(vars_decl, 'childs'):
-            for child in vars_decl.childs:
-                if isinstance(child, VarDeclNode):
-                    self.collect_var_declaration(child)
-    
-    def collect_var_declaration(self, var_decl: VarDeclNode):
-        for ident in var_decl.ident_list.idents:
-            self.variables[ident.name] = var_decl.vars_type.name
-            self.local_vars.add(ident.name)
-            print(f"DEBUG: Collected variable {ident.name}: {var_decl.vars_type.name}")
-    
-    def collect_array_declaration(self, array_decl: ArrayDeclNode):
-        if hasattr(array_decl, 'name') and hasattr(array_decl.name, 'idents'):
-            for ident in array_decl.name.idents:
-                self.variables[ident.name] = f"array_{array_decl.vars_type.name}"
-                self.local_vars.add(ident.name)
-    
-    def collect_procedure(self, proc_decl: ProcedureDeclNode):
-        params = []
-        if proc_decl.params:
-            for param in proc_decl.params:
-                if hasattr(param, 'vars_list'):
-                    for var_decl in param.vars_list:
-                        if hasattr(var_decl, 'ident_list'):
-                            for ident in var_decl.ident_list.idents:
-                                params.append((ident.name, var_decl.vars_type.name))
-        self.procedures[proc_decl.name.name] = params
-        print(f"DEBUG: Collected procedure {proc_decl.name.name} with params: {params}")
-    
-    def collect_function(self, func_decl: FunctionDeclNode):
-        params = []
-        if func_decl.params:
-            # func_decl.params это кортеж с ParamsNode
-            if hasattr(func_decl.params, '__iter__'):
-                for param_node in func_decl.params:
-                    if hasattr(param_node, 'vars_list'):
-                        # ParamsNode имеет vars_list как кортеж (IdentListNode, TypeSpecNode)
-                        if len(param_node.vars_list) >= 2:
-                            ident_list = param_node.vars_list[0]  # IdentListNode
-                            type_spec = param_node.vars_list[1]   # TypeSpecNode
-                            if hasattr(ident_list, 'idents') and hasattr(type_spec, 'name'):
-                                for ident in ident_list.idents:
-                                    params.append((ident.name, type_spec.name))
-                                    print(f"DEBUG: Function param from vars_list: {ident.name}:{type_spec.name}")
-                        else:
-                            # Старая обработка для совместимости
-                            for var_decl in param_node.vars_list:
-                                if hasattr(var_decl, 'ident_list'):
-                                    for ident in var_decl.ident_list.idents:
-                                        params.append((ident.name, var_decl.vars_type.name))
-                                else:
-                                    print(f"DEBUG: Unexpected var_decl structure: {type(var_decl)}")
-                    elif hasattr(param_node, 'childs'):
-                        # ParamsNode может иметь childs вместо vars_list
-                        if len(param_node.childs) >= 2:
-                            ident_list = param_node.childs[0]  # IdentListNode
-                            type_spec = param_node.childs[1]   # TypeSpecNode
-                            if hasattr(ident_list, 'idents') and hasattr(type_spec, 'name'):
-                                for ident in ident_list.idents:
-                                    params.append((ident.name, type_spec.name))
-                                    print(f"DEBUG: Function param from childs: {ident.name}:{type_spec.name}")
-        return_type = func_decl.return_type.name if func_decl.return_type else "integer"
-        self.functions[func_decl.name.name] = (params, return_type)
-        print(f"DEBUG: Collected function {func_decl.name.name} with params: {params}, return: {return_type}")    
-        
+            self.op("ldloc", symbol.name)
+
+    def emit_array_allocations(self, symbols: Sequence[VarSymbol]) -> None:
+        # Массивы создаются в начале метода, которому принадлежат (глобальные - в Main)
+        for symbol in symbols:
+            if isinstance(symbol, ArraySymbol):
+                self.op("ldc.i4", int(symbol.end) - int(symbol.start) + 1)
+                self.op("newarr", self.element_msil_type(symbol))
+                self.emit_store(symbol)
+
+    def emit_element_address(self, node: ArrayIdentNode, symbol: ArraySymbol) -> None:
+        """Ссылка на массив и индекс элемента от нуля - первые операнды ldelem/stelem"""
+        self.emit_load(symbol)
+        index = node.literal
+        if isinstance(index, LiteralNode) and type(index.value) is int:
+            self.op("ldc.i4", index.value - int(symbol.start))
+        else:
+            self.generate_expression(index)
+            if int(symbol.start):
+                self.op("ldc.i4", int(symbol.start))
+                self.op("sub")
+
+    def emit_store(self, symbol: VarSymbol) -> None:
+        kind = symbol.kind
+        if kind == ARGUMENT:
+            self.op("starg", symbol.index)
+        elif kind == GLOBAL:
+            self.op("stsfld", f"{self.symbol_msil_type(symbol)} Program::{symbol.name}")
+        elif kind == RESULT:
+            self.op("stloc", "result")
+        else:
+            self.op("stloc", symbol.name)
+
     def generate_procedure(self, proc_decl: ProcedureDeclNode):
-        proc_name = proc_decl.name.name
-        params = self.procedures.get(proc_name, [])
-        
-        print(f"DEBUG: Generating procedure {proc_name}")
-        
-        # Устанавливаем контекст текущей функции
-        old_function = self.current_function
-        old_params = self.current_params
-        old_local_vars = self.local_vars.copy()
-        self.current_function = proc_name
-        self.current_params = {}
-        self.local_vars = set()
-        
-        # Предварительный проход для сбора локальных переменных
-        if proc_decl.stmt_list:
-            self.collect_local_variables_from_statements(proc_decl.stmt_list)
-        
-        # Создаем сигнатуру метода
-        param_types = []
-        for i, (param_name, param_type) in enumerate(params):
-            param_types.append(self.get_msil_type(param_type))
-            self.current_params[param_name] = i
-        param_signature = ", ".join(param_types) if param_types else ""
-        
-        self.emit(f"  .method private hidebysig static void {proc_name}({param_signature}) cil managed")
+        symbol = proc_decl.binding
+
+        if tracer.debug:
+            tracer.event(DEBUG, 'codegen', 'generate procedure', name=symbol.name)
+
+        self.emit(f"  .method private hidebysig static void {symbol.name}({self.param_signature(symbol)}) cil managed")
         self.emit("  {")
-        self.emit("    .maxstack 8")
-        
-        # Объявляем локальные переменные процедуры
-        if self.local_vars:
-            locals_decl = "    .locals init ("
-            local_list = []
-            for var_name in self.local_vars:
-                var_type = self.variables.get(var_name, "integer")
-                local_list.append(f"{self.get_msil_type(var_type)} {var_name}")
-            locals_decl += ", ".join(local_list) + ")"
-            self.emit(locals_decl)
-        
+        maxstack = self.emit_maxstack()
+        self.emit_locals([f"{self.symbol_msil_type(var)} {var.name}" for var in symbol.locals])
+        start = len(self.code)
+        self.emit_array_allocations(symbol.locals)
+
         # Генерируем тело процедуры
         if proc_decl.stmt_list:
             self.generate_statement_list(proc_decl.stmt_list)
-        
-        self.emit("    ret")
+
+        self.op("ret")
+        self.finish_body(maxstack, start, [var.name for var in symbol.locals])
         self.emit("  }")
-        
-        # Восстанавливаем контекст
-        self.current_function = old_function
-        self.current_params = old_params
-        self.local_vars = old_local_vars    
 
     def generate_function(self, func_decl: FunctionDeclNode):
         """Генерируем MSIL код для функции"""
-        func_name = func_decl.name.name
-        func_info = self.functions.get(func_name, ([], "integer"))
-        params, return_type = func_info
-        
-        print(f"DEBUG: Generating function {func_name}")
-        
-        # Устанавливаем контекст текущей функции
-        old_function = self.current_function
-        old_params = self.current_params
-        old_local_vars = self.local_vars.copy()
-        self.current_function = func_name
-        self.current_params = {}
-        self.local_vars = set()
-        
-        # Предварительный проход для сбора локальных переменных
-        if func_decl.stmt_list:
-            self.collect_local_variables_from_statements(func_decl.stmt_list)
-        
-        # Создаем сигнатуру метода
-        param_types = []
-        for i, (param_name, param_type) in enumerate(params):
-            param_types.append(self.get_msil_type(param_type))
-            self.current_params[param_name] = i
-        param_signature = ", ".join(param_types) if param_types else ""
-        return_msil_type = self.get_msil_type(return_type)
-        
-        self.emit(f"  .method private hidebysig static {return_msil_type} {func_name}({param_signature}) cil managed")
+        symbol = func_decl.binding
+        return_msil_type = self.symbol_msil_type(symbol.result)
+
+        if tracer.debug:
+            tracer.event(DEBUG, 'codegen', 'generate function', name=symbol.name)
+
+        self.emit(f"  .method private hidebysig static {return_msil_type} {symbol.name}"
+                  f"({self.param_signature(symbol)}) cil managed")
         self.emit("  {")
-        self.emit("    .maxstack 8")
-        
-        # Добавляем локальную переменную для возвращаемого значения
-        locals_init = [f"{return_msil_type} result"]
-        
-        # Собираем локальные переменные из тела функции
-        if self.local_vars:
-            for var_name in self.local_vars:
-                var_type = self.variables.get(var_name, "integer")
-                locals_init.append(f"{self.get_msil_type(var_type)} {var_name}")
-        
-        if locals_init:
-            self.emit(f"    .locals init ({', '.join(locals_init)})")
-        
+        maxstack = self.emit_maxstack()
+
+        # Локальная переменная для возвращаемого значения идет первой
+        self.emit_locals([f"{return_msil_type} result"] +
+                         [f"{self.symbol_msil_type(var)} {var.name}" for var in symbol.locals])
+        start = len(self.code)
+        self.emit_array_allocations(symbol.locals)
+
         # Генерируем тело функции
         if func_decl.stmt_list:
             self.generate_statement_list(func_decl.stmt_list)
-        
+
         # Возвращаем результат
-        self.emit("    ldloc result")
-        self.emit("    ret")
+        self.op("ldloc", "result")
+        self.op("ret")
+        self.finish_body(maxstack, start, ["result"] + [var.name for var in symbol.locals])
         self.emit("  }")
-        
-        # Восстанавливаем контекст
-        self.current_function = old_function
-        self.current_params = old_params
-        self.local_vars = old_local_vars
-    
+
     def generate_statement_list(self, stmt_list: StmtListNode):
         for stmt in stmt_list.stmts:
             self.generate_statement(stmt)
     
     def generate_statement(self, stmt: StmtNode):
-        if isinstance(stmt, AssignNode):
-            self.generate_assignment(stmt)
-        elif isinstance(stmt, CallNode):
-            self.generate_call(stmt)
-        elif isinstance(stmt, IfNode):
-            self.generate_if(stmt)
-        elif isinstance(stmt, WhileNode):
-            self.generate_while(stmt)
-        elif isinstance(stmt, ForNode):
-            self.generate_for(stmt)        
-        elif isinstance(stmt, StmtListNode):
-            self.generate_statement_list(stmt)
-    
+        handler = self._statement_handlers.get(type(stmt))
+        if handler is None:
+            handler = self._resolve_handler(type(stmt), self.STATEMENTS, self._statement_handlers,
+                                            "generate_unsupported_statement")
+        handler(self, stmt)
+
+    def generate_expression(self, expr: ExprNode):
+        handler = self._expression_handlers.get(type(expr))
+        if handler is None:
+            handler = self._resolve_handler(type(expr), self.EXPRESSIONS, self._expression_handlers,
+                                            "generate_unsupported_expression")
+        handler(self, expr)
+
+    def generate_unsupported_statement(self, stmt: StmtNode):
+        if tracer.warning:
+            tracer.event(WARNING, 'codegen', 'statement not supported, skipped', node=type(stmt).__name__)
+
+    def generate_unsupported_expression(self, expr: ExprNode):
+        # Значение все равно нужно положить на стек, иначе разойдется его глубина
+        self.op("ldc.i4.0")
+        if tracer.warning:
+            tracer.event(WARNING, 'codegen', 'expression not supported, loading 0', node=type(expr).__name__)
+
     def generate_assignment(self, assign: AssignNode):
+        var = assign.var
+        symbol = var.binding
+
+        if isinstance(var, ArrayIdentNode) and isinstance(symbol, ArraySymbol):
+            # Элемент массива: ссылка и индекс кладутся на стек раньше значения
+            self.emit_element_address(var, symbol)
+            self.generate_expression(assign.val)
+            self.op(ELEMENT_OPCODES[self.element_msil_type(symbol)][1])
+            return
+
         # Генерируем выражение для значения
         self.generate_expression(assign.val)
-        
+
         # Сохраняем в переменную
-        if isinstance(assign.var, IdentNode):
-            var_name = assign.var.name
-            
-            # Проверяем, это присваивание возвращаемого значения функции
-            if (self.current_function and 
-                var_name == self.current_function and 
-                var_name in self.functions):
-                # Это присваивание возвращаемого значения функции (например f := n + 1)
-                self.emit(f"    stloc result")
-                print(f"DEBUG: Function return assignment: {var_name} := ...")
-            elif var_name in self.local_vars:
-                # Это локальная переменная
-                self.emit(f"    stloc {var_name}")
-            elif var_name in self.current_params:
-                # Это параметр функции (обычно только для чтения, но возможно присваивание)
-                param_index = self.current_params[var_name]
-                self.emit(f"    starg {param_index}")
-            else:
-                # Неизвестная переменная, добавляем как локальную
-                self.local_vars.add(var_name)
-                self.variables[var_name] = "integer"
-                self.emit(f"    stloc {var_name}")
-                
-        elif isinstance(assign.var, ArrayIdentNode):
-            self.emit(f"    stloc {assign.var.name.name}")
-    
-    def generate_expression(self, expr: ExprNode):
-        if isinstance(expr, LiteralNode):
-            self.generate_literal(expr)
-        elif isinstance(expr, IdentNode):
-            var_name = expr.name
-            if var_name in self.current_params:
-                # Это параметр функции
-                param_index = self.current_params[var_name]
-                self.emit(f"    ldarg {param_index}")
-                print(f"DEBUG: Loading parameter {var_name} (arg {param_index})")
-            elif var_name in self.local_vars:
-                # Это локальная переменная
-                self.emit(f"    ldloc {var_name}")
-            else:
-                # Неизвестная переменная, загружаем как 0
-                self.emit(f"    ldc.i4.0")
-                print(f"DEBUG: Unknown variable {var_name}, loading 0")
-        elif isinstance(expr, BinOpNode):
-            self.generate_binary_operation(expr)
-        elif isinstance(expr, CallNode):
-            self.generate_call_expression(expr)
-    
+        if not isinstance(symbol, VarSymbol) or isinstance(symbol, ArraySymbol):
+            raise Exception("Cannot assign to unbound name '%s': run SemanticAnalyzer before code generation" % var)
+        self.emit_store(symbol)
+
+    def generate_ident(self, expr: IdentNode):
+        symbol = expr.binding
+        if not isinstance(symbol, VarSymbol):
+            raise Exception("Unbound identifier '%s': run SemanticAnalyzer before code generation" % expr.name)
+        self.emit_load(symbol)
+
+    def generate_array_load(self, expr: ArrayIdentNode):
+        symbol = expr.binding
+        if not isinstance(symbol, ArraySymbol):
+            raise Exception("Unbound array '%s': run SemanticAnalyzer before code generation" % expr.name)
+        self.emit_element_address(expr, symbol)
+        self.op(ELEMENT_OPCODES[self.element_msil_type(symbol)][0])
+
     def generate_literal(self, literal: LiteralNode):
-        value = literal.literal
-        if value.isdigit() or (value.startswith('-') and value[1:].isdigit()):
-            self.emit(f"    ldc.i4 {value}")
-        elif value.startswith("'") and value.endswith("'"):
-            self.emit(f"    ldstr {value}")
-        elif value in ('True', 'False'):
-            val = "1" if value == 'True' else "0"
-            self.emit(f"    ldc.i4 {val}")
+        # Тип значения разобран в LiteralNode: числа со знаком (+5, -5) - тоже int
+        value = literal.value
+        if type(value) is int:
+            self.op("ldc.i4", value)
+        elif type(value) is bool:
+            self.op("ldc.i4", 1 if value else 0)
+        elif literal.literal.startswith("'") and literal.literal.endswith("'"):
+            if len(value) == 1:
+                # Символ - код UTF-16 на стеке, как и значение переменной типа char
+                self.op("ldc.i4", ord(value))
+            else:
+                # Строка из нескольких символов (только для вывода) - System.String
+                self.op("ldstr", '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"')
+        else:
+            raise Exception("Unsupported literal '%s'" % literal.literal)
     
     def generate_binary_operation(self, binop: BinOpNode):
+        if binop.op in (BinOp.LOGICAL_AND, BinOp.LOGICAL_OR) and not is_pure(binop.arg2):
+            # Правый операнд с вызовом вычисляется, только если левый не решил результат
+            false_label = self.new_label()
+            end_label = self.new_label()
+            self.generate_branch(binop, false_label, False)
+            self.op("ldc.i4.1")
+            self.op("br", end_label)
+            self.mark(false_label)
+            self.op("ldc.i4.0")
+            self.mark(end_label)
+            return
         self.generate_expression(binop.arg1)
         self.generate_expression(binop.arg2)
-        
-        op_map = {
-            BinOp.ADD: "add",
-            BinOp.SUB: "sub", 
-            BinOp.MUL: "mul",
-            BinOp.DIVISION: "div",
-            BinOp.DIV: "div",
-            BinOp.MOD: "rem",
-            BinOp.GT: "cgt",
-            BinOp.LT: "clt",
-            BinOp.GE: ["clt", "ldc.i4.0", "ceq"], # a >= b -> !(a < b)
-            BinOp.LE: ["cgt", "ldc.i4.0", "ceq"], # a <= b -> !(a > b)
-            BinOp.EQUALS: "ceq",
-            BinOp.NEQUALS: ["ceq", "ldc.i4.0", "ceq"], # a != b -> !(a == b)
-            BinOp.LOGICAL_AND: "and",
-            BinOp.LOGICAL_OR: "or"
-        }
-        
-        if binop.op in op_map:
-            op_code = op_map[binop.op]
-            if isinstance(op_code, list):
-                for instr in op_code:
-                    self.emit(f"    {instr}")
-            else:
-                self.emit(f"    {op_code}")
+        for opcode in BINOP_OPCODES[binop.op]:
+            self.op(opcode)
     
     def generate_call(self, call: CallNode):
         """Генерируем вызов процедуры (не возвращает значение)"""
-        func_name = call.func.name
-        
-        if func_name == "writeln":
-            # Генерируем параметры
-            for param in call.params:
-                self.generate_expression(param)
-            self.emit("    call void [mscorlib]System.Console::WriteLine(int32)")
-        elif func_name == "write":
-            for param in call.params:
-                self.generate_expression(param)
-            self.emit("    call void [mscorlib]System.Console::Write(int32)")
-        elif func_name in self.procedures:
+        symbol = call.binding
+
+        if isinstance(symbol, BuiltinFunction):
+            name = symbol.name.lower()
+            if name in ("writeln", "write"):
+                # Каждый аргумент выводится своим вызовом; перевод строки - после последнего
+                params = call.params
+                for i, param in enumerate(params):
+                    self.generate_expression(param)
+                    method = "WriteLine" if name == "writeln" and i == len(params) - 1 else "Write"
+                    self.op("call", f"void [mscorlib]System.Console::{method}({self.console_type(param)})")
+                if name == "writeln" and not params:
+                    self.op("call", "void [mscorlib]System.Console::WriteLine()")
+            elif tracer.warning:
+                tracer.event(WARNING, 'codegen', 'builtin not supported', name=symbol.name)
+        elif isinstance(symbol, ProcedureSymbol):
             # Вызов пользовательской процедуры
-            params = self.procedures[func_name]
-            
-            # Генерируем параметры
-            for i, param in enumerate(call.params):
+            for param in call.params:
                 self.generate_expression(param)
-            
-            # Создаем сигнатуру вызова
-            param_types = []
-            for param_name, param_type in params:
-                param_types.append(self.get_msil_type(param_type))
-            param_signature = ", ".join(param_types) if param_types else ""
-            
-            self.emit(f"    call void Program::{func_name}({param_signature})")
-        elif func_name in self.functions:
+            self.op("call", f"void Program::{symbol.name}({self.param_signature(symbol)})")
+        elif isinstance(symbol, FunctionSymbol):
             # Вызов пользовательской функции (но результат игнорируется)
             self.generate_call_expression(call)
-            self.emit("    pop")  # Убираем результат со стека
+            self.op("pop")  # Убираем результат со стека
+        else:
+            raise Exception("Unbound procedure '%s': run SemanticAnalyzer before code generation" % call.func.name)
     
     def generate_call_expression(self, call: CallNode):
         """Генерируем вызов функции (возвращает значение)"""
-        func_name = call.func.name
-        
-        if func_name in self.functions:
-            # Вызов пользовательской функции
-            func_info = self.functions[func_name]
-            params, return_type = func_info
-            
-            print(f"DEBUG: Generating function call {func_name} with {len(call.params)} params")
-            
-            # Генерируем параметры
-            for i, param in enumerate(call.params):
-                print(f"DEBUG: Generating param {i}")
-                self.generate_expression(param)
-            
-            # Создаем сигнатуру вызова
-            param_types = []
-            for param_name, param_type in params:
-                param_types.append(self.get_msil_type(param_type))
-            param_signature = ", ".join(param_types) if param_types else ""
-            return_msil_type = self.get_msil_type(return_type)
-            
-            self.emit(f"    call {return_msil_type} Program::{func_name}({param_signature})")
-        else:
-            # Неизвестная функция, возвращаем 0
-            print(f"DEBUG: Unknown function {func_name}, returning 0")
-            self.emit("    ldc.i4.0")
+        symbol = call.binding
+        if not isinstance(symbol, FunctionSymbol):
+            raise Exception("Unbound function '%s': run SemanticAnalyzer before code generation" % call.func.name)
+
+        if tracer.debug:
+            tracer.event(DEBUG, 'codegen', 'generate call', name=symbol.name, args=len(call.params))
+
+        # Генерируем параметры
+        for param in call.params:
+            self.generate_expression(param)
+
+        return_msil_type = self.symbol_msil_type(symbol.result)
+        self.op("call", f"{return_msil_type} Program::{symbol.name}({self.param_signature(symbol)})")
     
+    def generate_branch(self, cond: ExprNode, target: str, when: bool):
+        """Переход на target, если условие cond равно when; иначе выполнение идет дальше.
+        and/or превращаются в цепочку переходов: правый операнд не вычисляется, если результат
+        уже известен по левому; сравнения - в переходы по сравнению (bgt, bne.un ...)"""
+        if isinstance(cond, BinOpNode):
+            op = cond.op
+            if op == BinOp.LOGICAL_AND or op == BinOp.LOGICAL_OR:
+                if (op == BinOp.LOGICAL_AND) == when:
+                    # Переход, только если оба операнда дают when: левый с другим значением пропускает правый
+                    skip_label = self.new_label()
+                    self.generate_branch(cond.arg1, skip_label, not when)
+                    self.generate_branch(cond.arg2, target, when)
+                    self.mark(skip_label)
+                else:
+                    # Переход, если любой из операндов дает when
+                    self.generate_branch(cond.arg1, target, when)
+                    self.generate_branch(cond.arg2, target, when)
+                return
+            branches = COMPARE_BRANCHES.get(op)
+            if branches is not None:
+                self.generate_expression(cond.arg1)
+                self.generate_expression(cond.arg2)
+                self.op(branches[0] if when else branches[1], target)
+                return
+        elif isinstance(cond, LiteralNode) and type(cond.value) is bool:
+            if cond.value == when:
+                self.op("br", target)
+            return
+        self.generate_expression(cond)
+        self.op("brtrue" if when else "brfalse", target)
+
     def generate_if(self, if_stmt: IfNode):
         else_label = self.new_label()
         end_label = self.new_label()
         
         # Генерируем условие
-        self.generate_expression(if_stmt.cond)
-        self.emit(f"    brfalse {else_label}")
+        self.generate_branch(if_stmt.cond, else_label, False)
         
         # Генерируем then-ветку
         self.generate_statement(if_stmt.then_stmt)
-        self.emit(f"    br {end_label}")
+        self.op("br", end_label)
         
         # Генерируем else-ветку
-        self.emit(f"  {else_label}:")
+        self.mark(else_label)
         if if_stmt.else_stmt:
             self.generate_statement(if_stmt.else_stmt)
         
-        self.emit(f"  {end_label}:")
+        self.mark(end_label)
     
     def generate_while(self, while_stmt: WhileNode):
         start_label = self.new_label()
         end_label = self.new_label()
         
-        self.emit(f"  {start_label}:")
-        self.generate_expression(while_stmt.cond)
-        self.emit(f"    brfalse {end_label}")
+        self.mark(start_label)
+        self.generate_branch(while_stmt.cond, end_label, False)
         
         self.generate_statement(while_stmt.stmt_list)
-        self.emit(f"    br {start_label}")
+        self.op("br", start_label)
         
-        self.emit(f"  {end_label}:")
+        self.mark(end_label)
     
+    def generate_repeat(self, repeat_stmt: RepeatNode):
+        start_label = self.new_label()
+
+        # Тело выполняется хотя бы раз; цикл повторяется, пока условие ложно
+        self.mark(start_label)
+        self.generate_statement(repeat_stmt.stmt_list)
+        self.generate_branch(repeat_stmt.cond, start_label, False)
+
     def generate_for(self, for_stmt: ForNode):
         start_label = self.new_label()
         end_label = self.new_label()
@@ -533,54 +522,51 @@ class MSILCodeGenerator:
         if for_stmt.init:
             self.generate_statement(for_stmt.init)
         
-        self.emit(f"  {start_label}:")
+        self.mark(start_label)
         
         # Проверка условия (i <= to)
-        if isinstance(for_stmt.init, AssignNode):
-            var_name = for_stmt.init.var.name if isinstance(for_stmt.init.var, IdentNode) else "i"
-            self.emit(f"    ldloc {var_name}")
+        counter = self.for_counter(for_stmt)
+        if counter is not None:
+            self.emit_load(counter)
             self.generate_expression(for_stmt.to)
-            self.emit(f"    cgt")
-            self.emit(f"    brtrue {end_label}")
+            self.op("cgt")
+            self.op("brtrue", end_label)
         
         # Тело цикла
         if for_stmt.body:
             self.generate_statement(for_stmt.body)
         
         # Инкремент
-        if isinstance(for_stmt.init, AssignNode):
-            var_name = for_stmt.init.var.name if isinstance(for_stmt.init.var, IdentNode) else "i"
-            self.emit(f"    ldloc {var_name}")
-            self.emit(f"    ldc.i4.1")
-            self.emit(f"    add")
-            self.emit(f"    stloc {var_name}")
-        
-        self.emit(f"    br {start_label}")
-        self.emit(f"  {end_label}:")
+        if counter is not None:
+            self.emit_load(counter)
+            self.op("ldc.i4.1")
+            self.op("add")
+            self.emit_store(counter)
+        
+        self.op("br", start_label)
+        self.mark(end_label)
     
+    def for_counter(self, for_stmt: ForNode) -> Optional[VarSymbol]:
+        """Переменная цикла for (из присваивания в init)"""
+        init = for_stmt.init
+        if isinstance(init, AssignNode) and isinstance(init.var, IdentNode) and isinstance(init.var.binding, VarSymbol):
+            return init.var.binding
+        return None
+
+    def console_type(self, expr: ExprNode) -> str:
+        """Тип аргумента Console.Write/WriteLine по типу, записанному анализатором"""
+        if isinstance(expr, LiteralNode) and type(expr.value) is str and len(expr.value) != 1:
+            return 'string'
+        expr_type = expr.expr_type if isinstance(expr, AstNode) else None
+        return self.get_msil_type(expr_type or 'integer')
+
     def get_msil_type(self, pascal_type: str) -> str:
-        type_map = {
-            "integer": "int32",
-            "boolean": "bool", 
-            "char": "char"
-        }
-        return type_map.get(pascal_type.lower(), "int32")
-
-    def collect_local_variables_from_statements(self, stmt_list: StmtListNode):
-        """Предварительный проход для сбора локальных переменных из присваиваний"""
-        for stmt in stmt_list.stmts:
-            if isinstance(stmt, AssignNode):
-                if isinstance(stmt.var, IdentNode):
-                    var_name = stmt.var.name
-                    if var_name not in self.current_params and var_name != self.current_function:
-                        self.local_vars.add(var_name)
-                        self.variables[var_name] = "integer"
-                        print(f"DEBUG: Pre-collected local var: {var_name}")
-            elif isinstance(stmt, StmtListNode):
-                self.collect_local_variables_from_statements(stmt)
-    
-def compile_to_exe(msil_code: str, output_name: str = "program") -> bool:
-    """Компилирует MSIL код в исполняемый файл"""
+        return MSIL_TYPES.get(pascal_type.lower(), "int32")
+
+def compile_to_exe(msil_code, output_name: str = "program") -> bool:
+    """Компилирует MSIL код в исполняемый файл.
+    msil_code - строка IL или MSILCodeGenerator после generate() (тогда IL пишется в файл по частям)"""
+    import subprocess
     
     # Путь к ilasm.exe
     ilasm_path = r"C:\Windows\Microsoft.NET\Framework\v4.0.30319\ilasm.exe"
@@ -588,12 +574,16 @@ def compile_to_exe(msil_code: str, output_name: str = "program") -> bool:
     # Сохраняем MSIL код в файл
     il_file = f"{output_name}.il"
     with open(il_file, 'w') as f:
-        f.write(msil_code)
+        if isinstance(msil_code, str):
+            f.write(msil_code)
+        else:
+            msil_code.write(f)
     
     try:
         # Проверяем существование ilasm.exe
         if not os.path.exists(ilasm_path):
-            print(f"Ошибка: ilasm.exe не найден по пути {ilasm_path}")
+            if tracer.error:
+                tracer.event(ERROR, 'codegen', 'ilasm not found', path=ilasm_path)
             return False
             
         # Компилируем с помощью ilasm
@@ -605,23 +595,22 @@ def compile_to_exe(msil_code: str, output_name: str = "program") -> bool:
         ], capture_output=True, text=True)
         
         if result.returncode == 0:
-            print(f"Успешно скомпилирован {output_name}.exe")
-            if result.stdout:
-                print(f"Вывод компилятора: {result.stdout}")
+            if tracer.info:
+                tracer.event(INFO, 'codegen', 'compiled', output=output_name + '.exe', stdout=result.stdout)
             return True
         else:
-            print(f"Ошибка компиляции (код возврата: {result.returncode})")
-            if result.stderr:
-                print(f"Ошибки: {result.stderr}")
-            if result.stdout:
-                print(f"Вывод: {result.stdout}")
+            if tracer.error:
+                tracer.event(ERROR, 'codegen', 'ilasm failed', returncode=result.returncode,
+                             stderr=result.stderr, stdout=result.stdout)
             return False
             
     except Exception as e:
-        print(f"Исключение при компиляции: {e}")
+        if tracer.error:
+            tracer.event(ERROR, 'codegen', 'ilasm exception', error=e)
         return False
     finally:
         # Удаляем временный IL файл только при успешной компиляции
         # Оставляем его для отладки при ошибках
         if os.path.exists(il_file):
-            print(f"IL файл сохранен как: {il_file}")
+            if tracer.info:
+                tracer.event(INFO, 'codegen', 'il file kept', path=il_file)
@@ -0,0 +1,104 @@
+"""Уровневая трассировка компилятора.
+
+Точки трассировки оформляются так, чтобы при выключенном уровне не выполнялось ничего, кроме
+проверки атрибута - ни форматирования строк, ни str() узлов:
+
+    if tracer.debug:
+        tracer.event(DEBUG, 'semantic', 'define', symbol=symbol)
+
+Событие - словарь {'time', 'level', 'component', 'message', ...поля}; значения полей
+форматируются только приемником. Уровень и приемник задаются через configure() или
+переменные окружения PASCAL_TRACE (debug|info|warning|error|off) и PASCAL_TRACE_FORMAT (text|json).
+"""
+import json
+import os
+import sys
+import time
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+OFF = 100
+
+LEVELS = {'debug': DEBUG, 'info': INFO, 'warning': WARNING, 'error': ERROR, 'off': OFF}
+_LEVEL_NAMES = {value: name.upper() for name, value in LEVELS.items()}
+
+
+# Текстовый приемник: одна строка на событие
+class StreamSink:
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def emit(self, event: dict) -> None:
+        stream = self.stream or sys.stderr
+        fields = ' '.join('%s=%s' % (key, value) for key, value in event.items()
+                          if key not in ('time', 'level', 'component', 'message'))
+        stream.write('%s %s: %s%s\n' % (_LEVEL_NAMES.get(event['level'], event['level']), event['component'],
+                                        event['message'], ' ' + fields if fields else ''))
+
+
+# JSON Lines: поля, не сериализуемые в JSON (узлы AST, символы), записываются через str()
+class JsonSink:
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def emit(self, event: dict) -> None:
+        stream = self.stream or sys.stderr
+        event = dict(event, level=_LEVEL_NAMES.get(event['level'], event['level']))
+        stream.write(json.dumps(event, default=str, ensure_ascii=False) + '\n')
+
+
+# Накапливает события в памяти
+class ListSink:
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event: dict) -> None:
+        self.events.append(event)
+
+
+class Tracer:
+    def __init__(self, level: int = WARNING, sink=None):
+        self.sink = sink or StreamSink()
+        self.set_level(level)
+
+    def set_level(self, level) -> None:
+        if isinstance(level, str):
+            if level.lower() not in LEVELS:
+                raise ValueError("Unknown trace level '%s' (expected one of: %s)" % (level, '|'.join(LEVELS)))
+            level = LEVELS[level.lower()]
+        self.level = level
+        # Флаги уровней - обычные атрибуты: проверка в точке трассировки не вызывает функций
+        self.debug = level <= DEBUG
+        self.info = level <= INFO
+        self.warning = level <= WARNING
+        self.error = level <= ERROR
+
+    def enabled(self, level: int) -> bool:
+        return level >= self.level
+
+    def event(self, level: int, component: str, message: str, **fields) -> None:
+        if level < self.level:
+            return
+        event = {'time': time.time(), 'level': level, 'component': component, 'message': message}
+        event.update(fields)
+        self.sink.emit(event)
+
+
+tracer = Tracer(WARNING, JsonSink() if os.environ.get('PASCAL_TRACE_FORMAT') == 'json' else StreamSink())
+# Неизвестное значение переменной окружения не должно ломать импорт компилятора - остается уровень warning
+_env_level = os.environ.get('PASCAL_TRACE', 'warning')
+if _env_level.lower() in LEVELS:
+    tracer.set_level(_env_level)
+else:
+    tracer.event(WARNING, 'diagnostics', 'unknown PASCAL_TRACE level, using warning', value=_env_level)
+
+
+def configure(level=None, sink=None) -> Tracer:
+    """Меняет уровень и/или приемник общего трассировщика"""
+    if sink is not None:
+        tracer.sink = sink
+    if level is not None:
+        tracer.set_level(level)
+    return tracer
@@ -0,0 +1,136 @@
+"""Пакетная компиляция Pascal -> MSIL.
+
+    python main.py [-j N] [-o OUT_DIR] [--backend pyparsing|rd] [--cache-dir DIR] [--summary FILE]
+                   [--trace LEVEL] PATH...
+
+PATH - файл .pas или каталог (обходится рекурсивно). Каждый рабочий процесс строит грамматику
+один раз и компилирует свою часть файлов; для каждого файла пишется .il и строка сводки.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import diagnostics
+from grammar import PascalGrammar
+from report import CompileReport, compile_with_report
+
+
+def collect_sources(paths: List[str]) -> List[str]:
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                sources.extend(os.path.join(root, name) for name in sorted(files)
+                               if name.lower().endswith('.pas'))
+        else:
+            sources.append(path)
+    return sources
+
+
+def output_path(source: str, base_dir: Optional[str], out_dir: Optional[str]) -> str:
+    target = os.path.splitext(source)[0] + '.il'
+    if out_dir is None:
+        return target
+    return os.path.join(out_dir, os.path.relpath(target, base_dir))
+
+
+# Состояние рабочего процесса: грамматика строится один раз в initializer'е
+_grammar = None
+
+
+def _init_worker(backend: str, cache_dir: Optional[str], trace_level: int) -> None:
+    global _grammar
+    diagnostics.configure(level=trace_level)
+    _grammar = PascalGrammar(backend=backend, cache_dir=cache_dir)
+    # Строим грамматику pyparsing заранее, чтобы ее стоимость не попала во время первого файла
+    _grammar.parser
+
+
+def _compile_file(task) -> dict:
+    source_path, il_path = task
+    result = {'file': source_path, 'output': il_path, 'ok': False, 'error': None}
+    report = CompileReport(source_path)
+    start = time.perf_counter()
+    try:
+        with open(source_path, encoding='utf-8') as f:
+            source = f.read()
+        os.makedirs(os.path.dirname(il_path) or '.', exist_ok=True)
+        compile_with_report(source, _grammar, report=report, il_path=il_path)
+        result['ok'] = True
+    except Exception as e:
+        result['error'] = '%s: %s' % (type(e).__name__, e)
+    result['seconds'] = round(time.perf_counter() - start, 6)
+    result['phases'] = report.phases
+    return result
+
+
+def run_batch(paths: List[str], jobs: int = 1, out_dir: Optional[str] = None,
+              backend: str = 'pyparsing', cache_dir: Optional[str] = None) -> dict:
+    sources = collect_sources(paths)
+    base_dir = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in sources]) if sources else None
+    tasks = [(path, output_path(os.path.abspath(path), base_dir, out_dir)) for path in sources]
+
+    start = time.perf_counter()
+    results = []
+    if tasks:
+        jobs = max(1, min(jobs, len(tasks)))
+        # Крупные порции уменьшают накладные расходы на передачу задач между процессами
+        chunksize = max(1, len(tasks) // (jobs * 4))
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(backend, cache_dir, diagnostics.tracer.level)) as executor:
+            results = list(executor.map(_compile_file, tasks, chunksize=chunksize))
+
+    succeeded = sum(1 for r in results if r['ok'])
+    return {
+        'jobs': jobs,
+        'backend': backend,
+        'files': len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'wall_seconds': round(time.perf_counter() - start, 6),
+        'results': results,
+    }
+
+
+def print_summary(summary: dict, stream=None) -> None:
+    stream = stream or sys.stdout
+    for r in summary['results']:
+        status = 'ok  ' if r['ok'] else 'FAIL'
+        line = '%s %8.3fs  %s' % (status, r['seconds'], r['file'])
+        if r['error']:
+            line += '  (%s)' % r['error']
+        print(line, file=stream)
+    print('%d files, %d succeeded, %d failed, %.3fs wall with %d job(s)' % (
+        summary['files'], summary['succeeded'], summary['failed'], summary['wall_seconds'], summary['jobs']),
+        file=stream)
+
+
+def main(argv=None) -> int:
+    arg_parser = argparse.ArgumentParser(description='Compile Pascal sources to MSIL')
+    arg_parser.add_argument('paths', nargs='+', help='.pas files or directories')
+    arg_parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1)
+    arg_parser.add_argument('-o', '--out-dir', help='directory for .il files (default: next to sources)')
+    arg_parser.add_argument('--backend', default='pyparsing', choices=PascalGrammar.BACKENDS)
+    arg_parser.add_argument('--cache-dir', help='on-disk AST cache directory')
+    arg_parser.add_argument('--summary', help='write the JSON summary to this file')
+    arg_parser.add_argument('--trace', choices=tuple(diagnostics.LEVELS), help='diagnostics level (stderr)')
+    args = arg_parser.parse_args(argv)
+    if args.trace:
+        diagnostics.configure(level=args.trace)
+
+    summary = run_batch(args.paths, jobs=args.jobs, out_dir=args.out_dir,
+                        backend=args.backend, cache_dir=args.cache_dir)
+    print_summary(summary)
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump(summary, f, indent=2)
+    return 0 if summary['failed'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,298 @@
+"""Плоское представление AST: узлы лежат в параллельных массивах, а не в отдельных объектах.
+
+    flat = parse_flat(source)          # или FlatAst.from_tree(tree)
+    SemanticAnalyzer().visit(flat.root)
+    MSILCodeGenerator().generate_program(flat.root)
+
+Узел i описывается kinds[i] (код класса), rows[i]/lines[i] и полями из _fields его класса,
+которые занимают ячейки tags/values начиная с field_start[i]. Ячейка - тег и 32-битное значение:
+индекс узла, индекс строки в таблице интернированных строк, число (большие - строкой), код BinOp или
+начало последовательности (ячейка с длиной, за которой идут элементы).
+
+Обход идет через представления (view) - легкие объекты из двух слотов, создаваемые по требованию.
+Класс представления наследует класс узла и носит то же имя, поэтому isinstance и
+диспетчеризация visit_<ИмяКласса> работают без изменений. Поля представлений только для чтения;
+дополнительные свойства (props), типы выражений и привязки анализатора хранятся в таблицах
+FlatAst.props, FlatAst.types и FlatAst.bindings по индексу узла.
+"""
+from array import array
+from typing import Dict, Optional
+
+from nodes import *
+from rdparser import PascalRDParser
+from astcache import NODE_TYPES
+
+_NONE, _TRUE, _FALSE, _INT, _BIGINT, _STR, _NODE, _TUPLE, _LIST, _BINOP, _LEN = range(11)
+
+_INT_MIN, _INT_MAX = -(1 << 31), (1 << 31) - 1
+
+# Коды классов узлов - те же, что и в двоичном кэше AST
+_NODE_CODES = {cls: code for code, cls in enumerate(NODE_TYPES)}
+_BINOPS = tuple(BinOp)
+_BINOP_CODES = {op: code for code, op in enumerate(_BINOPS)}
+
+
+class FlatAst:
+    def __init__(self):
+        self.kinds = array('B')
+        self.rows = array('i')
+        self.lines = array('i')
+        self.field_start = array('I')
+        self.tags = array('B')
+        self.values = array('i')
+        self.strings = []
+        self._string_index: Dict[str, int] = {}
+        self.props: Dict[int, dict] = {}
+        self.types: Dict[int, str] = {}
+        self.bindings: Dict[int, object] = {}
+        self.root_index: Optional[int] = None
+
+    @classmethod
+    def from_tree(cls, root: AstNode) -> 'FlatAst':
+        flat = cls()
+        flat.root_index = flat.add(root)
+        return flat
+
+    @property
+    def root(self) -> AstNode:
+        return self.view(self.root_index)
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def nbytes(self) -> int:
+        """Размер массивов (без таблицы строк и props)"""
+        return sum(a.itemsize * len(a) for a in (self.kinds, self.rows, self.lines, self.field_start,
+                                                 self.tags, self.values))
+
+    def node_class(self, index: int) -> type:
+        return NODE_TYPES[self.kinds[index]]
+
+    def view(self, index: int) -> AstNode:
+        view = _VIEW_CLASSES[self.kinds[index]].__new__(_VIEW_CLASSES[self.kinds[index]])
+        view._ast = self
+        view._index = index
+        return view
+
+    # Чтение
+
+    def field(self, index: int, number: int):
+        """Значение поля number (по порядку _fields) узла index"""
+        return self._value(self.field_start[index] + number)
+
+    def _value(self, pos: int):
+        tag = self.tags[pos]
+        value = self.values[pos]
+        if tag == _NODE:
+            return self.view(value)
+        if tag == _STR:
+            return self.strings[value]
+        if tag == _INT:
+            return value
+        if tag == _NONE:
+            return None
+        if tag == _TUPLE or tag == _LIST:
+            items = [self._value(item) for item in range(value + 1, value + 1 + self.values[value])]
+            return tuple(items) if tag == _TUPLE else items
+        if tag == _BINOP:
+            return _BINOPS[value]
+        if tag == _TRUE or tag == _FALSE:
+            return tag == _TRUE
+        if tag == _BIGINT:
+            return int(self.strings[value])
+        raise ValueError('Bad tag %d at %d' % (tag, pos))
+
+    # Построение
+
+    def intern(self, string: str) -> int:
+        index = self._string_index.get(string)
+        if index is None:
+            index = self._string_index[string] = len(self.strings)
+            self.strings.append(string)
+        return index
+
+    def add(self, root: AstNode) -> int:
+        """Добавляет дерево объектов и возвращает индекс его корня.
+        Представления этого же FlatAst внутри дерева не копируются, а используются по индексу"""
+        pending = []
+        index = self._add_node(root, pending)
+        while pending:
+            pos, value = pending.pop()
+            self._store(pos, value, pending)
+        return index
+
+    def _add_node(self, node: AstNode, pending: list) -> int:
+        if isinstance(node, _FlatView):
+            if node._ast is self:
+                return node._index
+            cls = node._node_class
+        else:
+            cls = type(node)
+        code = _NODE_CODES.get(cls)
+        if code is None:
+            raise TypeError('Unknown node type %s' % cls.__name__)
+        index = len(self.kinds)
+        self.kinds.append(code)
+        self.rows.append(-1 if node.row is None else node.row)
+        self.lines.append(-1 if node.line is None else node.line)
+        start = len(self.tags)
+        self.field_start.append(start)
+        fields = cls._fields
+        self.tags.frombytes(bytes(len(fields)))
+        self.values.frombytes(bytes(4 * len(fields)))
+        # Поля кладутся в стек в обратном порядке, чтобы потомки нумеровались в прямом порядке обхода
+        for number in range(len(fields) - 1, -1, -1):
+            pending.append((start + number, getattr(node, fields[number])))
+        if node._props:
+            self.props[index] = dict(node._props)
+        if node.expr_type is not None:
+            self.types[index] = node.expr_type
+        if node.binding is not None:
+            self.bindings[index] = node.binding
+        return index
+
+    def _store(self, pos: int, value, pending: list) -> None:
+        if value is None:
+            tag, stored = _NONE, 0
+        elif value is True or value is False:
+            tag, stored = (_TRUE if value else _FALSE), 0
+        elif isinstance(value, AstNode):
+            tag, stored = _NODE, self._add_node(value, pending)
+        elif isinstance(value, str):
+            tag, stored = _STR, self.intern(value)
+        elif isinstance(value, int):
+            if _INT_MIN <= value <= _INT_MAX:
+                tag, stored = _INT, value
+            else:
+                tag, stored = _BIGINT, self.intern(str(value))
+        elif isinstance(value, BinOp):
+            tag, stored = _BINOP, _BINOP_CODES[value]
+        elif type(value) in (tuple, list):
+            tag, stored = (_TUPLE if type(value) is tuple else _LIST), len(self.tags)
+            self.tags.append(_LEN)
+            self.values.append(len(value))
+            self.tags.frombytes(bytes(len(value)))
+            self.values.frombytes(bytes(4 * len(value)))
+            for number in range(len(value) - 1, -1, -1):
+                pending.append((stored + 1 + number, value[number]))
+        else:
+            # Сырые лексемы pyparsing в плоское дерево не попадают
+            raise TypeError('Cannot store value of type %s' % type(value).__name__)
+        self.tags[pos] = tag
+        self.values[pos] = stored
+
+
+# Общая часть всех представлений: идентичность узла - пара (FlatAst, индекс)
+class _FlatView:
+    __slots__ = ()
+
+    def __eq__(self, other):
+        if isinstance(other, _FlatView):
+            return self._ast is other._ast and self._index == other._index
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((id(self._ast), self._index))
+
+    def __setattr__(self, name, value):
+        if name in ('_ast', '_index', '_props', 'expr_type', 'binding'):
+            object.__setattr__(self, name, value)
+        else:
+            raise AttributeError('Flat AST views are read-only')
+
+
+def _field_property(number: int, name: str) -> property:
+    return property(lambda self: self._ast.field(self._index, number), doc=name)
+
+
+def _position_property(column: str) -> property:
+    def getter(self):
+        value = getattr(self._ast, column)[self._index]
+        return None if value < 0 else value
+    return property(getter)
+
+
+def _get_props(self):
+    return self._ast.props.get(self._index)
+
+
+def _set_props(self, value):
+    if value is None:
+        self._ast.props.pop(self._index, None)
+    else:
+        self._ast.props[self._index] = value
+
+
+def _annotation_property(table: str) -> property:
+    # Аннотация анализатора в таблице FlatAst по индексу узла; None - отсутствие записи
+    def getter(self):
+        return getattr(self._ast, table).get(self._index)
+
+    def setter(self, value):
+        if value is None:
+            getattr(self._ast, table).pop(self._index, None)
+        else:
+            getattr(self._ast, table)[self._index] = value
+    return property(getter, setter)
+
+
+def _make_view_class(cls: type) -> type:
+    namespace = {
+        '__slots__': ('_ast', '_index'),
+        '__module__': __name__,
+        '__qualname__': cls.__name__,
+        '_node_class': cls,
+        'row': _position_property('rows'),
+        'line': _position_property('lines'),
+        '_props': property(_get_props, _set_props),
+        'expr_type': _annotation_property('types'),
+        'binding': _annotation_property('bindings'),
+    }
+    for number, name in enumerate(cls._fields):
+        namespace[name] = _field_property(number, name)
+    return type(cls.__name__, (_FlatView, cls), namespace)
+
+
+_VIEW_CLASSES = tuple(_make_view_class(cls) for cls in NODE_TYPES)
+
+
+# Предиктивный парсер, который переносит в FlatAst каждый оператор верхнего уровня
+# сразу после разбора: объектное дерево существует только для одного оператора за раз
+class _FlatParser(PascalRDParser):
+    def __init__(self, flat: FlatAst):
+        super().__init__()
+        self.flat = flat
+        self._depth = 0
+
+    def reset(self, tokens) -> None:
+        super().reset(tokens)
+        self._depth = 0
+
+    def stmt_list(self) -> StmtListNode:
+        if self._depth:
+            return super().stmt_list()
+        flat = self.flat
+        statements = self._statements
+        stmts = []
+        self._depth += 1
+        try:
+            while True:
+                handler = statements.get(self.kinds[self.pos])
+                if handler is None:
+                    return StmtListNode(*stmts)
+                stmts.append(flat.view(flat.add(handler())))
+        finally:
+            self._depth -= 1
+
+    def procedure_decl(self) -> ProcedureDeclNode:
+        return self.flat.view(self.flat.add(super().procedure_decl()))
+
+    def function_decl(self) -> FunctionDeclNode:
+        return self.flat.view(self.flat.add(super().function_decl()))
+
+
+def parse_flat(source: str) -> FlatAst:
+    """Разбирает программу сразу в плоское представление (синтаксис backend'а 'rd')"""
+    flat = FlatAst()
+    flat.root_index = flat.add(_FlatParser(flat).parse(source))
+    return flat
@@ -1,18 +1,101 @@
-from contextlib import suppress
+import sys
 
-import pyparsing as pp
-from pyparsing import pyparsing_common as ppc
-from myParser import *
+from nodes import *
+from diagnostics import tracer, DEBUG
+from rdparser import PascalRDParser
+
+DEFAULT_PACKRAT_CACHE_SIZE = 128
+
+
+# Ограниченный FIFO-кэш packrat с учетом занятых записей.
+# Реализует протокол кэшей pyparsing (get/set/clear/not_in_cache) и подменяет ParserElement.packrat_cache.
+# size=None - кэш без ограничения
+class PackratCache:
+    def __init__(self, size: Optional[int] = DEFAULT_PACKRAT_CACHE_SIZE):
+        self.size = size
+        self.not_in_cache = object()
+        self.peak = 0
+        self._cache = {}
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get(self, key):
+        return self._cache.get(key, self.not_in_cache)
+
+    def set(self, key, value) -> None:
+        cache = self._cache
+        cache[key] = value
+        size = self.size
+        if size is not None:
+            while len(cache) > size:
+                # Вытесняем самую старую запись
+                del cache[next(iter(cache))]
+        if len(cache) > self.peak:
+            self.peak = len(cache)
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self.peak = 0
+
+    def table_bytes(self) -> int:
+        # Размер хэш-таблицы не уменьшается при вытеснении, поэтому до clear() он отражает пик
+        return sys.getsizeof(self._cache)
 
-# Включаем поддержку Packrat парсинга для улучшения производительности
-pp.ParserElement.enablePackrat()
 
 # Класс описывающий грамматику языка Pascal
+# backend='pyparsing' - грамматика на pyparsing, backend='rd' - предиктивный парсер (rdparser.py)
 class PascalGrammar:
-    def __init__(self):
-        self.parser = self._make_parser()
+    BACKENDS = ('pyparsing', 'rd')
+
+    # Грамматика pyparsing общая для всех экземпляров: строится один раз на процесс при первом разборе.
+    # Кэш packrat в pyparsing тоже общий (атрибут класса ParserElement), поэтому он сбрасывается после каждого разбора
+    _shared_parser = None
+    _packrat_cache = None
+
+    def __init__(self, backend: str = 'pyparsing',
+                 packrat_cache_size: Optional[int] = DEFAULT_PACKRAT_CACHE_SIZE,
+                 cache_dir: Optional[str] = None):
+        if backend not in self.BACKENDS:
+            raise ValueError("Unknown parser backend '%s'" % backend)
+        if packrat_cache_size is not None and packrat_cache_size < 0:
+            raise ValueError('packrat_cache_size must be None or a non-negative integer')
+        self.backend = backend
+        self.packrat_cache_size = packrat_cache_size
+        self._rd_parser = PascalRDParser() if backend == 'rd' else None
+        # Дисковый кэш AST (astcache.py): при попадании грамматика не строится и разбор не выполняется
+        self.ast_cache = None
+        if cache_dir is not None:
+            from astcache import ParseCache
+            self.ast_cache = ParseCache(cache_dir)
+        self._cache_stats = {'parses': 0, 'hits': 0, 'misses': 0,
+                             'last_hits': 0, 'last_misses': 0, 'last_peak_size': 0, 'last_table_bytes': 0}
+
+    def cache_stats(self) -> dict:
+        """Статистика кэша packrat: суммарная по всем разборам этого экземпляра и по последнему разбору"""
+        stats = dict(self._cache_stats)
+        stats['limit'] = self.packrat_cache_size
+        return stats
+
+    @property
+    def parser(self):
+        if self.backend == 'rd':
+            return self._rd_parser
+        if PascalGrammar._shared_parser is None:
+            PascalGrammar._shared_parser = self._make_parser()
+        return PascalGrammar._shared_parser
 
     def _make_parser(self):
+        # pyparsing загружается только при построении грамматики,
+        # поэтому semantic, codegen и backend 'rd' его не импортируют
+        import pyparsing as pp
+        from pyparsing import pyparsing_common as ppc
+        from myParser import PascalParser
+
+        # Включаем поддержку Packrat парсинга для улучшения производительности
+        pp.ParserElement.enablePackrat()
+        PascalGrammar._packrat_cache = pp.ParserElement.packrat_cache = PackratCache()
+
         # Базовые элементы
         num = pp.Regex('[+-]?\\d+\\.?\\d*([eE][+-]?\\d+)?')
         str_ = pp.QuotedString("'", escChar='\\', unquoteResults=False, convertWhitespaceEscapes=False)
@@ -101,23 +184,24 @@ class PascalGrammar:
         # Операторы
         assign = (array_ident | ident) + ASSIGN.suppress() + expr
         simple_stmt = assign | call
-        writeln_stmt = WRITELN + LPAR + expr + RPAR
+        # writeln(...) допускается без ';' - тот же CallNode, что и у вызова с ';' (как в rdparser)
+        writeln_stmt = pp.FollowedBy(WRITELN) + call
 
         # Условные и циклические операторы
         if_ = IF.suppress() + expr + THEN.suppress() + stmt + pp.Optional(ELSE.suppress() + stmt)
         while_ = WHILE.suppress() + expr + DO.suppress() + stmt
         repeat_ = REPEAT.suppress() + stmt_list + UNTIL.suppress() + expr
         
-        # Цикл for
-        for_init = ident + ASSIGN.suppress() + expr
-        for_stmt = FOR.suppress() + for_init + TO.suppress() + expr + DO.suppress() + stmt
+        # Цикл for: начальное присваивание - AssignNode, весь оператор - ForNode, как в rdparser
+        for_init = (ident + ASSIGN.suppress() + expr).setName('assign')
+        for_ = FOR.suppress() + for_init + TO.suppress() + expr + DO.suppress() + stmt
 
         # Составной оператор
         compound_stmt = LBRACE + stmt_list + RBRACE
 
         stmt << (
             if_ |
-            for_stmt |
+            for_ |
             while_ |
             repeat_ |
             compound_stmt |
@@ -147,10 +231,39 @@ class PascalGrammar:
         # Регистрация парсеров
         for var_name, value in locals().copy().items():
             if isinstance(value, pp.ParserElement):
-                print(f"Регистрируем парсер: {var_name}")
+                if tracer.debug:
+                    tracer.event(DEBUG, 'grammar', 'register rule', rule=var_name)
                 PascalParser.parse(var_name, value)
 
         return start
 
     def parse(self, prog: str) -> StmtListNode:
-        return self.parser.parseString(str(prog))[0]
\ No newline at end of file
+        if self.ast_cache is None:
+            return self._parse(prog)
+        prog = str(prog)
+        ast = self.ast_cache.load(prog, self.backend)
+        if ast is None:
+            ast = self._parse(prog)
+            self.ast_cache.store(prog, self.backend, ast)
+        return ast
+
+    def _parse(self, prog: str) -> StmtListNode:
+        if self.backend == 'rd':
+            return self._rd_parser.parse(prog)
+        parser = self.parser
+        cache = PascalGrammar._packrat_cache
+        cache.size = self.packrat_cache_size
+        try:
+            return parser.parseString(str(prog))[0]
+        finally:
+            hits, misses = parser.packrat_cache_stats
+            stats = self._cache_stats
+            stats['parses'] += 1
+            stats['hits'] += hits
+            stats['misses'] += misses
+            stats['last_hits'] = hits
+            stats['last_misses'] = misses
+            stats['last_peak_size'] = cache.peak
+            stats['last_table_bytes'] = cache.table_bytes()
+            # Записи кэша ссылаются на исходный текст и результаты разбора - освобождаем их сразу
+            parser.reset_cache()
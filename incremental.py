@@ -0,0 +1,173 @@
+from typing import List, Optional
+
+from nodes import *
+from lexer import Tok, PascalSyntaxError, tokenize
+from rdparser import PascalRDParser
+
+
+# Участок исходника, который можно разобрать заново отдельно от остальной программы:
+# объявление процедуры/функции верхнего уровня или главный составной оператор
+class _Region:
+    __slots__ = ('start', 'end', 'node')
+
+    def __init__(self, start: int, end: int, node: AstNode):
+        self.start = start
+        self.end = end
+        self.node = node
+
+
+# Предиктивный парсер, запоминающий границы подпрограмм верхнего уровня и главного begin..end
+class _SpanRecordingParser(PascalRDParser):
+    def __init__(self):
+        super().__init__()
+        self.routines = []
+        self.main = None
+        self._routine_depth = 0
+        self._compound_depth = 0
+
+    def reset(self, tokens) -> None:
+        super().reset(tokens)
+        self.routines = []
+        self.main = None
+        self._routine_depth = 0
+        self._compound_depth = 0
+
+    def _routine(self, parse) -> AstNode:
+        start = self.tokens.starts[self.pos]
+        self._routine_depth += 1
+        try:
+            node = parse()
+        finally:
+            self._routine_depth -= 1
+        if self._routine_depth == 0:
+            self.routines.append(_Region(start, self.tokens.end(self.pos - 1), node))
+        return node
+
+    def procedure_decl(self) -> ProcedureDeclNode:
+        return self._routine(super().procedure_decl)
+
+    def function_decl(self) -> FunctionDeclNode:
+        return self._routine(super().function_decl)
+
+    def compound_stmt(self) -> StmtListNode:
+        start = self.tokens.starts[self.pos]
+        top = self._routine_depth == 0 and self._compound_depth == 0
+        self._compound_depth += 1
+        try:
+            node = super().compound_stmt()
+        finally:
+            self._compound_depth -= 1
+        if top:
+            self.main = _Region(start, self.tokens.end(self.pos - 1), node)
+        return node
+
+    def parse_region(self, source: str, start: int, end: int) -> Optional[AstNode]:
+        """Разбирает source[start:end] как одну подпрограмму или главный begin..end; None - если не удалось"""
+        try:
+            self.reset(tokenize(source, start, end))
+            # Вложенные подпрограммы и операторы участка не являются участками верхнего уровня
+            self._routine_depth = self._compound_depth = 1
+            kind = self.kinds[0]
+            if kind == Tok.PROCEDURE:
+                node = super().procedure_decl()
+            elif kind == Tok.FUNCTION:
+                node = super().function_decl()
+            elif kind == Tok.BEGIN:
+                node = super().compound_stmt()
+            else:
+                return None
+            self.expect(Tok.EOF)
+        except PascalSyntaxError:
+            return None
+        return node
+
+
+def _common_length(same, limit: int) -> int:
+    # Двоичный поиск длины общего префикса/суффикса: сравнение срезов выполняется на C
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if same(mid):
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+# Инкрементальный разбор: правка, целиком попавшая внутрь подпрограммы верхнего уровня
+# или главного составного оператора, разбирает заново только этот участок
+# и подставляет новое поддерево в существующий ProgramNode.
+# Остальные правки (заголовок программы, раздел var, границы участков) ведут к полному разбору
+class IncrementalParser:
+    def __init__(self, source: str):
+        self._parser = _SpanRecordingParser()
+        self.stats = {'full': 0, 'incremental': 0}
+        self.source = ''
+        self.ast = None
+        self._routines: List[_Region] = []
+        self._main = None
+        self._full_parse(str(source))
+
+    def _full_parse(self, source: str) -> ProgramNode:
+        parser = self._parser
+        self.ast = parser.parse(source)
+        self.source = source
+        self._routines = parser.routines
+        self._main = parser.main
+        self.stats['full'] += 1
+        return self.ast
+
+    def update(self, source: str) -> ProgramNode:
+        """Принимает новый текст целиком и сам находит измененный диапазон"""
+        old = self.source
+        if source == old:
+            return self.ast
+        limit = min(len(old), len(source))
+        prefix = _common_length(lambda n: old[:n] == source[:n], limit)
+        suffix = _common_length(lambda n: old[len(old) - n:] == source[len(source) - n:], limit - prefix)
+        return self.edit(prefix, len(old) - suffix, source[prefix:len(source) - suffix])
+
+    def edit(self, start: int, end: int, text: str) -> ProgramNode:
+        """Заменяет source[start:end] на text и обновляет AST"""
+        source = self.source[:start] + text + self.source[end:]
+        delta = len(text) - (end - start)
+
+        region = self._find_region(start, end)
+        if region is None:
+            return self._full_parse(source)
+        node = self._parser.parse_region(source, region.start, region.end + delta)
+        if node is None or not self._splice(region, node):
+            return self._full_parse(source)
+
+        region.end += delta
+        region.node = node
+        for other in self._routines:
+            if other.start > region.start:
+                other.start += delta
+                other.end += delta
+        if self._main is not region and self._main.start > region.start:
+            self._main.start += delta
+            self._main.end += delta
+        self.source = source
+        self.stats['incremental'] += 1
+        return self.ast
+
+    def _find_region(self, start: int, end: int) -> Optional[_Region]:
+        for region in self._routines + [self._main]:
+            if region.start <= start and end <= region.end:
+                return region
+        return None
+
+    def _splice(self, region: _Region, node: AstNode) -> bool:
+        program = self.ast
+        if region is self._main:
+            if not isinstance(node, StmtListNode):
+                return False
+            program.stmt_list = node
+            return True
+        if not isinstance(node, (ProcedureDeclNode, FunctionDeclNode)):
+            return False
+        decls = program.decl_section.decls
+        index = next(i for i, decl in enumerate(decls) if decl is region.node)
+        program.decl_section.decls = decls[:index] + (node,) + decls[index + 1:]
+        return True
@@ -0,0 +1,169 @@
+import re
+from array import array
+from enum import IntEnum
+from typing import Optional
+
+
+# Виды лексем. Значения помещаются в array('B'), поэтому их не больше 255
+class Tok(IntEnum):
+    EOF = 0
+    IDENT = 1
+    NUMBER = 2
+    STRING = 3
+    TRUE = 4
+    FALSE = 5
+    # Ключевые слова
+    PROGRAM = 10
+    VAR = 11
+    BEGIN = 12
+    END = 13
+    PROCEDURE = 14
+    FUNCTION = 15
+    IF = 16
+    THEN = 17
+    ELSE = 18
+    WHILE = 19
+    DO = 20
+    FOR = 21
+    TO = 22
+    REPEAT = 23
+    UNTIL = 24
+    ARRAY = 25
+    OF = 26
+    INTEGER = 27
+    CHAR = 28
+    BOOLEAN = 29
+    AND = 30
+    OR = 31
+    DIV = 32
+    MOD = 33
+    # Символы и операторы
+    LPAR = 40
+    RPAR = 41
+    LBRACK = 42
+    RBRACK = 43
+    SEMI = 44
+    COMMA = 45
+    COLON = 46
+    DOT = 47
+    DOTDOT = 48
+    ASSIGN = 49
+    ADD = 50
+    SUB = 51
+    MUL = 52
+    DIVISION = 53
+    GE = 54
+    LE = 55
+    NEQUALS = 56
+    EQUALS = 57
+    GT = 58
+    LT = 59
+
+
+# Ключевые слова регистронезависимы (как CaselessKeyword в grammar.py),
+# True/False - регистрозависимы (как pp.Literal)
+KEYWORDS = {kind.name.lower(): kind for kind in Tok if Tok.PROGRAM <= kind <= Tok.MOD}
+BOOL_LITERALS = {'True': Tok.TRUE, 'False': Tok.FALSE}
+
+SYMBOLS = {
+    '(': Tok.LPAR, ')': Tok.RPAR, '[': Tok.LBRACK, ']': Tok.RBRACK,
+    ';': Tok.SEMI, ',': Tok.COMMA, ':': Tok.COLON, '.': Tok.DOT,
+    '..': Tok.DOTDOT, ':=': Tok.ASSIGN,
+    '+': Tok.ADD, '-': Tok.SUB, '*': Tok.MUL, '/': Tok.DIVISION,
+    '>=': Tok.GE, '<=': Tok.LE, '<>': Tok.NEQUALS, '=': Tok.EQUALS,
+    '>': Tok.GT, '<': Tok.LT,
+}
+
+# Текст лексем для сообщений об ошибках
+TOKEN_TEXT = {kind: "'%s'" % text for text, kind in SYMBOLS.items()}
+TOKEN_TEXT.update({kind: "'%s'" % text for text, kind in KEYWORDS.items()})
+TOKEN_TEXT.update({Tok.EOF: 'end of text', Tok.IDENT: 'identifier', Tok.NUMBER: 'number',
+                   Tok.STRING: 'string', Tok.TRUE: "'True'", Tok.FALSE: "'False'"})
+
+# Единое регулярное выражение: номер сработавшей группы (lastindex) - индекс в таблице _GROUP_KINDS.
+# Число не захватывает '.', за которой следует вторая '.', чтобы '1..10' разбиралось как диапазон
+_MASTER = re.compile(r'''
+    (\s+)                                          # 1 пробелы
+  | (/\*(?:[^*]|\*+[^*/])*\*+/)                    # 2 комментарий /* */
+  | (//[^\n]*)                                     # 3 комментарий //
+  | ([^\W\d]\w*)                                   # 4 идентификатор или ключевое слово
+  | (\d+(?:\.(?!\.)\d*)?(?:[eE][+-]?\d+)?)         # 5 число
+  | ('(?:[^'\\\n]|\\.)*')                          # 6 строка
+  | (:=|\.\.|<=|>=|<>|[-+*/=<>()\[\];,:.])         # 7 символ
+  | (.)                                            # 8 недопустимый символ
+''', re.VERBOSE | re.DOTALL)
+
+_SKIP, _IDENT, _NUMBER, _STRING, _SYMBOL, _ERROR = range(6)
+_GROUP_KINDS = (None, _SKIP, _SKIP, _SKIP, _IDENT, _NUMBER, _STRING, _SYMBOL, _ERROR)
+
+
+class PascalSyntaxError(Exception):
+    def __init__(self, msg: str, source: str, loc: int):
+        self.msg = msg
+        self.loc = loc
+        self.lineno = source.count('\n', 0, loc) + 1
+        self.col = loc - (source.rfind('\n', 0, loc) + 1) + 1
+        super().__init__('{0}  (at char {1}), (line:{2}, col:{3})'.format(msg, loc, self.lineno, self.col))
+
+
+# Поток лексем: параллельные массивы вида, смещения и длины лексемы.
+# Текст лексемы не копируется, а берется из исходника по смещению
+class TokenStream:
+    def __init__(self, source: str):
+        self.source = source
+        self.kinds = array('B')
+        self.starts = array('i')
+        self.lengths = array('i')
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def text(self, i: int) -> str:
+        start = self.starts[i]
+        return self.source[start:start + self.lengths[i]]
+
+    def end(self, i: int) -> int:
+        return self.starts[i] + self.lengths[i]
+
+    def describe(self, i: int) -> str:
+        kind = self.kinds[i]
+        if kind in (Tok.IDENT, Tok.NUMBER, Tok.STRING):
+            return "'%s'" % self.text(i)
+        return TOKEN_TEXT[Tok(kind)]
+
+
+def tokenize(source: str, pos: int = 0, endpos: Optional[int] = None) -> TokenStream:
+    """Разбивает source[pos:endpos] на лексемы за один проход; смещения - абсолютные"""
+    if endpos is None:
+        endpos = len(source)
+    tokens = TokenStream(source)
+    kinds_append = tokens.kinds.append
+    starts_append = tokens.starts.append
+    lengths_append = tokens.lengths.append
+    keywords_get = KEYWORDS.get
+    bools_get = BOOL_LITERALS.get
+    group_kinds = _GROUP_KINDS
+
+    for m in _MASTER.finditer(source, pos, endpos):
+        group = group_kinds[m.lastindex]
+        if group == _SKIP:
+            continue
+        text = m.group()
+        if group == _IDENT:
+            kind = keywords_get(text.lower()) or bools_get(text, Tok.IDENT)
+        elif group == _NUMBER:
+            kind = Tok.NUMBER
+        elif group == _STRING:
+            kind = Tok.STRING
+        elif group == _SYMBOL:
+            kind = SYMBOLS[text]
+        else:
+            raise PascalSyntaxError('Unexpected character %r' % text, source, m.start())
+        kinds_append(kind)
+        starts_append(m.start())
+        lengths_append(len(text))
+
+    kinds_append(Tok.EOF)
+    starts_append(endpos)
+    lengths_append(0)
+    return tokens
@@ -1,8 +1,9 @@
 import os
+import sys
 from grammar import *
 from semantic import *
 from codegen import MSILCodeGenerator, compile_to_exe
-from nodes import BlockNode
+from diagnostics import tracer, DEBUG
 
 
 def main():
@@ -51,22 +52,10 @@ def main():
         
         print("\nAST дерево:")
         try:
-            print(f"DEBUG: AST type: {type(ast)}")
-            print(f"DEBUG: AST children count: {len(ast.childs) if hasattr(ast, 'childs') else 'No childs'}")
-            if hasattr(ast, 'childs'):
-                for i, child in enumerate(ast.childs):
-                    print(f"DEBUG: Child {i}: {type(child).__name__}")
-                    if hasattr(child, 'childs') and len(child.childs) > 0:
-                        print(f"  Sub-children: {[type(c).__name__ for c in child.childs]}")
-                        # Проверяем BlockNode более детально
-                        if isinstance(child, BlockNode):
-                            print(f"  BlockNode details:")
-                            print(f"    var_section: {type(child.var_section).__name__ if child.var_section else None}")
-                            print(f"    declarations: {[type(d).__name__ for d in child.declarations]}")
-                            print(f"    stmt_list: {type(child.stmt_list).__name__ if child.stmt_list else None}")
-            
-            for line in ast.tree:
-                print(f"  {line}")
+            if tracer.debug:
+                tracer.event(DEBUG, 'main', 'ast', node=type(ast).__name__,
+                             childs=[type(child).__name__ for child in getattr(ast, 'childs', ())])
+            ast.write_tree(sys.stdout, indent='  ')
         except Exception as e:
             print(f"  Ошибка при выводе AST: {e}")
             print(f"  AST тип: {type(ast)}")
@@ -84,21 +73,22 @@ def main():
         # 3. Генерация MSIL кода
         print("\n3. Генерация MSIL кода...")
         codegen = MSILCodeGenerator()
-        msil_code = codegen.generate_program(ast)
+        codegen.generate(ast)
         print(" Генерация MSIL кода успешна")
         
         print("\nСгенерированный MSIL код:")
-        print(msil_code)
+        codegen.write(sys.stdout)
+        print()
         
         # 4. Сохранение MSIL в файл
         il_filename = "test_program.il"
         with open(il_filename, 'w') as f:
-            f.write(msil_code)
+            codegen.write(f)
         print(f"\n MSIL код сохранен в {il_filename}")
         
         # 5. Компиляция в исполняемый файл
         print("\n4. Компиляция в исполняемый файл...")
-        success = compile_to_exe(msil_code, "test_program")
+        success = compile_to_exe(codegen, "test_program")
         
         if success:
             print(" Успешно скомпилировано в test_program.exe")
@@ -126,4 +116,8 @@ def main():
 
 
 if __name__ == "__main__":
+    # С аргументами - пакетная компиляция файлов, без них - демонстрация
+    if len(sys.argv) > 1:
+        import driver
+        sys.exit(driver.main(sys.argv[1:]))
     main()
\ No newline at end of file
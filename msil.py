@@ -0,0 +1,59 @@
+"""Инструкции MSIL в виде записей и потоковая запись текста IL.
+
+    Instruction('ldc.i4', 5)            ->      ldc.i4 5
+    Instruction('br', 'L2')             ->      br L2
+    Instruction(label='L2')             ->    L2:
+
+Генератор кода складывает в список записи Instruction (тела методов) вперемешку с готовыми
+строками (заголовки, директивы). Оптимизирующие проходы переписывают записи, не разбирая текст;
+в текст они превращаются только при записи в файл - кусками по chunk_lines строк.
+"""
+from typing import Iterable, Optional, TextIO, Union
+
+
+class Instruction:
+    # Инструкций столько же, сколько строк IL - храним их без __dict__
+    __slots__ = ('opcode', 'operand', 'label')
+
+    def __init__(self, opcode: Optional[str] = None, operand=None, label: Optional[str] = None):
+        self.opcode = opcode
+        self.operand = operand
+        # Запись с label и без opcode - метка перед следующей инструкцией
+        self.label = label
+
+    def __str__(self) -> str:
+        if self.opcode is None:
+            return f"  {self.label}:"
+        if self.operand is None:
+            return f"    {self.opcode}"
+        return f"    {self.opcode} {self.operand}"
+
+    def __repr__(self) -> str:
+        return f"Instruction({self.opcode!r}, {self.operand!r}, label={self.label!r})"
+
+
+Line = Union[str, Instruction]
+
+
+def format_line(line: Line) -> str:
+    return line if type(line) is str else str(line)
+
+
+def write_il(lines: Iterable[Line], f: TextIO, chunk_lines: int = 1024) -> int:
+    """Пишет строки IL в f (через \\n, без завершающего перевода строки); возвращает число символов"""
+    written = 0
+    chunk = []
+    separator = ''
+    for line in lines:
+        chunk.append(format_line(line))
+        if len(chunk) >= chunk_lines:
+            text = separator + '\n'.join(chunk)
+            f.write(text)
+            written += len(text)
+            chunk.clear()
+            separator = '\n'
+    if chunk:
+        text = separator + '\n'.join(chunk)
+        f.write(text)
+        written += len(text)
+    return written
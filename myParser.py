@@ -1,7 +1,9 @@
 from contextlib import suppress
 import inspect
 import pyparsing as pp
+import nodes
 from nodes import *
+from diagnostics import tracer, DEBUG
 
 
 class PascalParser:
@@ -29,25 +31,31 @@ class PascalParser:
             parser.setParseAction(bin_op_parse_action)
         else:
             cls = ''.join(x.capitalize() for x in rule_name.split('_')) + 'Node'
-            print(f"DEBUG: Rule '{rule_name}' -> Class '{cls}'")
+            if tracer.debug:
+                tracer.event(DEBUG, 'parser', 'rule', rule=rule_name, cls=cls)
             with suppress(NameError):
                 try:
-                    cls = eval(cls)
-                    print(f"DEBUG: Found class {cls}")
+                    # Класс узла ищется прямо в модуле nodes, без eval
+                    node_cls = getattr(nodes, cls, None)
+                    if not (isinstance(node_cls, type) and issubclass(node_cls, AstNode)):
+                        raise NameError(cls)
+                    cls = node_cls
                     if not inspect.isabstract(cls):
-                        print(f"DEBUG: Class {cls} is not abstract, creating parse action")
                         def parse_action(s, loc, tocs):
-                            print(f"DEBUG: Creating {cls.__name__} with tokens: {[str(t)[:30] for t in tocs]}")
+                            if tracer.debug:
+                                tracer.event(DEBUG, 'parser', 'create node', node=cls.__name__, loc=loc,
+                                             tokens=[str(t)[:30] for t in tocs])
                             try:
-                                result = cls(*tocs)
-                                print(f"DEBUG: Successfully created {cls.__name__}")
-                                return result
+                                return cls(*tocs)
                             except Exception as e:
-                                print(f"DEBUG: Error creating {cls.__name__}: {e}")
+                                if tracer.debug:
+                                    tracer.event(DEBUG, 'parser', 'create node failed', node=cls.__name__,
+                                                 loc=loc, error=e)
                                 raise
 
                         parser.setParseAction(parse_action)
-                    else:
-                        print(f"DEBUG: Class {cls} is abstract, skipping")
+                    elif tracer.debug:
+                        tracer.event(DEBUG, 'parser', 'abstract node skipped', node=cls.__name__)
                 except Exception as e:
-                    print(f"DEBUG: Error evaluating class {cls}: {e}")
\ No newline at end of file
+                    if tracer.debug:
+                        tracer.event(DEBUG, 'parser', 'node class lookup failed', cls=cls, error=e)
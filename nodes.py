@@ -1,17 +1,45 @@
 from abc import ABC, abstractmethod
-from typing import Callable, Tuple, Optional, Union
+from typing import Callable, Iterator, Tuple, Optional, Union
 from enum import Enum
-import inspect
+
+from diagnostics import tracer, DEBUG, WARNING
 
 # Абстрактный класс - узел AST-дерева
 # Все рализованные далее классы узлов являются потомками этого класса
 class AstNode(ABC):
+    # Поля узла в порядке обхода дочерних узлов (вместе со скалярными полями).
+    # Описывают схему узла для сериализации и обхода дерева
+    _fields = ()
+    # Поля из _fields, которые никогда не содержат узлов (строки, числа, операции) - обход их пропускает
+    _scalar_fields = ()
+    # Узлы хранятся в слотах без __dict__: каждый потомок объявляет __slots__ = _fields.
+    # Произвольные дополнительные свойства лежат в отдельной таблице _props, которая создается только по требованию.
+    # expr_type - тип выражения ('integer', 'boolean', 'char'), binding - символ, к которому анализатор
+    # привязал имя или объявление (symbols.VarSymbol, символ подпрограммы или программы)
+    __slots__ = ('row', 'line', '_props', 'expr_type', 'binding')
+
     def __init__(self, row: Optional[int] = None, line: Optional[int] = None, **props):
         super().__init__()
         self.row = row
         self.line = line
-        for k, v in props.items():
-            setattr(self, k, v)
+        self._props = props or None
+        self.expr_type = None
+        self.binding = None
+
+    def __getattr__(self, name: str):
+        # Вызывается только для имен, которых нет в слотах и классе
+        if name != '_props':
+            props = self._props
+            if props is not None and name in props:
+                return props[name]
+        raise AttributeError("'%s' object has no attribute '%s'" % (type(self).__name__, name))
+
+    @property
+    def props(self) -> dict:
+        """Таблица дополнительных свойств узла"""
+        if self._props is None:
+            self._props = {}
+        return self._props
 
     @property
     def childs(self) -> Tuple['AstNode', ...]:
@@ -23,33 +51,70 @@ class AstNode(ABC):
 
     @property
     def tree(self) -> list[str]:
-        res = [str(self)]
-        childs_temp = self.childs
-        for i, child in enumerate(childs_temp):
-            ch0, ch = '├', '│'
-            if i == len(childs_temp) - 1:
-                ch0, ch = '└', ' '
-            # Проверяем, что child является AstNode, а не строкой
-            if hasattr(child, 'tree'):
-                res.extend(((ch0 if j == 0 else ch) + ' ' + s for j, s in enumerate(child.tree)))
+        return list(self.iter_tree())
+
+    def iter_tree(self, max_depth: Optional[int] = None, max_nodes: Optional[int] = None) -> Iterator[str]:
+        """Строки дерева по одной: обход без рекурсии, префикс каждой строки строится один раз.
+        max_depth - глубже потомки не выводятся, max_nodes - после стольких строк вывод обрывается"""
+        # Элемент стека: узел, глубина, последний ли он среди братьев.
+        # prefix - продолжения линий предков ('│ ' или '  ', по два символа на уровень), общий для всего обхода
+        stack = [(self, 0, True)]
+        prefix = ''
+        emitted = 0
+        while stack:
+            node, depth, last = stack.pop()
+            if depth:
+                prefix = prefix[:2 * (depth - 1)]
+                head = prefix + ('└ ' if last else '├ ')
             else:
-                # Если это строка, просто выводим её
-                res.append((ch0 + ' ' + str(child)))
-        return res
+                head = ''
+            if max_nodes is not None and emitted >= max_nodes:
+                yield head + '...'
+                return
+            yield head + str(node)
+            emitted += 1
+            # Потомками могут быть и не узлы (например, строки) - они выводятся одной строкой
+            if not isinstance(node, AstNode):
+                continue
+            childs = node.childs
+            if not childs:
+                continue
+            if depth:
+                prefix += '  ' if last else '│ '
+            if max_depth is not None and depth >= max_depth:
+                yield prefix + '└ ...'
+                continue
+            last_index = len(childs) - 1
+            for i in range(last_index, -1, -1):
+                stack.append((childs[i], depth + 1, i == last_index))
+
+    def write_tree(self, stream, max_depth: Optional[int] = None, max_nodes: Optional[int] = None,
+                   indent: str = '') -> None:
+        """Пишет дерево в поток построчно, не собирая его в память"""
+        write = stream.write
+        for line in self.iter_tree(max_depth, max_nodes):
+            write(indent + line + '\n')
 
     def visit(self, func: Callable[['AstNode'], None]) -> None:
-        func(self)
-        map(func, self.childs)
+        """Вызывает func для каждого узла поддерева в прямом порядке"""
+        from walker import preorder
+
+        for node in preorder(self):
+            func(node)
 
     def __getitem__(self, index):
         return self.childs[index] if index < len(self.childs) else None
 
 
 class ExprNode(AstNode):
-    pass
+    __slots__ = ()
 
 # Узел содержащий значение переменной и ее типа
 class LiteralNode(ExprNode):
+    _fields = ('literal', 'value')
+    __slots__ = _fields
+    _scalar_fields = _fields
+
     def __init__(self, literal: str,
                  row: Optional[int] = None, line: Optional[int] = None, **props):
         super().__init__(row=row, line=line, **props)
@@ -71,6 +136,10 @@ class LiteralNode(ExprNode):
 # Узел содержащий название переменной
 class IdentNode(ExprNode):
     # k,j..
+    _fields = ('name',)
+    __slots__ = _fields
+    _scalar_fields = _fields
+
     def __init__(self, name: str, row: Optional[int] = None, line: Optional[int] = None, **props):
         super().__init__(row=row, line=line, **props)
         self.name = str(name)
@@ -81,6 +150,9 @@ class IdentNode(ExprNode):
 
 # Узел содержащий элементы массива
 class ArrayIdentNode(ExprNode):
+    _fields = ('name', 'literal')
+    __slots__ = _fields
+
     def __init__(self, name: IdentNode, literal: LiteralNode, row: Optional[int] = None, line: Optional[int] = None,
                  **props):
         super().__init__(row=row, line=line, **props)
@@ -113,6 +185,10 @@ class BinOp(Enum):
 
 # Узел реализующий бинарную операцию
 class BinOpNode(ExprNode):
+    _fields = ('op', 'arg1', 'arg2')
+    __slots__ = _fields
+    _scalar_fields = ('op',)
+
     def __init__(self, op: BinOp, arg1: ExprNode, arg2: ExprNode,
                  row: Optional[int] = None, line: Optional[int] = None, **props):
         super().__init__(row=row, line=line, **props)
@@ -129,10 +205,13 @@ class BinOpNode(ExprNode):
 
 
 class StmtNode(ExprNode):
-    pass
+    __slots__ = ()
 
 # Узел содержащий список переменных определенного типа
 class IdentListNode(StmtNode):
+    _fields = ('idents',)
+    __slots__ = _fields
+
     def __init__(self, *idents: Tuple[IdentNode, ...], row: Optional[int] = None, line: Optional[int] = None, **props):
         super().__init__(row=row, line=line, **props)
         self.idents = idents
@@ -146,6 +225,10 @@ class IdentListNode(StmtNode):
 
 # Узел содержащий тип переменной или списка переменных
 class TypeSpecNode(StmtNode):
+    _fields = ('name',)
+    __slots__ = _fields
+    _scalar_fields = _fields
+
     def __init__(self, name: str, row: Optional[int] = None, line: Optional[int] = None, **props):
         super(TypeSpecNode, self).__init__(row=row, line=line, **props)
         self.name = name
@@ -155,6 +238,9 @@ class TypeSpecNode(StmtNode):
 
 
 class VarDeclNode(StmtNode):
+    _fields = ('ident_list', 'vars_type')
+    __slots__ = _fields
+
     def __init__(self, ident_list: IdentListNode, vars_type: TypeSpecNode,  # *vars_list: Tuple[AstNode, ...],
                  row: Optional[int] = None, line: Optional[int] = None, **props):
         super().__init__(row=row, line=line, **props)
@@ -174,6 +260,9 @@ class VarDeclNode(StmtNode):
 # to_ индекс последнего элемента массива
 # vars_type тип к которому относится массив
 class ArrayDeclNode(StmtNode):
+    _fields = ('vars_type', 'name', 'from_', 'to_')
+    __slots__ = _fields
+
     def __init__(self, name: Tuple[AstNode, ...],
                  from_: LiteralNode, to_: LiteralNode, vars_type: TypeSpecNode,
                  row: Optional[int] = None, line: Optional[int] = None, **props):
@@ -193,6 +282,9 @@ class ArrayDeclNode(StmtNode):
 
 # Узел реализующий раздел описания переменных
 class VarsDeclNode(StmtNode):
+    _fields = ('var_decs',)
+    __slots__ = _fields
+
     def __init__(self, *var_decs: Tuple[VarDeclNode, ...],
                  row: Optional[int] = None, line: Optional[int] = None, **props):
         super().__init__(row=row, line=line, **props)
@@ -207,6 +299,9 @@ class VarsDeclNode(StmtNode):
 
 # Узел реализующий вызов функций или процедур
 class CallNode(StmtNode):
+    _fields = ('func', 'params')
+    __slots__ = _fields
+
     def __init__(self, func: IdentNode, *params: Tuple[ExprNode],
                  row: Optional[int] = None, line: Optional[int] = None, **props):
         super().__init__(row=row, line=line, **props)
@@ -223,6 +318,9 @@ class CallNode(StmtNode):
 
 # Узел реализующий операцию присваивания переменной var значения val
 class AssignNode(StmtNode):
+    _fields = ('var', 'val')
+    __slots__ = _fields
+
     def __init__(self, var,
                  val: ExprNode,
                  row: Optional[int] = None, line: Optional[int] = None, **props):
@@ -243,6 +341,9 @@ class AssignNode(StmtNode):
 # then_stmt выражение выполняющееся при true в cond
 # else_stmt выражение выполняющееся при false в cond
 class IfNode(StmtNode):
+    _fields = ('cond', 'then_stmt', 'else_stmt')
+    __slots__ = _fields
+
     def __init__(self, cond: ExprNode, then_stmt: StmtNode, else_stmt: Optional[StmtNode] = None,
                  row: Optional[int] = None, line: Optional[int] = None, **props):
         super().__init__(row=row, line=line, **props)
@@ -261,6 +362,9 @@ class IfNode(StmtNode):
 # cond логическое выражение внутри while
 # stmt_list операторы в теле цикла
 class WhileNode(StmtNode):
+    _fields = ('cond', 'stmt_list')
+    __slots__ = _fields
+
     def __init__(self, cond: ExprNode, stmt_list: StmtNode,
                  row: Optional[int] = None, line: Optional[int] = None, **props):
         super().__init__(row=row, line=line, **props)
@@ -276,6 +380,9 @@ class WhileNode(StmtNode):
 
 # в данный момент в разработке
 class RepeatNode(StmtNode):
+    _fields = ('stmt_list', 'cond')
+    __slots__ = _fields
+
     def __init__(self, stmt_list: StmtNode, cond: ExprNode,
                  row: Optional[int] = None, line: Optional[int] = None, **props):
         super().__init__(row=row, line=line, **props)
@@ -294,6 +401,9 @@ class RepeatNode(StmtNode):
 # to конечное значение
 # body оператор в теле цикла
 class ForNode(StmtNode):
+    _fields = ('init', 'to', 'body')
+    __slots__ = _fields
+
     def __init__(self, init: Union[StmtNode, None],
                  to,
                  body: Union[StmtNode, None],
@@ -312,6 +422,9 @@ class ForNode(StmtNode):
 
 # Узел содержащий список выражений
 class StmtListNode(StmtNode):
+    _fields = ('stmts',)
+    __slots__ = _fields
+
     def __init__(self, *exprs: StmtNode,
                  row: Optional[int] = None, line: Optional[int] = None, **props):
         super().__init__(row=row, line=line, **props)
@@ -326,6 +439,9 @@ class StmtListNode(StmtNode):
 
 # Узел являющийся телом (внутренности между begin и end) содержащий список выражений
 class BodyNode(ExprNode):
+    _fields = ('body',)
+    __slots__ = _fields
+
     def __init__(self, body: Tuple[StmtNode, ...],
                  row: Optional[int] = None, line: Optional[int] = None, **props):
         super().__init__(row=row, line=line, **props)
@@ -341,10 +457,14 @@ class BodyNode(ExprNode):
 # Узел содержащий параметры функции, процедуры
 #TODO переделать, параметры считываются неправильно
 class ParamsNode(StmtNode):
+    _fields = ('vars_list',)
+    __slots__ = _fields
+
     def __init__(self, *vars_list: VarDeclNode,
                  row: Optional[int] = None, line: Optional[int] = None, **props):
         super().__init__(row=row, line=line, **props)
-        self.vars_list = vars_list if vars_list else _empty
+        # Чередующиеся IdentListNode и TypeSpecNode: (a, b: integer; c: char) -> idents, integer, idents, char
+        self.vars_list = vars_list
 
     @property
     def childs(self) -> Tuple[ExprNode, ...]:
@@ -355,10 +475,14 @@ class ParamsNode(StmtNode):
 
 # Узел блока программы (содержит объявления и составной оператор)
 class BlockNode(StmtNode):
+    _fields = ('var_section', 'declarations', 'stmt_list')
+    __slots__ = _fields
+
     def __init__(self, *args, row: Optional[int] = None, line: Optional[int] = None, **props):
         super().__init__(row=row, line=line, **props)
-        
-        print(f"DEBUG: Creating BlockNode with args: {[type(arg).__name__ for arg in args]}")
+
+        if tracer.debug:
+            tracer.event(DEBUG, 'nodes', 'create node', node='BlockNode', args=[type(arg).__name__ for arg in args])
         
         # Разбираем аргументы блока
         self.var_section = None
@@ -391,60 +515,53 @@ class BlockNode(StmtNode):
     def __str__(self) -> str:
         return 'block'
 
+# Заполняет поля объявления подпрограммы из лексем после ключевого слова: имя, параметры (ParamsNode),
+# тип результата (TypeSpecNode, только у функции) и блок (BlockNode), из которого берутся
+# раздел var (vars_decl) и составной оператор (stmt_list)
+def _parse_routine_tokens(decl: StmtNode, tokens: list) -> None:
+    if len(tokens) < 2:
+        return
+    name = tokens[1]
+    decl.name = name if isinstance(name, IdentNode) else IdentNode(name)
+    for token in tokens[2:]:
+        if isinstance(token, ParamsNode):
+            decl.params = (token,)
+        elif isinstance(token, TypeSpecNode):
+            decl.return_type = token
+        elif isinstance(token, BlockNode):
+            decl.vars_decl = token.var_section
+            decl.stmt_list = token.stmt_list
+            if token.declarations and tracer.warning:
+                tracer.event(WARNING, 'nodes', 'nested routines are not supported', routine=decl.name.name)
+
+
 # Узел содержщий объявление процедуры
 # число параметров *args зависит от того, объявили мы процедуру с параметрами или без
 class ProcedureDeclNode(StmtNode):
+    _fields = ('name', 'params', 'vars_decl', 'stmt_list')
+    __slots__ = _fields
+
     def __init__(self, *args, row: Optional[int] = None, line: Optional[int] = None, **props):
         super().__init__(row=row, line=line, **props)
-        print(f"DEBUG: Creating ProcedureDeclNode with {len(args)} args: {[str(arg)[:50] for arg in args]}")
+        if tracer.debug:
+            tracer.event(DEBUG, 'nodes', 'create node', node='ProcedureDeclNode', args=[str(arg)[:50] for arg in args])
         
-        # Parse the procedure declaration from the arguments
+        # Разбираем сгруппированные лексемы: ['procedure', name, [ParamsNode], BlockNode]
         self.name = IdentNode("unknown_procedure")
         self.params = ()
         self.vars_decl = None
         self.stmt_list = StmtListNode()
-        
+
         try:
-            if args and len(args) > 0:
-                # The parser should give us a grouped result
-                tokens = args[0]
-                print(f"DEBUG: ProcedureDeclNode parsing tokens: {tokens}")
-                
-                # If it's a ParseResults or similar iterable, extract components
-                if hasattr(tokens, '__iter__') and not isinstance(tokens, str):
-                    token_list = list(tokens)
-                    print(f"DEBUG: ProcedureDeclNode token list: {[str(t) for t in token_list]}")
-                    
-                    # Expected structure: ['procedure', name, [params], ';', block, ';']
-                    # Or: ['procedure', name, ';', block, ';'] (no params)
-                    if len(token_list) >= 2:
-                        # Skip 'procedure' keyword, get name
-                        if len(token_list) > 1:
-                            name_node = token_list[1]
-                            print(f"DEBUG: ProcedureDeclNode name_node: {name_node}, type: {type(name_node)}")
-                            if hasattr(name_node, 'name'):
-                                self.name = name_node
-                                print(f"DEBUG: ProcedureDeclNode extracted name: {self.name.name}")
-                            elif isinstance(name_node, str):
-                                self.name = IdentNode(name_node)
-                                print(f"DEBUG: ProcedureDeclNode extracted name from string: {name_node}")
-                        
-                        # Look for block (should be at the end)
-                        for token in reversed(token_list):
-                            print(f"DEBUG: ProcedureDeclNode checking block token: {token}, type: {type(token)}")
-                            if 'Block' in str(type(token)):
-                                if hasattr(token, 'stmt_list'):
-                                    self.stmt_list = token.stmt_list
-                                else:
-                                    self.stmt_list = token
-                                print(f"DEBUG: ProcedureDeclNode extracted block")
-                                break
-                
+            if args:
+                _parse_routine_tokens(self, list(args[0]))
         except Exception as e:
-            print(f"DEBUG: Error parsing ProcedureDeclNode: {e}")
+            if tracer.debug:
+                tracer.event(DEBUG, 'nodes', 'declaration not recognized', node='ProcedureDeclNode', error=e)
             # Keep defaults if parsing fails
-        
-        print(f"DEBUG: ProcedureDeclNode created successfully")
+
+        if tracer.debug:
+            tracer.event(DEBUG, 'nodes', 'declaration parsed', node='ProcedureDeclNode', name=self.name.name)
 
     @property
     def childs(self) -> Tuple[IdentNode, ...]:
@@ -465,75 +582,31 @@ class ProcedureDeclNode(StmtNode):
 # Узел содержщий объявление функции
 # число параметров *args зависит от того, объявили мы функцию с параметрами или без
 class FunctionDeclNode(StmtNode):
+    _fields = ('name', 'params', 'return_type', 'vars_decl', 'stmt_list')
+    __slots__ = _fields
+
     def __init__(self, *args, row: Optional[int] = None, line: Optional[int] = None, **props):
         super().__init__(row=row, line=line, **props)
-        print(f"DEBUG: Creating FunctionDeclNode with {len(args)} args: {[str(arg)[:50] for arg in args]}")
+        if tracer.debug:
+            tracer.event(DEBUG, 'nodes', 'create node', node='FunctionDeclNode', args=[str(arg)[:50] for arg in args])
         
-        # Parse the function declaration from the arguments
+        # Разбираем сгруппированные лексемы: ['function', name, [ParamsNode], TypeSpecNode, BlockNode]
         self.name = IdentNode("unknown_function")
         self.params = ()
         self.return_type = TypeSpecNode("integer")
         self.vars_decl = None
         self.stmt_list = StmtListNode()
-        
+
         try:
-            if args and len(args) > 0:
-                # The parser should give us a grouped result
-                tokens = args[0]
-                print(f"DEBUG: FunctionDeclNode parsing tokens: {tokens}")
-                
-                # If it's a ParseResults or similar iterable, extract components
-                if hasattr(tokens, '__iter__') and not isinstance(tokens, str):
-                    token_list = list(tokens)
-                    print(f"DEBUG: FunctionDeclNode token list: {[str(t) for t in token_list]}")
-                    
-                    # Expected structure: ['function', name, [params], ':', return_type, ';', block, ';']
-                    # Or: ['function', name, ':', return_type, ';', block, ';'] (no params)
-                    if len(token_list) >= 2:
-                        # Skip 'function' keyword, get name
-                        if len(token_list) > 1:
-                            name_node = token_list[1]
-                            print(f"DEBUG: FunctionDeclNode name_node: {name_node}, type: {type(name_node)}")
-                            if hasattr(name_node, 'name'):
-                                self.name = name_node
-                                print(f"DEBUG: FunctionDeclNode extracted name: {self.name.name}")
-                            elif isinstance(name_node, str):
-                                self.name = IdentNode(name_node)
-                                print(f"DEBUG: FunctionDeclNode extracted name from string: {name_node}")
-                        
-                        # Look for return type (after ':' or as TypeSpecNode)
-                        for i, token in enumerate(token_list):
-                            print(f"DEBUG: FunctionDeclNode checking token {i}: {token}, type: {type(token)}")
-                            if 'TypeSpec' in str(type(token)):
-                                self.return_type = token
-                                print(f"DEBUG: FunctionDeclNode extracted return type: {self.return_type.name}")
-                                break
-                        
-                        # Look for params (ParamsNode)
-                        for token in token_list:
-                            token_type_str = str(type(token))
-                            print(f"DEBUG: FunctionDeclNode checking for params - token type: {token_type_str}")
-                            if 'ParamsNode' in token_type_str:
-                                self.params = (token,)  # Store as tuple
-                                print(f"DEBUG: FunctionDeclNode extracted params: {token}")
-                                break
-                        
-                        # Look for block (should be at the end)
-                        for token in reversed(token_list):
-                            print(f"DEBUG: FunctionDeclNode checking block token: {token}, type: {type(token)}")
-                            if 'Block' in str(type(token)):
-                                if hasattr(token, 'stmt_list'):
-                                    self.stmt_list = token.stmt_list
-                                else:
-                                    self.stmt_list = token
-                                print(f"DEBUG: FunctionDeclNode extracted block")
-                                break
-                
+            if args:
+                _parse_routine_tokens(self, list(args[0]))
         except Exception as e:
-            print(f"DEBUG: Error parsing FunctionDeclNode: {e}")
+            if tracer.debug:
+                tracer.event(DEBUG, 'nodes', 'declaration not recognized', node='FunctionDeclNode', error=e)
             # Keep defaults if parsing fails
-        
-        print(f"DEBUG: FunctionDeclNode created successfully")
+
+        if tracer.debug:
+            tracer.event(DEBUG, 'nodes', 'declaration parsed', node='FunctionDeclNode', name=self.name.name)
 
     @property
     def childs(self) -> Tuple[IdentNode, ...]:
@@ -555,6 +628,9 @@ class FunctionDeclNode(StmtNode):
 
 # Добавляем класс DeclSectionNode в файл nodes.py
 class DeclSectionNode(StmtNode):
+    _fields = ('decls',)
+    __slots__ = _fields
+
     def __init__(self, *decls: Tuple[Union[VarsDeclNode, ProcedureDeclNode, FunctionDeclNode], ...],
                  row: Optional[int] = None, line: Optional[int] = None, **props):
         super().__init__(row=row, line=line, **props)
@@ -570,6 +646,9 @@ class DeclSectionNode(StmtNode):
 
 # Узел реализующий раздел описания переменных из грамматики
 class VarSectionNode(StmtNode):
+    _fields = ('var_decs',)
+    __slots__ = _fields
+
     def __init__(self, *var_decs: Tuple[Union[VarDeclNode, ArrayDeclNode], ...],
                  row: Optional[int] = None, line: Optional[int] = None, **props):
         super().__init__(row=row, line=line, **props)
@@ -587,6 +666,9 @@ class VarSectionNode(StmtNode):
 # vars_decl раздел описаний
 # stmt_list тело программы
 class ProgramNode(StmtNode):
+    _fields = ('name', 'decl_section', 'stmt_list')
+    __slots__ = _fields
+
     def __init__(self, *args, row: Optional[int] = None, line: Optional[int] = None, **props):
         super().__init__(row=row, line=line, **props)
         
@@ -0,0 +1,266 @@
+"""Оптимизации AST между семантическим анализом и генерацией кода.
+
+    ast, stats = optimize(ast)
+
+Проходы переписывают дерево объектов на месте (представления flatast только для чтения
+и не оптимизируются). stats - счетчики проходов, в том числе removed_nodes - на сколько
+узлов уменьшилось дерево.
+"""
+from typing import Dict, Optional, Tuple
+
+from nodes import *
+from purity import is_pure
+from walker import NodeTransformer, preorder
+
+_INT32_MIN, _INT32_MAX = -(1 << 31), (1 << 31) - 1
+
+
+def _int32(value: int) -> int:
+    # Арифметика MSIL над int32 переполняется с заворачиванием
+    return (value - _INT32_MIN) % (1 << 32) + _INT32_MIN
+
+
+def _div(a: int, b: int) -> int:
+    # div в Pascal (и div в MSIL) округляет к нулю, а не вниз, как // в Python
+    q = abs(a) // abs(b)
+    return -q if (a < 0) != (b < 0) else q
+
+
+def _fold_int(op: BinOp, a: int, b: int):
+    """Значение операции над константами int32 или None, если результат вычисляется только во время выполнения"""
+    if op == BinOp.ADD:
+        return _int32(a + b)
+    if op == BinOp.SUB:
+        return _int32(a - b)
+    if op == BinOp.MUL:
+        return _int32(a * b)
+    if op in (BinOp.DIV, BinOp.DIVISION, BinOp.MOD):
+        # Деление на ноль и int32.MinValue div -1 во время выполнения бросают исключение - их не сворачиваем
+        if b == 0 or (a == _INT32_MIN and b == -1):
+            return None
+        q = _div(a, b)
+        # mod в Pascal (rem в MSIL) имеет знак делимого
+        return a - b * q if op == BinOp.MOD else q
+    if op == BinOp.GT:
+        return a > b
+    if op == BinOp.LT:
+        return a < b
+    if op == BinOp.GE:
+        return a >= b
+    if op == BinOp.LE:
+        return a <= b
+    if op == BinOp.EQUALS:
+        return a == b
+    if op == BinOp.NEQUALS:
+        return a != b
+    return None
+
+
+def _fold_bool(op: BinOp, a: bool, b: bool):
+    if op == BinOp.LOGICAL_AND:
+        return a and b
+    if op == BinOp.LOGICAL_OR:
+        return a or b
+    if op == BinOp.EQUALS:
+        return a == b
+    if op == BinOp.NEQUALS:
+        return a != b
+    return None
+
+
+def _is_int(node) -> bool:
+    return isinstance(node, LiteralNode) and type(node.value) is int and _INT32_MIN <= node.value <= _INT32_MAX
+
+
+def _is_bool(node) -> bool:
+    return isinstance(node, LiteralNode) and type(node.value) is bool
+
+
+def subtree_size(node: AstNode) -> int:
+    count = 0
+    for _ in preorder(node):
+        count += 1
+    return count
+
+
+def make_literal(value, expr_type: Optional[str] = None) -> LiteralNode:
+    if type(value) is bool:
+        literal = LiteralNode('True' if value else 'False')
+    else:
+        literal = LiteralNode(str(value))
+    literal.expr_type = expr_type or ('boolean' if type(value) is bool else 'integer')
+    return literal
+
+
+class ConstantFolder(NodeTransformer):
+    """Сворачивает константные подвыражения и упрощает тождества x*1, x+0, x-0, x div 1, x*0, x and True ...
+
+    Потомки обрабатываются раньше родителя, поэтому (2 * 3) + 4 сворачивается за один проход"""
+
+    def __init__(self):
+        self.folded = 0
+        self.identities = 0
+        self.removed = 0
+
+    def _replace(self, node: BinOpNode, result: AstNode) -> AstNode:
+        # Результат - один из операндов (тогда исчезают узел операции и другой операнд) или новый литерал
+        if result is node.arg1:
+            self.removed += 1 + subtree_size(node.arg2)
+        elif result is node.arg2:
+            self.removed += 1 + subtree_size(node.arg1)
+        else:
+            self.removed += subtree_size(node) - 1
+        return result
+
+    def transform_BinOpNode(self, node: BinOpNode) -> AstNode:
+        op, left, right = node.op, node.arg1, node.arg2
+        value = None
+        if _is_int(left) and _is_int(right):
+            value = _fold_int(op, left.value, right.value)
+        elif _is_bool(left) and _is_bool(right):
+            value = _fold_bool(op, left.value, right.value)
+        if value is not None:
+            self.folded += 1
+            return self._replace(node, make_literal(value, node.expr_type))
+
+        result = self._identity(op, left, right)
+        if result is not None:
+            self.identities += 1
+            return self._replace(node, result)
+        return node
+
+    @staticmethod
+    def _identity(op: BinOp, left: ExprNode, right: ExprNode) -> Optional[AstNode]:
+        if _is_int(right):
+            if right.value == 0 and op in (BinOp.ADD, BinOp.SUB):
+                return left
+            if right.value == 1 and op in (BinOp.MUL, BinOp.DIV, BinOp.DIVISION):
+                return left
+            if right.value == 0 and op == BinOp.MUL and is_pure(left):
+                return right
+        if _is_int(left):
+            if left.value == 0 and op == BinOp.ADD:
+                return right
+            if left.value == 1 and op == BinOp.MUL:
+                return right
+            if left.value == 0 and op == BinOp.MUL and is_pure(right):
+                return left
+        if _is_bool(right):
+            # x and True = x, x or False = x; x and False = False, x or True = True (если x можно не вычислять)
+            if right.value == (op == BinOp.LOGICAL_AND) and op in (BinOp.LOGICAL_AND, BinOp.LOGICAL_OR):
+                return left
+            if right.value == (op == BinOp.LOGICAL_OR) and op in (BinOp.LOGICAL_AND, BinOp.LOGICAL_OR) \
+                    and is_pure(left):
+                return right
+        if _is_bool(left) and op in (BinOp.LOGICAL_AND, BinOp.LOGICAL_OR):
+            if left.value == (op == BinOp.LOGICAL_AND):
+                return right
+            if is_pure(right):
+                return left
+        return None
+
+
+def _is_empty(stmt: Optional[AstNode]) -> bool:
+    return stmt is None or (type(stmt) is StmtListNode and not stmt.stmts)
+
+
+def _is_endless_loop(stmt: AstNode) -> bool:
+    if isinstance(stmt, WhileNode):
+        return _is_bool(stmt.cond) and stmt.cond.value
+    if isinstance(stmt, RepeatNode):
+        return _is_bool(stmt.cond) and not stmt.cond.value
+    return False
+
+
+class DeadCodeEliminator(NodeTransformer):
+    """Удаляет код, который никогда не выполняется:
+    ветки if с константным условием, циклы while False и for с пустым диапазоном,
+    операторы после while True и repeat ... until False (в языке нет break/exit,
+    поэтому из такого цикла не выйти) и пустые составные операторы.
+
+    Запускается после ConstantFolder: условия вида 1 > 2 к этому моменту уже литералы"""
+
+    def __init__(self):
+        self.branches = 0
+        self.unreachable = 0
+        self.empty = 0
+        self.removed = 0
+
+    def _drop(self, node: StmtNode, kept: Optional[AstNode] = None) -> AstNode:
+        # Оператор заменяется оставшейся частью или пустым списком, который потом уберет
+        # (и посчитает) родительский список
+        if kept is None:
+            kept = StmtListNode(row=node.row, line=node.line)
+        self.removed += subtree_size(node) - subtree_size(kept)
+        return kept
+
+    def transform_IfNode(self, node: IfNode) -> AstNode:
+        if _is_bool(node.cond):
+            self.branches += 1
+            branch = node.then_stmt if node.cond.value else node.else_stmt
+            return self._drop(node, None if _is_empty(branch) else branch)
+        if _is_empty(node.else_stmt) and node.else_stmt is not None:
+            self.empty += 1
+            self.removed += subtree_size(node.else_stmt)
+            node.else_stmt = None
+        if _is_empty(node.then_stmt) and node.else_stmt is None and is_pure(node.cond):
+            self.empty += 1
+            return self._drop(node)
+        return node
+
+    def transform_WhileNode(self, node: WhileNode) -> AstNode:
+        if _is_bool(node.cond) and not node.cond.value:
+            self.branches += 1
+            return self._drop(node)
+        return node
+
+    def transform_RepeatNode(self, node: RepeatNode) -> AstNode:
+        # repeat ... until True выполняет тело ровно один раз
+        if _is_bool(node.cond) and node.cond.value:
+            self.branches += 1
+            return self._drop(node, node.stmt_list)
+        return node
+
+    def transform_ForNode(self, node: ForNode) -> AstNode:
+        # Пустой диапазон: остается только присваивание начального значения счетчику
+        init = node.init
+        if isinstance(init, AssignNode) and _is_int(init.val) and _is_int(node.to) \
+                and init.val.value > node.to.value:
+            self.branches += 1
+            return self._drop(node, init)
+        return node
+
+    def transform_StmtListNode(self, node: StmtListNode) -> StmtListNode:
+        stmts = node.stmts
+        items = []
+        for i, stmt in enumerate(stmts):
+            if _is_empty(stmt):
+                self.empty += 1
+                self.removed += 1
+                continue
+            items.append(stmt)
+            if _is_endless_loop(stmt):
+                # Бесконечный цикл: все, что после него, недостижимо
+                tail = stmts[i + 1:]
+                self.unreachable += len(tail)
+                self.removed += sum(subtree_size(s) for s in tail)
+                break
+        if len(items) != len(stmts):
+            node.stmts = tuple(items)
+        return node
+
+
+def optimize(ast: AstNode) -> Tuple[AstNode, Dict[str, int]]:
+    """Прогоняет все оптимизации AST; возвращает (возможно, новый) корень и счетчики"""
+    folder = ConstantFolder()
+    ast = folder.transform(ast)
+    eliminator = DeadCodeEliminator()
+    ast = eliminator.transform(ast)
+    return ast, {
+        'folded': folder.folded,
+        'identities': folder.identities,
+        'pruned_branches': eliminator.branches,
+        'unreachable_stmts': eliminator.unreachable,
+        'empty_blocks': eliminator.empty,
+        'removed_nodes': folder.removed + eliminator.removed,
+    }
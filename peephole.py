@@ -0,0 +1,105 @@
+"""Оптимизация MSIL по соседним инструкциям (peephole) в теле одного метода.
+
+    peephole = PeepholeOptimizer()
+    body = peephole.optimize(body, local_names)
+    peephole.hits   # {'store_load': 3, 'branch_to_next': 1, ...}
+
+Тело - записи msil.Instruction (инструкции и метки) без заголовка и директив метода.
+Правила:
+    store_load      stloc x; ldloc x -> dup; stloc x (так же starg/ldarg, stsfld/ldsfld)
+    branch_to_next  br L, за которым сразу идет метка L, удаляется
+    short_const     ldc.i4 N -> ldc.i4.N / ldc.i4.m1 / ldc.i4.s N
+    short_local     ldloc/stloc x -> ldloc.0-3 / ldloc.s x по номеру в .locals
+    short_arg       ldarg/starg N -> ldarg.0-3 / ldarg.s N / starg.s N
+"""
+from typing import Dict, List, Optional, Sequence
+
+from msil import Instruction
+
+RULES = ('store_load', 'branch_to_next', 'short_const', 'short_local', 'short_arg')
+
+# Сохранение -> загрузка того же места
+_LOADS = {'stloc': 'ldloc', 'starg': 'ldarg', 'stsfld': 'ldsfld'}
+
+
+class PeepholeOptimizer:
+    """Счетчики срабатываний правил (hits) накапливаются по всем обработанным методам"""
+
+    def __init__(self):
+        self.hits: Dict[str, int] = dict.fromkeys(RULES, 0)
+
+    def optimize(self, body: List[Instruction], local_names: Sequence[str] = ()) -> List[Instruction]:
+        body = self._store_load(body)
+        body = self._branch_to_next(body)
+        return self._short_forms(body, {name: index for index, name in enumerate(local_names)})
+
+    def _store_load(self, body: List[Instruction]) -> List[Instruction]:
+        result = []
+        i, n = 0, len(body)
+        while i < n:
+            instr = body[i]
+            load = _LOADS.get(instr.opcode)
+            if load is not None and i + 1 < n:
+                # Между сохранением и загрузкой не должно быть метки: на загрузку могут перейти из другого места
+                following = body[i + 1]
+                if following.opcode == load and following.operand == instr.operand:
+                    result.append(Instruction('dup'))
+                    result.append(instr)
+                    self.hits['store_load'] += 1
+                    i += 2
+                    continue
+            result.append(instr)
+            i += 1
+        return result
+
+    def _branch_to_next(self, body: List[Instruction]) -> List[Instruction]:
+        result = []
+        n = len(body)
+        for i, instr in enumerate(body):
+            if instr.opcode == 'br':
+                # Метки сразу за переходом (их может быть несколько подряд)
+                j = i + 1
+                while j < n and body[j].opcode is None and body[j].label != instr.operand:
+                    j += 1
+                if j < n and body[j].opcode is None:
+                    self.hits['branch_to_next'] += 1
+                    continue
+            result.append(instr)
+        return result
+
+    def _short_forms(self, body: List[Instruction], locals_index: Dict[str, int]) -> List[Instruction]:
+        hits = self.hits
+        for instr in body:
+            op = instr.opcode
+            if op == 'ldc.i4':
+                short = self._short_const(instr.operand)
+                if short is not None:
+                    instr.opcode, instr.operand = short
+                    hits['short_const'] += 1
+            elif op == 'ldloc' or op == 'stloc':
+                index = locals_index.get(instr.operand)
+                if index is not None and index <= 255:
+                    if index <= 3:
+                        instr.opcode, instr.operand = f'{op}.{index}', None
+                    else:
+                        instr.opcode = op + '.s'
+                    hits['short_local'] += 1
+            elif op == 'ldarg' or op == 'starg':
+                index = instr.operand
+                if op == 'ldarg' and index <= 3:
+                    instr.opcode, instr.operand = f'ldarg.{index}', None
+                    hits['short_arg'] += 1
+                elif index <= 255:
+                    instr.opcode = op + '.s'
+                    hits['short_arg'] += 1
+        return body
+
+    @staticmethod
+    def _short_const(value: int) -> Optional[tuple]:
+        if value == -1:
+            return 'ldc.i4.m1', None
+        if 0 <= value <= 8:
+            return f'ldc.i4.{value}', None
+        if -128 <= value <= 127:
+            return 'ldc.i4.s', value
+        return None
@@ -0,0 +1,29 @@
+"""Чистота выражений: можно ли не вычислять выражение, если его результат не нужен.
+
+    is_pure(expr)   # False, если в выражении есть вызов или деление, которое может бросить исключение
+
+Общий модуль для оптимизатора (optimize.py: x * 0, if без ветвей) и генератора кода
+(codegen.py: ленивое вычисление and/or), чтобы генератор не зависел от проходов оптимизации.
+"""
+from nodes import AstNode, BinOp, BinOpNode, CallNode, LiteralNode
+from walker import preorder
+
+_INT32_MIN, _INT32_MAX = -(1 << 31), (1 << 31) - 1
+_DIVISIONS = (BinOp.DIV, BinOp.DIVISION, BinOp.MOD)
+
+
+def _safe_divisor(node: AstNode) -> bool:
+    # Деление на ноль и int32.MinValue div -1 бросают исключение - безопасен только литерал-делитель
+    return isinstance(node, LiteralNode) and type(node.value) is int \
+        and _INT32_MIN <= node.value <= _INT32_MAX and node.value not in (0, -1)
+
+
+def is_pure(node: AstNode) -> bool:
+    """Выражение без вызовов и делений, которые могут бросить исключение:
+    его можно не вычислять, если результат не нужен"""
+    for child in preorder(node):
+        if isinstance(child, CallNode):
+            return False
+        if isinstance(child, BinOpNode) and child.op in _DIVISIONS and not _safe_divisor(child.arg2):
+            return False
+    return True
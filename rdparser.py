@@ -0,0 +1,317 @@
+from nodes import *
+from lexer import Tok, TOKEN_TEXT, PascalSyntaxError, TokenStream, tokenize
+
+
+# Бинарные операции: вид лексемы -> (приоритет, операция).
+# Приоритеты повторяют уровни grammar.py: or < and < сравнения < +,- < *,/,div,mod
+_OR, _AND, _RELATIONAL, _ADDITIVE, _MULTIPLICATIVE = range(1, 6)
+BINARY_OPS = {
+    Tok.OR: (_OR, BinOp.LOGICAL_OR),
+    Tok.AND: (_AND, BinOp.LOGICAL_AND),
+    Tok.GE: (_RELATIONAL, BinOp.GE),
+    Tok.LE: (_RELATIONAL, BinOp.LE),
+    Tok.GT: (_RELATIONAL, BinOp.GT),
+    Tok.LT: (_RELATIONAL, BinOp.LT),
+    Tok.EQUALS: (_RELATIONAL, BinOp.EQUALS),
+    Tok.NEQUALS: (_RELATIONAL, BinOp.NEQUALS),
+    Tok.ADD: (_ADDITIVE, BinOp.ADD),
+    Tok.SUB: (_ADDITIVE, BinOp.SUB),
+    Tok.MUL: (_MULTIPLICATIVE, BinOp.MUL),
+    Tok.DIVISION: (_MULTIPLICATIVE, BinOp.DIVISION),
+    Tok.DIV: (_MULTIPLICATIVE, BinOp.DIV),
+    Tok.MOD: (_MULTIPLICATIVE, BinOp.MOD),
+}
+
+TYPE_NAMES = {Tok.INTEGER: 'integer', Tok.CHAR: 'char', Tok.BOOLEAN: 'boolean'}
+LITERALS = (Tok.NUMBER, Tok.STRING, Tok.TRUE, Tok.FALSE)
+
+
+# Предиктивный парсер (рекурсивный спуск + precedence climbing для выражений).
+# Оператор выбирается по первой лексеме, поэтому время разбора линейно по длине программы.
+# Строит те же узлы nodes.py, что и PascalGrammar, но без отката на альтернативах
+class PascalRDParser:
+    def __init__(self):
+        self.tokens = None
+        self.kinds = None
+        self.pos = 0
+        self._statements = {
+            Tok.IF: self.if_stmt,
+            Tok.FOR: self.for_stmt,
+            Tok.WHILE: self.while_stmt,
+            Tok.REPEAT: self.repeat_stmt,
+            Tok.BEGIN: self.compound_stmt,
+            Tok.IDENT: self.simple_stmt,
+        }
+
+    def parse(self, prog: str) -> ProgramNode:
+        self.reset(tokenize(str(prog)))
+        program = self.program()
+        self.expect(Tok.EOF)
+        return program
+
+    def reset(self, tokens: TokenStream) -> None:
+        self.tokens = tokens
+        self.kinds = tokens.kinds
+        self.pos = 0
+
+    # Вспомогательные методы
+
+    def error(self, expected: str):
+        tokens = self.tokens
+        raise PascalSyntaxError('Expected {0}, found {1}'.format(expected, tokens.describe(self.pos)),
+                                tokens.source, tokens.starts[self.pos])
+
+    def expect(self, kind: Tok) -> int:
+        pos = self.pos
+        if self.kinds[pos] != kind:
+            self.error(TOKEN_TEXT[kind])
+        self.pos = pos + 1
+        return pos
+
+    def accept(self, kind: Tok) -> bool:
+        if self.kinds[self.pos] == kind:
+            self.pos += 1
+            return True
+        return False
+
+    def text(self, pos: int) -> str:
+        return self.tokens.text(pos)
+
+    # Объявления
+
+    def program(self) -> ProgramNode:
+        self.expect(Tok.PROGRAM)
+        name = self.ident()
+        self.expect(Tok.SEMI)
+        block = self.block()
+        self.expect(Tok.DOT)
+        return ProgramNode(name, block)
+
+    def block(self) -> BlockNode:
+        args = []
+        if self.kinds[self.pos] == Tok.VAR:
+            args.append(self.var_section())
+        while True:
+            kind = self.kinds[self.pos]
+            if kind == Tok.PROCEDURE:
+                args.append(self.procedure_decl())
+            elif kind == Tok.FUNCTION:
+                args.append(self.function_decl())
+            else:
+                break
+        args.append(self.compound_stmt())
+        return BlockNode(*args)
+
+    def var_section(self) -> VarSectionNode:
+        self.expect(Tok.VAR)
+        decls = [self.var_decl()]
+        while self.kinds[self.pos] == Tok.IDENT:
+            decls.append(self.var_decl())
+        return VarSectionNode(*decls)
+
+    def var_decl(self) -> Union[VarDeclNode, ArrayDeclNode]:
+        ident_list = self.ident_list()
+        self.expect(Tok.COLON)
+        if self.accept(Tok.ARRAY):
+            self.expect(Tok.LBRACK)
+            from_ = self.literal()
+            self.expect(Tok.DOTDOT)
+            to_ = self.literal()
+            self.expect(Tok.RBRACK)
+            self.expect(Tok.OF)
+            decl = ArrayDeclNode(ident_list, from_, to_, self.type_spec())
+        else:
+            decl = VarDeclNode(ident_list, self.type_spec())
+        self.expect(Tok.SEMI)
+        return decl
+
+    def ident_list(self) -> IdentListNode:
+        idents = [self.ident()]
+        while self.accept(Tok.COMMA):
+            idents.append(self.ident())
+        return IdentListNode(*idents)
+
+    def type_spec(self) -> TypeSpecNode:
+        name = TYPE_NAMES.get(self.kinds[self.pos])
+        if name is None:
+            self.error('type')
+        self.pos += 1
+        return TypeSpecNode(name)
+
+    def params(self) -> ParamsNode:
+        self.expect(Tok.LPAR)
+        args = []
+        if self.kinds[self.pos] == Tok.IDENT:
+            while True:
+                args.append(self.ident_list())
+                self.expect(Tok.COLON)
+                args.append(self.type_spec())
+                if not self.accept(Tok.SEMI):
+                    break
+        self.expect(Tok.RPAR)
+        return ParamsNode(*args)
+
+    # Узлы объявлений подпрограмм разбирают сгруппированные лексемы сами,
+    # поэтому им передается тот же список, что и pp.Group в grammar.py
+    def procedure_decl(self) -> ProcedureDeclNode:
+        self.expect(Tok.PROCEDURE)
+        tokens = ['procedure', self.ident()]
+        if self.kinds[self.pos] == Tok.LPAR:
+            tokens.append(self.params())
+        self.expect(Tok.SEMI)
+        tokens.append(self.block())
+        self.expect(Tok.SEMI)
+        return ProcedureDeclNode(tokens)
+
+    def function_decl(self) -> FunctionDeclNode:
+        self.expect(Tok.FUNCTION)
+        tokens = ['function', self.ident()]
+        if self.kinds[self.pos] == Tok.LPAR:
+            tokens.append(self.params())
+        self.expect(Tok.COLON)
+        tokens.append(self.type_spec())
+        self.expect(Tok.SEMI)
+        tokens.append(self.block())
+        self.expect(Tok.SEMI)
+        return FunctionDeclNode(tokens)
+
+    # Операторы
+
+    def stmt_list(self) -> StmtListNode:
+        stmts = []
+        statements = self._statements
+        while True:
+            handler = statements.get(self.kinds[self.pos])
+            if handler is None:
+                return StmtListNode(*stmts)
+            stmts.append(handler())
+
+    def stmt(self) -> StmtNode:
+        handler = self._statements.get(self.kinds[self.pos])
+        if handler is None:
+            self.error('statement')
+        return handler()
+
+    def compound_stmt(self) -> StmtListNode:
+        self.expect(Tok.BEGIN)
+        stmt_list = self.stmt_list()
+        self.expect(Tok.END)
+        return stmt_list
+
+    def if_stmt(self) -> IfNode:
+        self.pos += 1
+        cond = self.expr()
+        self.expect(Tok.THEN)
+        then_stmt = self.stmt()
+        if self.accept(Tok.ELSE):
+            return IfNode(cond, then_stmt, self.stmt())
+        return IfNode(cond, then_stmt)
+
+    def while_stmt(self) -> WhileNode:
+        self.pos += 1
+        cond = self.expr()
+        self.expect(Tok.DO)
+        return WhileNode(cond, self.stmt())
+
+    def repeat_stmt(self) -> RepeatNode:
+        self.pos += 1
+        stmt_list = self.stmt_list()
+        self.expect(Tok.UNTIL)
+        return RepeatNode(stmt_list, self.expr())
+
+    def for_stmt(self) -> ForNode:
+        self.pos += 1
+        var = self.ident()
+        self.expect(Tok.ASSIGN)
+        init = AssignNode(var, self.expr())
+        self.expect(Tok.TO)
+        to = self.expr()
+        self.expect(Tok.DO)
+        return ForNode(init, to, self.stmt())
+
+    def simple_stmt(self) -> StmtNode:
+        next_kind = self.kinds[self.pos + 1]
+        if next_kind == Tok.LPAR:
+            call = self.call()
+            # writeln(...) допускается без ';' - так же разбирает writeln_stmt в grammar.py
+            if not self.accept(Tok.SEMI) and call.func.name.lower() != 'writeln':
+                self.error("';'")
+            return call
+        if next_kind == Tok.LBRACK:
+            var = self.array_ident()
+        else:
+            var = self.ident()
+        self.expect(Tok.ASSIGN)
+        stmt = AssignNode(var, self.expr())
+        self.expect(Tok.SEMI)
+        return stmt
+
+    # Выражения
+
+    def expr(self, min_prec: int = _OR) -> ExprNode:
+        left = self.factor()
+        kinds = self.kinds
+        while True:
+            entry = BINARY_OPS.get(kinds[self.pos])
+            if entry is None or entry[0] < min_prec:
+                return left
+            prec, op = entry
+            self.pos += 1
+            left = BinOpNode(op, left, self.expr(prec + 1))
+            # Сравнения не ассоциативны: a < b < c - ошибка на любом уровне вложенности, как и в grammar.py
+            # (возврат из вложенного вызова позволил бы внешнему циклу принять x and a < b < c как (x and a < b) < c)
+            if prec == _RELATIONAL:
+                entry = BINARY_OPS.get(kinds[self.pos])
+                if entry is not None and entry[0] == _RELATIONAL:
+                    self.error('end of comparison')
+
+    def factor(self) -> ExprNode:
+        kind = self.kinds[self.pos]
+        if kind == Tok.IDENT:
+            next_kind = self.kinds[self.pos + 1]
+            if next_kind == Tok.LPAR:
+                return self.call()
+            if next_kind == Tok.LBRACK:
+                return self.array_ident()
+            return self.ident()
+        if kind == Tok.LPAR:
+            self.pos += 1
+            node = self.expr()
+            self.expect(Tok.RPAR)
+            return node
+        return self.literal()
+
+    def literal(self) -> LiteralNode:
+        pos = self.pos
+        kind = self.kinds[pos]
+        if kind in LITERALS:
+            self.pos = pos + 1
+            return LiteralNode(self.text(pos))
+        # Знак входит в числовой литерал, только если стоит вплотную к числу
+        tokens = self.tokens
+        if (kind == Tok.ADD or kind == Tok.SUB) and self.kinds[pos + 1] == Tok.NUMBER \
+                and tokens.end(pos) == tokens.starts[pos + 1]:
+            self.pos = pos + 2
+            return LiteralNode(self.text(pos) + self.text(pos + 1))
+        self.error('expression')
+
+    def ident(self) -> IdentNode:
+        return IdentNode(self.text(self.expect(Tok.IDENT)))
+
+    def array_ident(self) -> ArrayIdentNode:
+        name = self.ident()
+        self.expect(Tok.LBRACK)
+        index = self.expr()
+        self.expect(Tok.RBRACK)
+        return ArrayIdentNode(name, index)
+
+    def call(self) -> CallNode:
+        func = self.ident()
+        self.expect(Tok.LPAR)
+        args = []
+        if self.kinds[self.pos] != Tok.RPAR:
+            args.append(self.expr())
+            while self.accept(Tok.COMMA):
+                args.append(self.expr())
+        self.expect(Tok.RPAR)
+        return CallNode(func, *args)
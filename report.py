@@ -0,0 +1,112 @@
+"""Отчет о компиляции: время каждой фазы и размеры ее результата.
+
+    msil_code, report = compile_with_report(source)
+    _, report = compile_with_report(source, il_path='program.il')   # IL сразу в файл, без строки
+    report.write('program.report.json')
+
+Фаза записывает время по часам (wall_ms) и процессорное время (cpu_ms), а также
+счетчики: число узлов AST после разбора, символов глобальной области после
+семантического анализа, счетчики оптимизаций AST, инструкций MSIL и срабатываний
+peephole-правил после генерации кода.
+"""
+import json
+import time
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+from nodes import AstNode
+from walker import preorder
+from diagnostics import tracer, INFO
+
+
+def count_nodes(root: AstNode) -> int:
+    # Сырые лексемы pyparsing обход не выдает - считаются только узлы
+    count = 0
+    for _ in preorder(root):
+        count += 1
+    return count
+
+
+class CompileReport:
+    def __init__(self, name: Optional[str] = None):
+        self.name = name
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name: str):
+        """Замеряет фазу; в выданный словарь фаза добавляет свои счетчики"""
+        record = {'phase': name}
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        except Exception as e:
+            record['error'] = '%s: %s' % (type(e).__name__, e)
+            raise
+        finally:
+            record['wall_ms'] = round((time.perf_counter() - wall) * 1000, 3)
+            record['cpu_ms'] = round((time.process_time() - cpu) * 1000, 3)
+            self.phases.append(record)
+            if tracer.info:
+                tracer.event(INFO, 'report', 'phase', source=self.name, **record)
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'phases': self.phases,
+            'total_wall_ms': round(sum(p['wall_ms'] for p in self.phases), 3),
+            'total_cpu_ms': round(sum(p['cpu_ms'] for p in self.phases), 3),
+        }
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.to_dict(), indent=indent, ensure_ascii=False)
+
+    def write(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_json())
+
+
+def compile_with_report(source: str, grammar=None, name: Optional[str] = None, exe_name: Optional[str] = None,
+                        report: Optional[CompileReport] = None, optimize: bool = True,
+                        il_path: Optional[str] = None) -> Tuple[Optional[str], CompileReport]:
+    """Конвейер разбор -> семантика -> оптимизация AST -> MSIL (-> exe, если задан exe_name) с замером каждой фазы.
+    Если задан il_path, IL пишется в этот файл по частям (фаза write_il), а вместо строки IL возвращается None.
+    Если фаза падает, исключение пробрасывается, а переданный report содержит уже пройденные фазы"""
+    from grammar import PascalGrammar
+    from semantic import SemanticAnalyzer
+    from codegen import MSILCodeGenerator, compile_to_exe
+    import optimize as optimizer
+
+    if report is None:
+        report = CompileReport(name)
+    if grammar is None:
+        grammar = PascalGrammar()
+    with report.phase('parse') as record:
+        ast = grammar.parse(source)
+        record['nodes'] = count_nodes(ast)
+    with report.phase('semantic') as record:
+        analyzer = SemanticAnalyzer()
+        analyzer.visit(ast)
+        scope = getattr(analyzer, 'global_scope', None)
+        record['symbols'] = len(scope) if scope is not None else 0
+    if optimize:
+        with report.phase('optimize') as record:
+            ast, stats = optimizer.optimize(ast)
+            record.update(stats)
+    with report.phase('codegen') as record:
+        generator = MSILCodeGenerator()
+        generator.generate(ast)
+        record['instructions'] = generator.instruction_count
+        record['lines'] = len(generator.code)
+        if generator.peephole is not None:
+            record['peephole'] = dict(generator.peephole.hits)
+    if il_path is None:
+        msil_code = generator.text()
+    else:
+        msil_code = None
+        with report.phase('write_il') as record:
+            with open(il_path, 'w') as f:
+                record['chars'] = generator.write(f)
+    if exe_name is not None:
+        with report.phase('compile_to_exe') as record:
+            record['ok'] = compile_to_exe(generator if msil_code is None else msil_code, exe_name)
+    return msil_code, report
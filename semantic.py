@@ -1,26 +1,43 @@
+import sys
+from typing import Optional
+
 from nodes import *
-from grammar import *
 from symbols import *
+from diagnostics import tracer, DEBUG, WARNING
+from walker import NodeVisitor
+
+
+# Идентификаторы Pascal не различают регистр: ключ таблицы - имя в нижнем регистре.
+# Ключи интернируются и кэшируются по исходному написанию, чтобы поиск не приводил строку заново.
+# Кэш живет столько же, сколько процесс (редактор, рабочие процессы драйвера), поэтому его размер
+# ограничен: при переполнении он сбрасывается и заполняется заново именами текущих программ
+_MAX_KEYS = 4096
+_keys = {}
+
 
+def symbol_key(name: str) -> str:
+    key = _keys.get(name)
+    if key is None:
+        if len(_keys) >= _MAX_KEYS:
+            _keys.clear()
+        key = _keys[name] = sys.intern(str(name).lower())
+    return key
 
-class NodeVisitor(object):
-    def visit(self, node):
-        method_name = 'visit_' + type(node).__name__
-        visitor = getattr(self, method_name, self.generic_visit)
-        return visitor(node)
 
-    def generic_visit(self, node):
-        raise Exception('No visit_{} method'.format(type(node).__name__))
+# Встроенные типы и подпрограммы: одна область на все программы, ее не изменяют после создания.
+# Пока она не построена, новые области создаются без внешней
+BUILTINS = None
 
 
 class ScopedSymbolTable(object):
+    __slots__ = ('_symbols', 'scope_name', 'scope_level', 'enclosing_scope')
+
     def __init__(self, scope_name, scope_level, enclosing_scope=None):
+        """Область без enclosing_scope вкладывается в общую область встроенных имен BUILTINS"""
         self._symbols = {}
         self.scope_name = scope_name
         self.scope_level = scope_level
-        self.enclosing_scope = enclosing_scope
-        self.init_builtins()
-        self.init_builtin_functions()
+        self.enclosing_scope = enclosing_scope if enclosing_scope is not None else BUILTINS
 
     def __str__(self):
         h1 = 'SCOPE (SCOPED SYMBOL TABLE)'
@@ -43,6 +60,9 @@ class ScopedSymbolTable(object):
         s = '\n'.join(lines)
         return s
 
+    def __len__(self):
+        return len(self._symbols)
+
     def init_builtins(self):
         self.define(BuiltinTypeSymbol('integer'))
         self.define(BuiltinTypeSymbol('char'))
@@ -53,121 +73,191 @@ class ScopedSymbolTable(object):
         self.define(BuiltinFunction('ReadLn'))
         self.define(BuiltinFunction('Write'))
         self.define(BuiltinFunction('WriteLn'))
-        self.define(BuiltinFunction('writeln'))
 
     def define(self, symbol: Symbol):
-        print('Define: %s' % symbol)
-        self._symbols[symbol.name] = symbol
+        if tracer.debug:
+            tracer.event(DEBUG, 'semantic', 'define', scope=self.scope_name, symbol=symbol)
+        self._symbols[symbol_key(symbol.name)] = symbol
 
     def lookup(self, name, current_scope_only=False) -> Symbol:
-        print('Lookup: %s' % name)
-        symbol = self._symbols.get(name)
-        if symbol is not None:
-            return symbol
-
+        if tracer.debug:
+            tracer.event(DEBUG, 'semantic', 'lookup', scope=self.scope_name, name=name)
+        key = symbol_key(name)
         if current_scope_only:
-            return None
-
-        if self.enclosing_scope is not None:
-            return self.enclosing_scope.lookup(name)
-
+            return self._symbols.get(key)
+        # Цепочка областей обходится циклом; встроенные имена лежат в ее конце, в BUILTINS
+        scope = self
+        while scope is not None:
+            symbol = scope._symbols.get(key)
+            if symbol is not None:
+                return symbol
+            scope = scope.enclosing_scope
+        return None
+
+
+BUILTINS = ScopedSymbolTable('builtins', 0)
+BUILTINS.init_builtins()
+BUILTINS.init_builtin_functions()
+
+
+# Типы литералов по типу значения LiteralNode
+_LITERAL_TYPES = {int: 'integer', str: 'char', bool: 'boolean'}
+
+# Допустимые типы операндов бинарных операций (оба операнда одного типа)
+_OPERAND_TYPES = {
+    BinOp.ADD: ('integer', 'char'),
+    BinOp.SUB: ('integer',),
+    BinOp.MUL: ('integer',),
+    BinOp.DIVISION: ('integer',),
+    BinOp.DIV: ('integer',),
+    BinOp.MOD: ('integer',),
+    BinOp.GE: ('integer', 'char'),
+    BinOp.LE: ('integer', 'char'),
+    BinOp.NEQUALS: ('integer', 'char', 'boolean'),
+    BinOp.EQUALS: ('integer', 'char', 'boolean'),
+    BinOp.GT: ('integer', 'char'),
+    BinOp.LT: ('integer', 'char'),
+    BinOp.LOGICAL_AND: ('boolean',),
+    BinOp.LOGICAL_OR: ('boolean',),
+}
+_COMPARISONS = (BinOp.GE, BinOp.LE, BinOp.NEQUALS, BinOp.EQUALS, BinOp.GT, BinOp.LT)
+
+# Сигнатуры бинарных операций: (операция, тип левого операнда, тип правого) -> тип результата
+BINOP_SIGNATURES = {
+    (op, arg_type, arg_type): 'boolean' if op in _COMPARISONS else arg_type
+    for op, arg_types in _OPERAND_TYPES.items()
+    for arg_type in arg_types
+}
+
+
+def _type_name(symbol: Symbol) -> Optional[str]:
+    return symbol.type.name if symbol.type is not None else None
 
 
 class SemanticAnalyzer(NodeVisitor):
+    """Проверяет программу, записывает тип каждого выражения в node.expr_type,
+    а символ каждого имени, вызова и объявления подпрограммы - в node.binding"""
+
     def __init__(self):
         # self.global_scope = ScopedSymbolTable(scope_name='global', scope_level=1)
         # self.current_scope = self.global_scope
-        self.dictionary = {'int':'integer', 'str':'char','bool':'boolean'}
-        self.BinOpArgTypes = {
-            'ADD':['integer','char'],
-            'SUB':['integer'],
-            'MUL':['integer'],
-            'DIVISION':['integer'],
-            'DIV':['integer'],
-            'MOD':['integer'],
-            'GE':['integer','char'],
-            'LE':['integer','char'],
-            'NEQUALS':['integer','char','boolean'],
-            'EQUALS':['integer','char','boolean'],
-            'GT':['integer','char'],
-            'LT': ['integer', 'char'],
-            'LOGICAL_AND':['boolean'],
-            'LOGICAL_OR':['boolean']}
-
-        self.BinOpReturnTypes = {
-            'ADD': ['integer', 'char'],
-            'SUB': ['integer'],
-            'MUL': ['integer'],
-            'DIVISION': ['integer'],
-            'DIV': ['integer'],
-            'MOD': ['integer'],
-            'GE': ['boolean'],
-            'LE': ['boolean'],
-            'NEQUALS': ['boolean'],
-            'EQUALS': ['boolean'],
-            'GT': ['boolean'],
-            'LT': ['boolean'],
-            'LOGICAL_AND': ['boolean'],
-            'LOGICAL_OR': ['boolean']}
         self.current_scope = None
+        # Символ подпрограммы, тело которой анализируется (None - главная программа)
+        self.current_routine = None
+        self.program_symbol = BlockSymbol('program')
         self.log = []
 
-    #convert type name to a correct format
-    def __changeType(self,type) -> str:
-        for key in self.dictionary:
-            if type == key :
-                return self.dictionary[key]
-        return type
+    def _declare_var(self, symbol: VarSymbol) -> None:
+        """Определяет переменную в текущей области и назначает ей вид хранения и номер"""
+        #only for current scope
+        if self.current_scope.lookup(symbol.name, current_scope_only=True):
+            raise Exception(
+                "Duplicate identifier '%s' found" % symbol.name
+            )
+        owner = self.current_routine or self.program_symbol
+        symbol.kind = LOCAL if self.current_routine else GLOBAL
+        symbol.index = len(owner.locals)
+        symbol.level = self.current_scope.scope_level
+        owner.locals.append(symbol)
+        self.current_scope.define(symbol)
+
+    def _declare_params(self, routine: Symbol, node) -> None:
+        # node.params - кортеж из ParamsNode, в котором чередуются IdentListNode и TypeSpecNode
+        for params in node.params:
+            vars_list = params.vars_list
+            for i in range(0, len(vars_list) - 1, 2):
+                param_type = self.current_scope.lookup(vars_list[i + 1].name)
+                for ident in vars_list[i].idents:
+                    if self.current_scope.lookup(ident.name, current_scope_only=True):
+                        raise Exception(
+                            "Duplicate identifier '%s' found" % ident.name
+                        )
+                    symbol = VarSymbol(ident.name, param_type, ARGUMENT, len(routine.params),
+                                       self.current_scope.scope_level)
+                    self.current_scope.define(symbol)
+                    routine.params.append(symbol)
+                    ident.binding = symbol
+
+    def _visit_routine(self, node, routine: Symbol) -> None:
+        """Общая часть процедур и функций: символ, область, параметры, локальные переменные и тело"""
+        name = routine.name
+        if self.current_scope.lookup(name, current_scope_only=True):
+            raise Exception(
+                "Duplicate identifier '%s' found" % name
+            )
+        # Символ определяется до анализа тела, чтобы подпрограмма могла вызывать себя
+        self.current_scope.define(routine)
+        node.binding = routine
+        node.name.binding = routine
+
+        self.log.append(f'ENTER scope: {name}')
+        routine_scope = ScopedSymbolTable(
+            scope_name=name,
+            scope_level=self.current_scope.scope_level + 1,
+            enclosing_scope=self.current_scope
+        )
+        prev_scope, prev_routine = self.current_scope, self.current_routine
+        self.current_scope, self.current_routine = routine_scope, routine
+        try:
+            self._declare_params(routine, node)
+            if node.vars_decl:
+                self.visit(node.vars_decl)
+            self.visit(node.stmt_list)
+        except Exception:
+            # Подпрограмма с ошибкой не считается проанализированной: генератор кода не должен ее компилировать
+            node.binding = None
+            node.name.binding = None
+            raise
+        finally:
+            self.current_scope, self.current_routine = prev_scope, prev_routine
+        self.log.append(str(routine_scope))
+        self.log.append(f'LEAVE scope: {name}')
+
+    def _resolve(self, name: str) -> Optional[Symbol]:
+        symbol = self.current_scope.lookup(name)
+        # Имя функции внутри ее тела обозначает переменную результата
+        if symbol is not None and symbol is self.current_routine and isinstance(symbol, FunctionSymbol):
+            return symbol.result
+        return symbol
 
     def __typeChecker(self, type1, type2):
         if(type1 is None or type2 is None):
             return True
-        if type1 == type2:
-            return True
-        for key in self.dictionary:
-            if(type1 == key and type2 == self.dictionary[key] or type2==key and type1==self.dictionary[key]):
-                return True
-        return False
-
-    def __isBinaryArgsValid(self, binOP, type_var):
-        for key in self.BinOpArgTypes:
-            if(binOP == key and type_var in self.BinOpArgTypes[key]):
-                return True
-        return False
-
-    def __BinaryReturningType(self,binOP,type_var)->str:
-        for key in self.BinOpReturnTypes:
-            if key == binOP:
-                if len(self.BinOpReturnTypes[key]) == 1:
-                    return self.BinOpReturnTypes[key][0]
-                else:
-                    return type_var
-
+        return type1 == type2
 
     def visit_BinOpNode(self, node):
         type_arg1 = self.visit(node.arg1)
         type_arg2 = self.visit(node.arg2)
 
-        if (not isinstance(node.arg1, BinOpNode)) or not (isinstance(node.arg2, BinOpNode)):
-            if type_arg1 is not None and not self.__typeChecker(type_arg1, type_arg2):
-                raise Exception("Incompatible types in line: ")
-            type_arg1 = self.__changeType(type_arg1)
-            type_arg2 = self.__changeType(type_arg2)
-            if not self.__isBinaryArgsValid(node.op.name, type_arg1):
-                raise Exception(
-                    "Operation {op} not supported for types {t1} and {t2}"
-                        .format(op = node.op.name,t1 = type_arg1,t2=type_arg2))
-            return self.__BinaryReturningType(node.op.name, type_arg1)
+        # Операнд неизвестного типа (например, результат встроенной функции) принимает тип другого
+        if type_arg1 is None:
+            type_arg1 = type_arg2
+        elif type_arg2 is None:
+            type_arg2 = type_arg1
+        elif type_arg1 != type_arg2:
+            raise Exception(
+                "Incompatible types {t1} and {t2} for operation {op}"
+                    .format(op=node.op.name, t1=type_arg1, t2=type_arg2))
+        result = BINOP_SIGNATURES.get((node.op, type_arg1, type_arg2))
+        if result is None:
+            raise Exception(
+                "Operation {op} not supported for types {t1} and {t2}"
+                    .format(op = node.op.name,t1 = type_arg1,t2=type_arg2))
+        node.expr_type = result
+        return result
 
     def visit_IdentNode(self, node: IdentNode):
         var_name = node.name
-        var_symbol = self.current_scope.lookup(var_name)
+        var_symbol = self._resolve(var_name)
         if var_symbol is None:
             raise Exception("Symbol(identifier) not found '%s'" % var_name)
-        return var_symbol.type.name
+        node.binding = var_symbol
+        node.expr_type = _type_name(var_symbol)
+        return node.expr_type
 
     def visit_LiteralNode(self, node: LiteralNode):
-        return type(node.value).__name__
+        node.expr_type = _LITERAL_TYPES.get(type(node.value))
+        return node.expr_type
 
     def visit_ProgramNode(self, node):
         self.global_scope = ScopedSymbolTable(
@@ -175,39 +265,42 @@ class SemanticAnalyzer(NodeVisitor):
             scope_level=1,
         )
         self.current_scope = self.global_scope
+        self.current_routine = None
+        self.program_symbol = BlockSymbol(node.name.name if isinstance(node.name, IdentNode) else 'program')
+        node.binding = self.program_symbol
         self.log.append(f'ENTER scope: global')
-        self.current_scope.init_builtins()
-        self.current_scope.init_builtin_functions()
 
-        print(f"DEBUG: ProgramNode children: {[type(child).__name__ for child in node.childs]}")
+        if tracer.debug:
+            tracer.event(DEBUG, 'semantic', 'program', childs=[type(child).__name__ for child in node.childs])
         
         # Обрабатываем дочерние узлы в правильном порядке
         for i, child in enumerate(node.childs):
-            print(f"DEBUG: Processing child {i}: {type(child).__name__}")
+            if tracer.debug:
+                tracer.event(DEBUG, 'semantic', 'program child', index=i, node=type(child).__name__)
             
             # Первый дочерний узел обычно имя программы - определяем его как символ программы
             if i == 0 and isinstance(child, IdentNode):
-                print(f"DEBUG: Defining program name: {child.name}")
+                if tracer.debug:
+                    tracer.event(DEBUG, 'semantic', 'define program name', name=child.name)
                 # Определяем имя программы как символ программы
                 program_symbol = VarSymbol(child.name, BuiltinTypeSymbol('program'))
                 self.current_scope.define(program_symbol)
                 continue
                 
             if isinstance(child, (VarSectionNode, DeclSectionNode)):
-                print("DEBUG: Processing declarations section")
                 self.visit(child)
             elif isinstance(child, BlockNode):
-                print("DEBUG: Processing block")
                 self.visit(child)
             elif isinstance(child, StmtListNode):
-                print("DEBUG: Processing statement list")
                 self.visit(child)
             elif isinstance(child, IdentNode):
                 # Пропускаем другие IdentNode (кроме имени программы), они не должны обрабатываться здесь
-                print(f"DEBUG: Skipping IdentNode: {child.name}")
+                if tracer.debug:
+                    tracer.event(DEBUG, 'semantic', 'skip ident', name=child.name)
                 continue
             elif hasattr(child, 'childs'):
-                print(f"DEBUG: Processing generic node with childs: {[type(c).__name__ for c in child.childs]}")
+                if tracer.debug:
+                    tracer.event(DEBUG, 'semantic', 'generic node', node=type(child).__name__)
                 self.visit(child)
         
         self.log.append(f'LEAVE scope: global')
@@ -220,36 +313,38 @@ class SemanticAnalyzer(NodeVisitor):
     def visit_VarDeclNode(self, node: VarDeclNode):
         type_symbol = self.current_scope.lookup(node.vars_type.name)
         for ident in node.ident_list.idents:
-            var_name = ident.name
-            var_symbol = VarSymbol(var_name, type_symbol)
-            #only for current scope
-            if self.current_scope.lookup(var_name, current_scope_only=True):
-                raise Exception(
-                    "Duplicate identifier '%s' found" % var_name
-                )
-            self.current_scope.define(var_symbol)
+            var_symbol = VarSymbol(ident.name, type_symbol)
+            self._declare_var(var_symbol)
+            ident.binding = var_symbol
 
 
     def visit_ArrayDeclNode(self, node: ArrayDeclNode):
-        type = node.vars_type
+        type = self.current_scope.lookup(node.vars_type.name)
         from_ = node.from_.literal
         to_ = node.to_.literal
         for ident in node.name.idents:
-            arr_name = ident.name
-            arr_symb = ArraySymbol(arr_name,type,from_,to_)
-            if self.current_scope.lookup(arr_name,current_scope_only=True):
-                raise Exception(
-                    "Duplicate identifier '%s' found" % arr_name
-                )
-            self.current_scope.define(arr_symb)
+            arr_symb = ArraySymbol(ident.name,type,from_,to_)
+            self._declare_var(arr_symb)
+            ident.binding = arr_symb
 
     def visit_ArrayIdentNode(self, node : ArrayIdentNode):
         arr_name = node.name.name
-        liter = int(node.literal.literal)
         arr_symbol : ArraySymbol = self.current_scope.lookup(arr_name)
-        if(liter < int(arr_symbol.from_) or liter > int(arr_symbol.to_)):
-            raise Exception("Out of range '%s'" % liter)
-        return arr_symbol.type.name
+        if not isinstance(arr_symbol, ArraySymbol):
+            raise Exception("Array '%s' not found" % arr_name)
+        node.binding = node.name.binding = arr_symbol
+        index = node.literal
+        type_index = self.visit(index)
+        if (type_index != 'integer'):
+            raise Exception(
+                "Wrong type of array index '%s'" % type_index
+            )
+        # Выход за границы проверяется только для константного индекса
+        if isinstance(index, LiteralNode) and type(index.value) is int:
+            if(index.value < int(arr_symbol.start) or index.value > int(arr_symbol.end)):
+                raise Exception("Out of range '%s'" % index.value)
+        node.expr_type = _type_name(arr_symbol)
+        return node.expr_type
 
 
 
@@ -270,159 +365,33 @@ class SemanticAnalyzer(NodeVisitor):
             type_var = self.visit(var)
         else:
             var_name = var.name
-        var_symbol = self.current_scope.lookup(var_name)
+        var_symbol = self._resolve(var_name)
         if var_symbol is None:
             #raise NameError(var_name)
             raise Exception(
                 "Undefined variable '%s' found" % var_name
             )
+        if not isinstance(var_symbol, VarSymbol):
+            raise Exception(
+                "Cannot assign to '%s'" % var_name
+            )
+        var.binding = var_symbol
         type_visited = self.visit(visit)
-        if type_var is None: type_var=var_symbol.type.name
+        if type_var is None: type_var = _type_name(var_symbol)
         if not self.__typeChecker(type_visited, type_var):
             raise Exception(
                 "Wrong type '%s' found" % var_name
             )
 
     def visit_ProcedureDeclNode(self, node: ProcedureDeclNode):
-        proc_name = node.name.name
-        proc_symbol = ProcedureSymbol(proc_name)
-        self.current_scope.define(proc_symbol)
-
-        self.log.append(f'ENTER scope: {proc_name}')
-        procedure_scope = ScopedSymbolTable(
-            scope_name=proc_name,
-            scope_level=self.current_scope.scope_level + 1,
-            enclosing_scope=self.current_scope
-        )
-
-        self.current_scope = procedure_scope
-        
-        # Обрабатываем параметры
-        for param in node.params:
-            if isinstance(param, IdentNode):
-                # Это может быть простой идентификатор
-                param_name = param.name
-                param_type = self.current_scope.lookup('integer')  # По умолчанию integer
-                var_symbol = VarSymbol(param_name, param_type)
-                self.current_scope.define(var_symbol)
-                proc_symbol.params.append(var_symbol)
-            else:
-                # Это может быть декларация типа
-                param_type = self.current_scope.lookup(param.vars_type.name)
-                for param_name in param.ident_list.idents:
-                    var_symbol = VarSymbol(param_name.name, param_type)
-                    self.current_scope.define(var_symbol)
-                    proc_symbol.params.append(var_symbol)
-
-        # Проверяем, есть ли после параметров объявления внутри процедуры
-        i_next = 2
-        if i_next < len(node.decls) and isinstance(node.decls[i_next], DeclSectionNode):
-            # Обрабатываем объявления внутри процедуры
-            print(f"DEBUG: Processing inner declarations for procedure {proc_name}")
-            self.visit(node.decls[i_next])
-            i_next += 1
-
-        # Проверяем, есть ли тело процедуры
-        if i_next < len(node.decls) and isinstance(node.decls[i_next], StmtListNode):
-            # Обрабатываем тело процедуры
-            print(f"DEBUG: Processing body for procedure {proc_name}")
-            self.visit(node.decls[i_next])
-
-        # Завершаем область видимости процедуры
-        self.log.append(str(procedure_scope))
-        self.current_scope = self.current_scope.enclosing_scope
-        self.log.append(f'LEAVE scope: {proc_name}')
-
-        # Пропускаем обработанные узлы
-        i = i_next + 1
+        self._visit_routine(node, ProcedureSymbol(node.name.name))
 
     def visit_FunctionDeclNode(self, node: FunctionDeclNode):
-        func_name = node.name.name
-        func_type = node.return_type.name
-        func_symbol = FunctionSymbol(func_name)
-        func_symbol.type = func_type
-
-        self.log.append(f'ENTER scope: {func_name}')
-        function_scope = ScopedSymbolTable(
-            scope_name=func_name,
-            scope_level=self.current_scope.scope_level + 1,
-            enclosing_scope=self.current_scope
-        )
-
-        # Временно переключаемся в область функции для обработки параметров
-        prev_scope = self.current_scope
-        self.current_scope = function_scope
-        
-        # Обрабатываем параметры ПЕРЕД определением функции
-        for param in node.params:
-            print(f"DEBUG: Processing function parameter: {param}, type: {type(param)}")
-            if isinstance(param, ParamsNode):
-                print(f"DEBUG: ParamsNode vars_list: {param.vars_list}")
-                print(f"DEBUG: ParamsNode childs: {param.childs}")
-                
-                # ParamsNode содержит tuple из (IdentListNode, TypeSpecNode)
-                if len(param.vars_list) >= 2:
-                    ident_list = param.vars_list[0]  # IdentListNode
-                    type_spec = param.vars_list[1]   # TypeSpecNode
-                    
-                    if isinstance(ident_list, IdentListNode) and isinstance(type_spec, TypeSpecNode):
-                        param_type = prev_scope.lookup(type_spec.name)
-                        print(f"DEBUG: Processing param list with type: {type_spec.name}")
-                        
-                        for param_ident in ident_list.idents:
-                            var_symbol = VarSymbol(param_ident.name, param_type)
-                            self.current_scope.define(var_symbol)
-                            func_symbol.params.append(var_symbol)
-                            print(f"DEBUG: Added parameter: {param_ident.name}:{param_type}")
-                    else:
-                        print(f"DEBUG: Unexpected param structure: {type(ident_list)}, {type(type_spec)}")
-                else:
-                    print(f"DEBUG: ParamsNode has wrong number of elements: {len(param.vars_list)}")
-                    
-                # Обработка старой логики для совместимости
-                for param_decl in param.vars_list:
-                    print(f"DEBUG: Processing param_decl: {param_decl}, type: {type(param_decl)}")
-                    if isinstance(param_decl, VarDeclNode):
-                        # Стандартная декларация параметра
-                        param_type = prev_scope.lookup(param_decl.vars_type.name)
-                        for param_ident in param_decl.ident_list.idents:
-                            var_symbol = VarSymbol(param_ident.name, param_type)
-                            self.current_scope.define(var_symbol)
-                            func_symbol.params.append(var_symbol)
-                    else:
-                        print(f"DEBUG: Unexpected param_decl type: {type(param_decl)}")
-            elif isinstance(param, IdentNode):
-                # Это может быть простой идентификатор
-                param_name = param.name
-                param_type = prev_scope.lookup('integer')  # По умолчанию integer
-                var_symbol = VarSymbol(param_name, param_type)
-                self.current_scope.define(var_symbol)
-                func_symbol.params.append(var_symbol)
-            else:
-                # Это может быть декларация типа
-                print(f"DEBUG: Processing param as VarDeclNode: {param}")
-                if hasattr(param, 'vars_type') and hasattr(param, 'ident_list'):
-                    param_type = prev_scope.lookup(param.vars_type.name)
-                    for param_name in param.ident_list.idents:
-                        var_symbol = VarSymbol(param_name.name, param_type)
-                        self.current_scope.define(var_symbol)
-                        func_symbol.params.append(var_symbol)
-                else:
-                    print(f"DEBUG: Skipping parameter: {param}")
-
-        # Теперь определяем функцию в родительской области с уже заполненными параметрами
-        prev_scope.define(func_symbol)
-
-        # Обрабатываем локальные переменные
-        if hasattr(node, 'vars_decl') and node.vars_decl:
-            self.visit(node.vars_decl)
-
-        # Обрабатываем тело функции
-        self.visit(node.stmt_list)
-
-        self.log.append(str(function_scope))
-        self.current_scope = self.current_scope.enclosing_scope
-        self.log.append(f'LEAVE scope: {func_name}')
+        func_symbol = FunctionSymbol(node.name.name)
+        func_symbol.type = self.current_scope.lookup(node.return_type.name)
+        func_symbol.result = VarSymbol(func_symbol.name, func_symbol.type, RESULT, 0,
+                                       self.current_scope.scope_level + 1)
+        self._visit_routine(node, func_symbol)
 
     def visit_CallNode(self, node: CallNode):
         func_name = node.func.name
@@ -431,6 +400,11 @@ class SemanticAnalyzer(NodeVisitor):
             raise Exception(
                 "Undefined function '%s' " % func_name
             )
+        if isinstance(func_symbol, VarSymbol):
+            raise Exception(
+                "'%s' is not a procedure or function" % func_name
+            )
+        node.binding = node.func.binding = func_symbol
         #TODO builtin vs proc and func
         if (isinstance(func_symbol, FunctionSymbol) or isinstance(func_symbol, ProcedureSymbol)):
             if(len(node.params) != len(func_symbol.params)):
@@ -439,7 +413,8 @@ class SemanticAnalyzer(NodeVisitor):
                 )
         for param in node.params:
             self.visit(param)
-        return func_symbol.type
+        node.expr_type = _type_name(func_symbol)
+        return node.expr_type
 
     def visit_IfNode(self, node: IfNode):
         type_cond = self.visit(node.cond)
@@ -462,11 +437,19 @@ class SemanticAnalyzer(NodeVisitor):
             )
         self.visit(node.stmt_list)
 
+    def visit_RepeatNode(self, node: RepeatNode):
+        self.visit(node.stmt_list)
+        type_cond = self.visit(node.cond)
+        if (type_cond != 'boolean'):
+            raise Exception(
+                "Wrong type of repeat condition '%s' " % type_cond
+            )
+
     #TODO check type of node.init
     def visit_ForNode(self, node: ForNode):
         type_init = self.visit(node.init)
         type_to = self.visit(node.to)
-        if (type_to != 'int'):
+        if (type_to != 'integer'):
             raise Exception(
                 "Wrong type of for condition '%s'" % type_to
             )
@@ -476,14 +459,9 @@ class SemanticAnalyzer(NodeVisitor):
         """
         Обрабатываем секцию объявлений с учетом особенностей AST
         """
-        print("\nDEBUG: DeclSectionNode contents:")
-        for i, decl in enumerate(node.decls):
-            print(f"  {i}: {type(decl).__name__}")
-            if hasattr(decl, 'name'):
-                print(f"     name: {decl.name}")
-            if hasattr(decl, 'childs'):
-                print(f"     childs: {[type(c).__name__ for c in decl.childs]}")
-        
+        if tracer.debug:
+            tracer.event(DEBUG, 'semantic', 'declarations', decls=[type(decl).__name__ for decl in node.decls])
+
         # Определение структуры AST - какие узлы образуют процедуру или функцию
         i = 0
         while i < len(node.decls):
@@ -496,7 +474,8 @@ class SemanticAnalyzer(NodeVisitor):
             elif isinstance(decl, IdentNode) and i + 2 < len(node.decls) and isinstance(node.decls[i+1], ParamsNode):
                 # Это похоже на начало процедуры: имя + параметры
                 proc_name = decl.name
-                print(f"DEBUG: Found procedure {proc_name}")
+                if tracer.debug:
+                    tracer.event(DEBUG, 'semantic', 'procedure', procedure=proc_name)
                 
                 # Создаем символ процедуры
                 proc_symbol = ProcedureSymbol(proc_name)
@@ -513,13 +492,13 @@ class SemanticAnalyzer(NodeVisitor):
                 
                 # Обрабатываем параметры
                 params_node = node.decls[i+1]
-                print(f"DEBUG: Processing parameters for procedure {proc_name}")
                 if isinstance(params_node, ParamsNode):
                     for child in params_node.childs:
                         if isinstance(child, IdentListNode):
                             # Получаем список идентификаторов параметров
                             for ident in child.idents:
-                                print(f"DEBUG: Processing parameter {ident.name}")
+                                if tracer.debug:
+                                    tracer.event(DEBUG, 'semantic', 'parameter', procedure=proc_name, name=ident.name)
                                 param_name = ident.name
                                 # По умолчанию тип integer, но может быть указан явно
                                 param_type = self.current_scope.lookup('integer')
@@ -539,14 +518,16 @@ class SemanticAnalyzer(NodeVisitor):
                 i_next = i + 2
                 if i_next < len(node.decls) and isinstance(node.decls[i_next], DeclSectionNode):
                     # Обрабатываем объявления внутри процедуры
-                    print(f"DEBUG: Processing inner declarations for procedure {proc_name}")
+                    if tracer.debug:
+                        tracer.event(DEBUG, 'semantic', 'procedure declarations', procedure=proc_name)
                     self.visit(node.decls[i_next])
                     i_next += 1
 
                 # Проверяем, есть ли тело процедуры
                 if i_next < len(node.decls) and isinstance(node.decls[i_next], StmtListNode):
                     # Обрабатываем тело процедуры
-                    print(f"DEBUG: Processing body for procedure {proc_name}")
+                    if tracer.debug:
+                        tracer.event(DEBUG, 'semantic', 'procedure body', procedure=proc_name)
                     self.visit(node.decls[i_next])
 
                 # Завершаем область видимости процедуры
@@ -556,19 +537,24 @@ class SemanticAnalyzer(NodeVisitor):
                 
                 # Пропускаем обработанные узлы
                 i = i_next + 1
+            elif isinstance(decl, (ProcedureDeclNode, FunctionDeclNode)):
+                # Ошибка в подпрограмме - ошибка программы: иначе ее тело было бы скомпилировано
+                # без привязок у операторов после ошибки
+                self.visit(decl)
+                i += 1
             else:
                 # Обработка других типов узлов
                 try:
                     self.visit(decl)
                 except Exception as e:
-                    print(f"WARNING: Error processing node {type(decl).__name__}: {e}")
+                    if tracer.warning:
+                        tracer.event(WARNING, 'semantic', 'declaration skipped', node=type(decl).__name__, error=e)
                 i += 1
 
     def visit_ParamsNode(self, node: ParamsNode):
         """
         Обработка узла параметров процедуры или функции
         """
-        print("DEBUG: ParamsNode processing")
         # В текущей реализации мы просто пропускаем узел параметров,
         # так как они должны обрабатываться в контексте ProcedureDeclNode
         # Но в нашем случае структура AST разбита на отдельные компоненты
@@ -578,7 +564,6 @@ class SemanticAnalyzer(NodeVisitor):
         """
         Обработка узла с типом
         """
-        print(f"DEBUG: TypeSpecNode processing: {node.name}")
         return node.name
 
     def visit_VarSectionNode(self, node: VarSectionNode):
@@ -590,7 +575,6 @@ class SemanticAnalyzer(NodeVisitor):
     
     def visit_BlockNode(self, node: BlockNode):
         """Обработка блока программы"""
-        print("DEBUG: BlockNode processing")
         
         # Обрабатываем секцию переменных
         if node.var_section:
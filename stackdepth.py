@@ -0,0 +1,105 @@
+"""Точная глубина стека вычислений метода MSIL для директивы .maxstack.
+
+    depth = max_stack_depth(body)
+
+Тело - записи msil.Instruction (инструкции и метки). Глубина прослеживается по всем путям
+выполнения: переходы продолжают путь с меткой-целью, br и ret его завершают. В точке слияния
+(метка, на которую приходят несколько путей) глубина всех путей должна совпадать, иначе
+IL неверен и генерация прерывается исключением; так же - при снятии со стека лишнего значения.
+"""
+from typing import Dict, List, Tuple
+
+from msil import Instruction
+
+# Код операции -> (сколько значений снимает, сколько кладет)
+STACK_EFFECTS: Dict[str, Tuple[int, int]] = {
+    'nop': (0, 0),
+    'ldc.i4': (0, 1), 'ldc.i4.s': (0, 1), 'ldc.i4.m1': (0, 1), 'ldstr': (0, 1),
+    'ldarg': (0, 1), 'ldarg.s': (0, 1), 'ldloc': (0, 1), 'ldloc.s': (0, 1), 'ldsfld': (0, 1),
+    'starg': (1, 0), 'starg.s': (1, 0), 'stloc': (1, 0), 'stloc.s': (1, 0), 'stsfld': (1, 0),
+    'dup': (1, 2), 'pop': (1, 0),
+    'add': (2, 1), 'sub': (2, 1), 'mul': (2, 1), 'div': (2, 1), 'rem': (2, 1),
+    'and': (2, 1), 'or': (2, 1), 'xor': (2, 1),
+    'ceq': (2, 1), 'cgt': (2, 1), 'clt': (2, 1),
+    'neg': (1, 1), 'not': (1, 1),
+    'newarr': (1, 1),
+    'ldelem.i4': (2, 1), 'ldelem.u1': (2, 1), 'ldelem.u2': (2, 1),
+    'stelem.i4': (3, 0), 'stelem.i1': (3, 0), 'stelem.i2': (3, 0),
+    'br': (0, 0), 'br.s': (0, 0),
+    'brtrue': (1, 0), 'brtrue.s': (1, 0), 'brfalse': (1, 0), 'brfalse.s': (1, 0),
+}
+# Переходы по сравнению двух значений
+_COMPARE_BRANCHES = ('beq', 'bne.un', 'bgt', 'bge', 'blt', 'ble')
+STACK_EFFECTS.update({op + suffix: (2, 0) for op in _COMPARE_BRANCHES for suffix in ('', '.s')})
+STACK_EFFECTS.update({f'ldc.i4.{n}': (0, 1) for n in range(9)})
+STACK_EFFECTS.update({f'{op}.{n}': (0, 1) for op in ('ldloc', 'ldarg') for n in range(4)})
+STACK_EFFECTS.update({f'stloc.{n}': (1, 0) for n in range(4)})
+
+BRANCHES = frozenset(('br', 'br.s', 'brtrue', 'brtrue.s', 'brfalse', 'brfalse.s') +
+                     tuple(op + suffix for op in _COMPARE_BRANCHES for suffix in ('', '.s')))
+# Инструкции, после которых выполнение не переходит к следующей строке
+_TERMINATORS = frozenset(('br', 'br.s', 'ret'))
+
+
+# Эффект call зависит от сигнатуры в операнде - разбираем каждую сигнатуру один раз
+_call_effects: Dict[str, Tuple[int, int]] = {}
+
+
+def stack_effect(op: str, operand) -> Tuple[int, int]:
+    if op == 'call':
+        effect = _call_effects.get(operand)
+        if effect is None:
+            # call <тип результата> <класс>::<метод>(<типы аргументов>)
+            args = operand[operand.index('(') + 1:operand.rindex(')')].strip()
+            effect = _call_effects[operand] = (
+                args.count(',') + 1 if args else 0, 0 if operand.split(None, 1)[0] == 'void' else 1)
+        return effect
+    if op == 'ret':
+        # Значение результата (если есть) снимается вызывающим методом - глубину здесь не меняем
+        return 0, 0
+    effect = STACK_EFFECTS.get(op)
+    if effect is None:
+        raise Exception('Unknown stack effect of MSIL instruction {}'.format(op))
+    return effect
+
+
+def max_stack_depth(body: List[Instruction]) -> int:
+    instructions = []
+    labels = {}
+    for instr in body:
+        if instr.opcode is None:
+            labels[instr.label] = len(instructions)
+        else:
+            instructions.append(instr)
+
+    # Глубина стека перед каждой инструкцией (None - инструкция еще не достигнута)
+    depths = [None] * len(instructions)
+    pending = [(0, 0)] if instructions else []
+    maximum = 0
+    while pending:
+        i, depth = pending.pop()
+        while i < len(instructions):
+            if depths[i] is not None:
+                if depths[i] != depth:
+                    raise Exception('Stack depth mismatch at MSIL instruction {} ({}): {} != {}'.format(
+                        i, str(instructions[i]).strip(), depths[i], depth))
+                break
+            depths[i] = depth
+            instr = instructions[i]
+            op = instr.opcode
+            popped, pushed = stack_effect(op, instr.operand)
+            if depth < popped:
+                raise Exception('Stack underflow at MSIL instruction {} ({})'.format(
+                    i, str(instr).strip()))
+            depth += pushed - popped
+            if depth > maximum:
+                maximum = depth
+            if op in BRANCHES:
+                target = labels.get(instr.operand)
+                if target is None:
+                    raise Exception('Unknown label {}'.format(instr.operand))
+                pending.append((target, depth))
+            if op in _TERMINATORS:
+                break
+            i += 1
+    return maximum
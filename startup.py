@@ -0,0 +1,85 @@
+"""Замер времени запуска компилятора: импорт модулей и латентность первой компиляции.
+
+Каждый замер выполняется в отдельном интерпретаторе, чтобы кэши модулей
+и уже построенная грамматика не искажали результат:
+
+    python startup.py [--backend pyparsing|rd] [--runs N]
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+SAMPLE_PROGRAM = '''
+Program sample;
+var
+  x, y : integer;
+
+function inc(n: integer): integer;
+begin
+  inc := n + 1;
+end;
+
+begin
+  x := 1;
+  y := inc(x) * 2;
+  writeln(y);
+end.
+'''
+
+# Скрипт дочернего процесса: печатает замеры (в миллисекундах) одной строкой JSON
+_CHILD = r'''
+import contextlib, io, json, sys, time
+t0 = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    import grammar
+    t1 = time.perf_counter()
+    import semantic, codegen
+    t2 = time.perf_counter()
+    parser = grammar.PascalGrammar(backend=sys.argv[1])
+    ast = parser.parse(sys.argv[2])
+    t3 = time.perf_counter()
+    semantic.SemanticAnalyzer().visit(ast)
+    codegen.MSILCodeGenerator().generate_program(ast)
+    t4 = time.perf_counter()
+    ast = parser.parse(sys.argv[2])
+    semantic.SemanticAnalyzer().visit(ast)
+    codegen.MSILCodeGenerator().generate_program(ast)
+    t5 = time.perf_counter()
+ms = lambda dt: round(dt * 1000, 3)
+print(json.dumps({
+    'import_grammar_ms': ms(t1 - t0),
+    'import_semantic_codegen_ms': ms(t2 - t1),
+    'first_parse_ms': ms(t3 - t2),
+    'first_compile_ms': ms(t4 - t2),
+    'second_compile_ms': ms(t5 - t4),
+    'pyparsing_loaded': 'pyparsing' in sys.modules,
+}))
+'''
+
+
+def measure(backend: str = 'pyparsing', source: str = SAMPLE_PROGRAM) -> dict:
+    """Запускает холодный интерпретатор и возвращает замеры запуска"""
+    result = subprocess.run([sys.executable, '-c', _CHILD, backend, source],
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Startup latency of the Pascal compiler')
+    arg_parser.add_argument('--backend', default='pyparsing', choices=('pyparsing', 'rd'))
+    arg_parser.add_argument('--runs', type=int, default=5)
+    args = arg_parser.parse_args(argv)
+
+    runs = [measure(args.backend) for _ in range(args.runs)]
+    # Медиана по каждому показателю
+    summary = {key: sorted(run[key] for run in runs)[len(runs) // 2]
+               for key in runs[0] if key != 'pyparsing_loaded'}
+    summary['pyparsing_loaded'] = runs[0]['pyparsing_loaded']
+    summary['backend'] = args.backend
+    summary['runs'] = args.runs
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,15 @@
 class Symbol:
+    # Символов много (по одному на каждое объявление) - храним их без __dict__
+    __slots__ = ('name', 'type')
+
     def __init__(self, name, type=None):
         self.name = name
         self.type = type
 
 
 class BuiltinTypeSymbol(Symbol):
+    __slots__ = ()
+
     def __init__(self, name):
         super().__init__(name)
 
@@ -12,15 +17,29 @@ class BuiltinTypeSymbol(Symbol):
         return self.name
 
 
+# Виды хранения переменных: глобальная (статическое поле), локальная, аргумент, результат функции
+GLOBAL, LOCAL, ARGUMENT, RESULT = 'global', 'local', 'argument', 'result'
+
+
+# Символ переменной служит и ее привязкой: семантический анализатор записывает его в node.binding
+# каждого IdentNode, а генератор кода берет из него вид хранения (kind), номер (index) в своей группе
+# (аргументов, локальных переменных подпрограммы или глобальных) и уровень области (level)
 class VarSymbol(Symbol):
-    def __init__(self, name, type):
+    __slots__ = ('kind', 'index', 'level')
+
+    def __init__(self, name, type, kind=None, index=None, level=None):
         super().__init__(name, type)
+        self.kind = kind
+        self.index = index
+        self.level = level
 
     def __str__(self):
         return f'<{self.name}:{self.type}>'
 
 
-class ArraySymbol(Symbol):
+class ArraySymbol(VarSymbol):
+    __slots__ = ('start', 'end')
+
     def __init__(self, name, type, start, end):
         super().__init__(name, type)
         self.start = start
@@ -31,9 +50,12 @@ class ArraySymbol(Symbol):
 
 
 class ProcedureSymbol(Symbol):
+    __slots__ = ('params', 'locals')
+
     def __init__(self, name, params=None):
         super().__init__(name)
         self.params = params if params is not None else []
+        self.locals = []
 
     def __str__(self):
         param_list = ', '.join(str(p) for p in self.params)
@@ -41,9 +63,14 @@ class ProcedureSymbol(Symbol):
 
 
 class FunctionSymbol(Symbol):
+    # result - переменная результата, которой внутри функции привязывается ее имя (f := ...)
+    __slots__ = ('params', 'locals', 'result')
+
     def __init__(self, name, params=None, return_type=None):
         super().__init__(name, return_type)
         self.params = params if params is not None else []
+        self.locals = []
+        self.result = None
 
     def __str__(self):
         param_list = ', '.join(str(p) for p in self.params)
@@ -51,6 +78,8 @@ class FunctionSymbol(Symbol):
 
 
 class BuiltinFunction(Symbol):
+    __slots__ = ()
+
     def __init__(self, name):
         super().__init__(name)
 
@@ -58,9 +87,13 @@ class BuiltinFunction(Symbol):
         return self.name
 
 
+# Символ программы: locals - глобальные переменные в порядке объявления
 class BlockSymbol(Symbol):
+    __slots__ = ('locals',)
+
     def __init__(self, name):
         super().__init__(name)
+        self.locals = []
 
     def __str__(self):
-        return f'{self.name}'
\ No newline at end of file
+        return f'{self.name}'
@@ -0,0 +1,50 @@
+import pytest
+
+from astcache import ParseCache, _write_varint, decode, encode
+from grammar import PascalGrammar
+
+PROGRAM = '''program t;
+var x: integer; c: char;
+procedure p(a: integer);
+begin
+  writeln(a);
+end;
+begin
+  x := 300 * -2;
+  c := 'q';
+  if x > 1 then p(x); else p(0);
+end.
+'''
+
+
+@pytest.fixture(scope='module')
+def ast():
+    return PascalGrammar(backend='rd').parse(PROGRAM)
+
+
+def test_round_trip(ast):
+    assert decode(encode(ast)).tree == ast.tree
+
+
+@pytest.mark.parametrize('value, data', [(0, b'\x00'), (127, b'\x7f'), (128, b'\x80\x01'), (300, b'\xac\x02')])
+def test_varint(value, data):
+    out = bytearray()
+    _write_varint(out, value)
+    assert bytes(out) == data
+
+
+def test_truncated_data_is_value_error(ast):
+    data = encode(ast)
+    for length in range(len(data)):
+        with pytest.raises(ValueError):
+            decode(data[:length])
+
+
+def test_parse_cache(tmp_path, ast):
+    cache = ParseCache(str(tmp_path))
+    assert cache.load(PROGRAM, 'rd') is None
+    assert cache.store(PROGRAM, 'rd', ast)
+    assert cache.load(PROGRAM, 'rd').tree == ast.tree
+    # Ключ зависит от backend'а
+    assert cache.load(PROGRAM, 'pyparsing') is None
+    assert cache.stats == {'hits': 1, 'misses': 2, 'stores': 1}
@@ -0,0 +1,70 @@
+import pytest
+
+from codegen import MSILCodeGenerator
+from grammar import PascalGrammar
+from semantic import SemanticAnalyzer
+
+BACKENDS = PascalGrammar.BACKENDS
+
+PROGRAM = '''program parity;
+var i, s, n: integer; c: char; ok: boolean;
+
+function sq(x: integer): integer;
+begin
+  sq := x * x;
+end;
+
+procedure show;
+begin
+  writeln(s);
+end;
+
+begin
+  s := +5 - -3 * (2 + i) div 4 mod 3;
+  c := 'a';
+  ok := (s > 1) and (i <= 2) or False;
+  if s >= 10 then s := s - 1; else s := sq(s);
+  if ok then begin n := 1; end
+  while s < 100 do s := s + sq(2);
+  repeat s := s - 7; until s = 3
+  for i := 1 to 5 do s := s + i;
+  for i := s - 14 to n do begin s := s + 1; writeln(s) end
+  show();
+  writeln(s)
+  writeln(c, i);
+end.
+'''
+
+
+def parse_tree(source: str, backend: str):
+    return PascalGrammar(backend=backend).parse(source).tree
+
+
+def test_backends_build_same_ast():
+    trees = [parse_tree(PROGRAM, backend) for backend in BACKENDS]
+    assert trees[0] == trees[1]
+
+
+def test_backends_generate_same_il():
+    texts = []
+    for backend in BACKENDS:
+        ast = PascalGrammar(backend=backend).parse(PROGRAM)
+        SemanticAnalyzer().visit(ast)
+        generator = MSILCodeGenerator()
+        generator.generate(ast)
+        texts.append(generator.text())
+    assert texts[0] == texts[1]
+
+
+def test_for_builds_for_node_with_assign_init():
+    tree = parse_tree(PROGRAM, 'pyparsing')
+    assert '  ├ for' in tree
+    assert tree[tree.index('  ├ for') + 1] == '  │ ├ :='
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('expr', ['a < b < c', 'x and a < b < c', 'a = b <> c'])
+def test_chained_comparison_rejected(backend, expr):
+    source = 'program t; var x, a, b, c: boolean; begin x := %s; end.' % expr
+    with pytest.raises(Exception):
+        PascalGrammar(backend=backend).parse(source)
@@ -0,0 +1,53 @@
+from grammar import PascalGrammar
+from incremental import IncrementalParser
+
+PROGRAM = '''program t;
+var x: integer;
+procedure p;
+begin
+  x := 1;
+end;
+function f(a: integer): integer;
+begin
+  f := a + 1;
+end;
+begin
+  p();
+  x := f(x);
+end.
+'''
+
+
+def full_tree(source: str):
+    return PascalGrammar(backend='rd').parse(source).tree
+
+
+def test_edit_inside_routine_is_incremental():
+    parser = IncrementalParser(PROGRAM)
+    source = PROGRAM.replace('x := 1;', 'x := 1 + 2;')
+    assert parser.update(source).tree == full_tree(source)
+    assert parser.stats == {'full': 1, 'incremental': 1}
+
+
+def test_later_regions_shift_after_edit():
+    parser = IncrementalParser(PROGRAM)
+    first = PROGRAM.replace('x := 1;', 'x := 100;')
+    parser.update(first)
+    second = first.replace('f := a + 1;', 'f := a * 2;').replace('x := f(x);', 'x := f(x) + 1;')
+    parser.update(first.replace('f := a + 1;', 'f := a * 2;'))
+    assert parser.update(second).tree == full_tree(second)
+    assert parser.stats == {'full': 1, 'incremental': 3}
+
+
+def test_edit_outside_regions_reparses():
+    parser = IncrementalParser(PROGRAM)
+    source = PROGRAM.replace('var x: integer;', 'var x, y: integer;')
+    assert parser.update(source).tree == full_tree(source)
+    assert parser.stats['full'] == 2
+
+
+def test_unchanged_source_keeps_ast():
+    parser = IncrementalParser(PROGRAM)
+    ast = parser.ast
+    assert parser.update(PROGRAM) is ast
+    assert parser.stats == {'full': 1, 'incremental': 0}
@@ -0,0 +1,68 @@
+from grammar import PascalGrammar
+from nodes import LiteralNode, RepeatNode, WhileNode
+from optimize import is_pure, optimize
+from semantic import SemanticAnalyzer
+
+PROGRAM = '''program t;
+var x, y: integer;
+function f(a: integer): integer;
+begin
+  f := a;
+end;
+begin
+  %s
+end.
+'''
+
+
+def optimized(stmts: str):
+    ast = PascalGrammar(backend='rd').parse(PROGRAM % stmts)
+    SemanticAnalyzer().visit(ast)
+    return optimize(ast)
+
+
+def main_stmts(ast):
+    return ast.stmt_list.stmts
+
+
+def test_constant_folding():
+    ast, stats = optimized('x := 2 * 3 + 4;\n  y := 7 div -2;\n  x := y * 1 + 0;')
+    first, second, third = main_stmts(ast)
+    assert first.val.value == 10
+    assert second.val.value == -3
+    assert third.val.name == 'y'
+    assert stats['folded'] >= 2 and stats['identities'] == 2
+
+
+def test_division_by_zero_not_folded():
+    ast, _ = optimized('x := 1 div 0;')
+    assert not isinstance(main_stmts(ast)[0].val, LiteralNode)
+
+
+def test_impure_operands_kept():
+    ast, _ = optimized('x := f(1) * 0;\n  y := (x div y) * 0;\n  x := (x div 2) * 0;')
+    stmts = main_stmts(ast)
+    assert not isinstance(stmts[0].val, LiteralNode)
+    assert not isinstance(stmts[1].val, LiteralNode)
+    assert stmts[2].val.value == 0
+
+
+def test_is_pure():
+    ast, _ = optimized('x := x + y;\n  x := f(x);\n  x := x mod y;\n  x := x mod 3;\n  x := x div -1;')
+    assert [is_pure(stmt.val) for stmt in main_stmts(ast)] == [True, False, False, True, False]
+
+
+def test_dead_branches_removed():
+    ast, stats = optimized('if 1 > 2 then x := 1; else y := 2;\n  while False do x := 3;\n  if x > 0 then begin end')
+    stmts = main_stmts(ast)
+    assert len(stmts) == 1 and stmts[0].var.name == 'y'
+    assert stats['pruned_branches'] == 2
+
+
+def test_statements_after_endless_loop_removed():
+    ast, stats = optimized('while True do x := x + 1;\n  y := 1;\n  y := 2;')
+    assert [type(stmt) for stmt in main_stmts(ast)] == [WhileNode]
+    assert stats['unreachable_stmts'] == 2
+    ast, stats = optimized('repeat x := x + 1; until False\n  y := 1;')
+    assert [type(stmt) for stmt in main_stmts(ast)] == [RepeatNode]
+    assert stats['unreachable_stmts'] == 1
@@ -0,0 +1,34 @@
+from msil import Instruction
+from peephole import PeepholeOptimizer
+
+
+def render(items):
+    return [str(item).strip() for item in items]
+
+
+def test_store_load_becomes_dup():
+    peephole = PeepholeOptimizer()
+    result = peephole.optimize([Instruction('stloc', 'x'), Instruction('ldloc', 'x'), Instruction('ret')])
+    assert render(result) == ['dup', 'stloc x', 'ret']
+    assert peephole.hits['store_load'] == 1
+
+
+def test_store_load_kept_across_label():
+    # На загрузку после метки могут перейти из другого места
+    items = [Instruction('stloc', 'x'), Instruction(label='L1'), Instruction('ldloc', 'x')]
+    assert render(PeepholeOptimizer().optimize(items)) == ['stloc x', 'L1:', 'ldloc x']
+
+
+def test_branch_to_next_removed():
+    peephole = PeepholeOptimizer()
+    items = [Instruction('br', 'L2'), Instruction(label='L1'), Instruction(label='L2'), Instruction('ret')]
+    assert render(peephole.optimize(items)) == ['L1:', 'L2:', 'ret']
+    assert peephole.hits['branch_to_next'] == 1
+
+
+def test_short_forms():
+    items = [Instruction('ldc.i4', n) for n in (-1, 0, 8, 9, -128, 128)]
+    items += [Instruction('ldloc', 'a'), Instruction('stloc', 'e'), Instruction('ldarg', 1), Instruction('starg', 0)]
+    result = PeepholeOptimizer().optimize(items, ['a', 'b', 'c', 'd', 'e'])
+    assert render(result) == ['ldc.i4.m1', 'ldc.i4.0', 'ldc.i4.8', 'ldc.i4.s 9', 'ldc.i4.s -128', 'ldc.i4 128',
+                              'ldloc.0', 'stloc.s e', 'ldarg.1', 'starg.s 0']
@@ -0,0 +1,45 @@
+import pytest
+
+from codegen import MSILCodeGenerator
+from grammar import PascalGrammar
+from semantic import SemanticAnalyzer
+
+ARRAY_PROGRAM = '''program t;
+var a: array [1..5] of integer; i, x: integer; b: boolean;
+begin
+  i := 2;
+  %s
+end.
+'''
+
+
+def compile_text(source: str, backend: str = 'rd') -> str:
+    ast = PascalGrammar(backend=backend).parse(source)
+    SemanticAnalyzer().visit(ast)
+    generator = MSILCodeGenerator()
+    generator.generate(ast)
+    return generator.text()
+
+
+def test_array_variable_index_store_and_load():
+    il = compile_text(ARRAY_PROGRAM % 'a[i] := 1;\n  x := a[i + 1];')
+    assert 'stelem.i4' in il
+    assert 'ldelem.i4' in il
+    # Индекс вычисляется во время выполнения и сдвигается на нижнюю границу
+    assert il.count('ldsfld int32 Program::i') == 2
+    assert il.count('sub') == 2
+
+
+def test_array_index_must_be_integer():
+    with pytest.raises(Exception, match='array index'):
+        compile_text(ARRAY_PROGRAM % 'b := True;\n  a[b] := 1;')
+
+
+def test_array_constant_index_out_of_range():
+    with pytest.raises(Exception, match='Out of range'):
+        compile_text(ARRAY_PROGRAM % 'x := a[6];')
+
+
+def test_array_index_unknown_name():
+    with pytest.raises(Exception, match='not found'):
+        compile_text(ARRAY_PROGRAM % 'x := a[j];')
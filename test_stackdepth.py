@@ -0,0 +1,68 @@
+import pytest
+
+from codegen import MSILCodeGenerator
+from grammar import PascalGrammar
+from msil import Instruction
+from semantic import SemanticAnalyzer
+from stackdepth import max_stack_depth
+
+
+def body(*items):
+    return [Instruction(label=item[1:]) if item.startswith(':') else Instruction(*item.split(' ', 1))
+            for item in items]
+
+
+def test_straight_line():
+    assert max_stack_depth(body('ldc.i4.1', 'ldc.i4.2', 'add', 'pop', 'ret')) == 2
+    assert max_stack_depth([]) == 0
+
+
+def test_underflow():
+    with pytest.raises(Exception, match='Stack underflow at MSIL instruction 1'):
+        max_stack_depth(body('ldc.i4.1', 'add', 'ret'))
+
+
+def test_depth_mismatch_at_label():
+    # Один путь приходит к L1 с пустым стеком, другой - со значением на стеке
+    with pytest.raises(Exception, match='Stack depth mismatch'):
+        max_stack_depth(body('ldc.i4.0', 'brtrue L1', 'ldc.i4.5', ':L1', 'ret'))
+
+
+def test_join_with_equal_depths():
+    # if/else, где обе ветви кладут одно значение
+    assert max_stack_depth(body('ldc.i4.0', 'brfalse L1', 'ldc.i4.1', 'br L2', ':L1', 'ldc.i4.2',
+                                ':L2', 'pop', 'ret')) == 1
+
+
+def test_unknown_label():
+    with pytest.raises(Exception, match='Unknown label L9'):
+        max_stack_depth(body('br L9'))
+
+
+def test_call_effect_from_signature():
+    items = body('ldc.i4.1', 'ldc.i4.2', 'ldc.i4.3', 'ret')
+    items.insert(3, Instruction('call', 'int32 Program::f(int32, int32, int32)'))
+    items.insert(4, Instruction('call', 'void [mscorlib]System.Console::WriteLine(int32)'))
+    assert max_stack_depth(items) == 3
+
+
+def compile_text(source: str) -> str:
+    ast = PascalGrammar(backend='rd').parse(source)
+    SemanticAnalyzer().visit(ast)
+    generator = MSILCodeGenerator()
+    generator.generate(ast)
+    return generator.text()
+
+
+def test_deep_expression_maxstack():
+    # Правоассоциативная запись: каждый уровень скобок держит на стеке еще одно значение
+    depth = 20
+    expr = ' + ('.join(['x'] * depth) + ')' * (depth - 1)
+    il = compile_text('program t; var x: integer; begin x := 1; x := %s; end.' % expr)
+    assert '.maxstack %d' % depth in il
+
+
+def test_signed_literal_loads_value():
+    il = compile_text('program t; var x: integer; begin x := +5; x := -5; end.')
+    assert 'ldc.i4.5' in il
+    assert 'ldc.i4.s -5' in il
@@ -0,0 +1,212 @@
+"""Обход AST без рекурсии и без выделения кортежей на каждом узле.
+
+    for node in preorder(ast): ...
+    for node in postorder(ast): ...
+    ast = MyTransformer().transform(ast)
+    MyVisitor().visit(ast)
+
+Потомки узла читаются прямо из его полей по таблице, которая строится один раз на класс
+из _fields (без скалярных полей _scalar_fields). Поле может хранить узел, None или
+последовательность (tuple/list) узлов; значения, которые не являются узлами (например, сырые
+лексемы pyparsing), пропускаются. Свойство childs при обходе не используется.
+
+Обработчики посетителей (visit_<ИмяКласса>, transform_<ИмяКласса>) ищутся один раз на пару
+(класс прохода, класс узла) и кэшируются в классе прохода. Если для класса узла обработчика нет,
+берется обработчик ближайшего базового класса по MRO (например, visit_StmtNode для всех операторов).
+"""
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from nodes import AstNode
+
+# Класс узла -> имена полей, в которых могут лежать потомки (в порядке обхода)
+_child_fields: Dict[type, Tuple[str, ...]] = {}
+# Те же таблицы в обратном порядке - для стеков, которые снимают потомков слева направо
+_reversed_fields: Dict[type, Tuple[str, ...]] = {}
+# Маркер в стеке postorder: следующий под ним узел уже развернут
+_EXIT = object()
+
+
+def child_fields(cls: type) -> Tuple[str, ...]:
+    fields = _child_fields.get(cls)
+    if fields is None:
+        scalars = cls._scalar_fields
+        fields = _child_fields[cls] = tuple(name for name in cls._fields if name not in scalars)
+    return fields
+
+
+def iter_child_nodes(node: AstNode) -> Iterator[AstNode]:
+    """Непосредственные потомки-узлы в порядке полей"""
+    for name in child_fields(type(node)):
+        value = getattr(node, name)
+        if isinstance(value, AstNode):
+            yield value
+        elif type(value) is tuple or type(value) is list:
+            for item in value:
+                if isinstance(item, AstNode):
+                    yield item
+
+
+def preorder(root: AstNode) -> Iterator[AstNode]:
+    """Узлы дерева в прямом порядке: родитель раньше потомков, потомки слева направо"""
+    stack = [root]
+    pop, push, extend = stack.pop, stack.append, stack.extend
+    reversed_fields = _reversed_fields.get
+    while stack:
+        node = pop()
+        # Не-узлы попадают в стек вместе с последовательностями и отбрасываются здесь
+        if not isinstance(node, AstNode):
+            continue
+        yield node
+        cls = type(node)
+        fields = reversed_fields(cls)
+        if fields is None:
+            fields = _reversed_fields[cls] = child_fields(cls)[::-1]
+        # Потомки кладутся в стек справа налево, чтобы сниматься слева направо
+        for name in fields:
+            value = getattr(node, name)
+            if type(value) is tuple or type(value) is list:
+                extend(reversed(value))
+            elif value is not None:
+                push(value)
+
+
+def postorder(root: AstNode) -> Iterator[AstNode]:
+    """Узлы дерева в обратном порядке: потомки слева направо, затем родитель"""
+    # Стек чередует узлы и маркер _EXIT: узел под маркером выдается, когда сняты все его потомки
+    stack = [root]
+    pop, push, extend = stack.pop, stack.append, stack.extend
+    reversed_fields = _reversed_fields.get
+    while stack:
+        node = pop()
+        if node is _EXIT:
+            yield pop()
+            continue
+        if not isinstance(node, AstNode):
+            continue
+        push(node)
+        push(_EXIT)
+        cls = type(node)
+        fields = reversed_fields(cls)
+        if fields is None:
+            fields = _reversed_fields[cls] = child_fields(cls)[::-1]
+        for name in fields:
+            value = getattr(node, name)
+            if type(value) is tuple or type(value) is list:
+                extend(reversed(value))
+            elif value is not None:
+                push(value)
+
+
+class Dispatcher:
+    """База проходов по дереву с кэшированным выбором обработчика по классу узла.
+    Подкласс задает префикс имен обработчиков (_prefix) и имя метода на случай, когда обработчика нет (_fallback)"""
+    _prefix = 'visit_'
+    _fallback = 'generic_visit'
+    _handlers: Dict[type, Callable] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Свой кэш у каждого класса прохода: обработчики подклассов могут отличаться
+        cls._handlers = {}
+
+    @classmethod
+    def handler_for(cls, node_cls: type) -> Callable:
+        """Функция-обработчик (не связанная с экземпляром) для узлов класса node_cls"""
+        handler = cls._handlers.get(node_cls)
+        if handler is None:
+            prefix = cls._prefix
+            for base in node_cls.__mro__:
+                handler = getattr(cls, prefix + base.__name__, None)
+                if handler is not None:
+                    break
+            else:
+                handler = getattr(cls, cls._fallback)
+            cls._handlers[node_cls] = handler
+        return handler
+
+    def dispatch(self, node):
+        handler = self._handlers.get(type(node))
+        if handler is None:
+            handler = self.handler_for(type(node))
+        return handler(self, node)
+
+
+class NodeVisitor(Dispatcher):
+    visit = Dispatcher.dispatch
+
+    def generic_visit(self, node):
+        raise Exception('No visit_{} method'.format(type(node).__name__))
+
+
+class NodeTransformer(Dispatcher):
+    """Переписывает дерево снизу вверх.
+
+    Для каждого узла (после его потомков) вызывается transform_<ИмяКласса>(node) или обработчик
+    базового класса, а если такого нет - generic_transform(node). Метод возвращает узел, которым
+    заменяется исходный: тот же, новый или None. None в последовательности удаляет элемент, в одиночном поле - записывается
+    как есть. Поля родителя переприсваиваются только если хотя бы один потомок заменен.
+    """
+    _prefix = 'transform_'
+    _fallback = 'generic_transform'
+
+    def generic_transform(self, node: AstNode) -> Optional[AstNode]:
+        return node
+
+    def transform(self, root: AstNode) -> Optional[AstNode]:
+        # Элемент стека - узел и число его потомков-узлов (-1: потомки еще не в стеке).
+        # Результаты обработанных узлов копятся в results в прямом порядке,
+        # родитель забирает с вершины ровно столько результатов, сколько у него потомков
+        stack = [(root, -1)]
+        results = []
+        while stack:
+            node, count = stack.pop()
+            cls = type(node)
+            fields = child_fields(cls)
+            if count < 0:
+                count = 0
+                mark = len(stack)
+                stack.append(None)
+                for i in range(len(fields) - 1, -1, -1):
+                    value = getattr(node, fields[i])
+                    if isinstance(value, AstNode):
+                        stack.append((value, -1))
+                        count += 1
+                    elif type(value) is tuple or type(value) is list:
+                        for j in range(len(value) - 1, -1, -1):
+                            if isinstance(value[j], AstNode):
+                                stack.append((value[j], -1))
+                                count += 1
+                stack[mark] = (node, count)
+                continue
+            if count:
+                base = len(results) - count
+                self._replace_fields(node, fields, results, base)
+                del results[base:]
+            handler = self._handlers.get(cls)
+            if handler is None:
+                handler = self.handler_for(cls)
+            results.append(handler(self, node))
+        return results[0]
+
+    @staticmethod
+    def _replace_fields(node: AstNode, fields: Tuple[str, ...], results: list, pos: int) -> None:
+        for name in fields:
+            value = getattr(node, name)
+            if isinstance(value, AstNode):
+                if results[pos] is not value:
+                    setattr(node, name, results[pos])
+                pos += 1
+            elif type(value) is tuple or type(value) is list:
+                # Новый список собирается только с первого замененного элемента
+                items = None
+                for i, item in enumerate(value):
+                    new = item
+                    if isinstance(item, AstNode):
+                        new = results[pos]
+                        pos += 1
+                        if new is not item and items is None:
+                            items = list(value[:i])
+                    if items is not None and new is not None:
+                        items.append(new)
+                if items is not None:
+                    setattr(node, name, type(value)(items))